@@ -1,21 +1,50 @@
+import os
+from threading import Lock
+
+from mapadroid.cache.memorycache import MemoryCache
 from mapadroid.cache.noopcache import NoopCache
+from mapadroid.cache.rediscache import RedisCache
 from mapadroid.utils.logging import LoggerEnums, get_logger
 
 logger = get_logger(LoggerEnums.system)
 
+# One cache client per process, clients (and the entries of in-memory caches) are not shared with forked processes
+_cache_instance = None
+_cache_pid = None
+_cache_mutex = Lock()
+
 
 def get_cache(args):
+    global _cache_instance, _cache_pid
+    if _cache_pid == os.getpid():
+        return _cache_instance
+    with _cache_mutex:
+        if _cache_pid != os.getpid():
+            _cache_instance = _create_cache(args)
+            _cache_pid = os.getpid()
+    return _cache_instance
+
+
+def _create_cache(args):
     cache = NoopCache()
-    if args.enable_cache:
-        try:
-            import redis
-            cache = redis.Redis(host=args.cache_host, port=args.cache_port, db=args.cache_database)
-            cache.ping()
-        except ImportError:
-            logger.error("Cache enabled but redis dependency not installed. Continuing without cache")
-        except redis.exceptions.ConnectionError:
-            logger.error("Unable to connect to Redis server. Continouing without cache")
-        except Exception:
-            logger.error("Unknown error while enabling cache. Continuing without cache")
+    if not args.enable_cache:
+        return cache
+    if args.cache_type == "memory":
+        logger.info("Using in-memory cache of up to {} entries", args.cache_memory_size)
+        return MemoryCache(max_entries=args.cache_memory_size)
+    try:
+        import redis
+        client = redis.Redis(host=args.cache_host, port=args.cache_port, db=args.cache_database)
+        client.ping()
+        cache = RedisCache(client)
+    except ImportError:
+        logger.error("Cache enabled but redis dependency not installed. Continuing with in-memory cache")
+        cache = MemoryCache(max_entries=args.cache_memory_size)
+    except redis.exceptions.ConnectionError:
+        logger.error("Unable to connect to Redis server. Continuing with in-memory cache")
+        cache = MemoryCache(max_entries=args.cache_memory_size)
+    except Exception:
+        logger.error("Unknown error while enabling cache. Continuing without cache")
+        cache = NoopCache()
 
     return cache
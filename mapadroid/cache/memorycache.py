@@ -0,0 +1,65 @@
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from threading import Lock
+from typing import Any, Iterable, List, Optional, Tuple, Union
+
+
+class MemoryCache:
+    """
+    In-process replacement of the Redis cache. Keys expire according to ex (seconds) and the least recently used keys
+    are dropped once max_entries is exceeded. Only the subset of the Redis API used by MAD is implemented.
+    """
+    def __init__(self, max_entries: int = 100000):
+        self._max_entries: int = max_entries
+        # key -> (value, expiry timestamp or None)
+        self._entries: OrderedDict = OrderedDict()
+        self._mutex: Lock = Lock()
+
+    def set(self, key, value, ex: Optional[Union[int, timedelta]] = None):
+        if isinstance(ex, timedelta):
+            ex = ex.total_seconds()
+        expiry = time.time() + ex if ex is not None else None
+        with self._mutex:
+            self._entries[key] = (value, expiry)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+        return True
+
+    def set_many(self, entries: Iterable[Tuple[Any, Any, Optional[Union[int, timedelta]]]]):
+        """
+        Sets multiple keys at once, entries consist of (key, value, ex)
+        """
+        for key, value, ex in entries:
+            self.set(key, value, ex=ex)
+
+    def exists_many(self, keys: List) -> List[bool]:
+        with self._mutex:
+            return [self.__get_valid_entry(key) is not None for key in keys]
+
+    def get(self, key):
+        with self._mutex:
+            entry = self.__get_valid_entry(key)
+        return entry[0] if entry is not None else None
+
+    def exists(self, *keys) -> int:
+        with self._mutex:
+            return sum(1 for key in keys if self.__get_valid_entry(key) is not None)
+
+    def delete(self, *keys) -> int:
+        with self._mutex:
+            return sum(1 for key in keys if self._entries.pop(key, None) is not None)
+
+    def __get_valid_entry(self, key):
+        entry = self._entries.get(key, None)
+        if entry is None:
+            return None
+        if entry[1] is not None and entry[1] <= time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def __len__(self):
+        return len(self._entries)
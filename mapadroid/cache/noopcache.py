@@ -7,3 +7,9 @@ class NoopCache:
 
     def exists(self, key):
         return False
+
+    def exists_many(self, keys):
+        return [False] * len(keys)
+
+    def set_many(self, entries):
+        pass
@@ -0,0 +1,38 @@
+from typing import Any, Iterable, List, Optional, Tuple
+
+
+class RedisCache:
+    """
+    Wraps a Redis client to provide the batched operations of the cache interface by pipelining the commands
+    """
+    def __init__(self, client):
+        self._client = client
+
+    def set(self, key, value, ex=None):
+        return self._client.set(key, value, ex=ex)
+
+    def get(self, key):
+        return self._client.get(key)
+
+    def exists(self, *keys) -> int:
+        return self._client.exists(*keys)
+
+    def delete(self, *keys) -> int:
+        return self._client.delete(*keys)
+
+    def exists_many(self, keys: List) -> List[bool]:
+        if not keys:
+            return []
+        pipe = self._client.pipeline(transaction=False)
+        for key in keys:
+            pipe.exists(key)
+        return [bool(result) for result in pipe.execute()]
+
+    def set_many(self, entries: Iterable[Tuple[Any, Any, Optional[int]]]):
+        pipe = self._client.pipeline(transaction=False)
+        has_entries = False
+        for key, value, ex in entries:
+            pipe.set(key, value, ex=ex)
+            has_entries = True
+        if has_entries:
+            pipe.execute()
@@ -1,10 +1,7 @@
 import json
 from typing import Dict, List, Optional, Tuple
 
-import numpy as np
-
-from mapadroid.route.routecalc.ClusteringHelper import ClusteringHelper
-from mapadroid.utils.collections import Location
+from mapadroid.route.routecalc.calculate_route_pool import calculate_route
 from mapadroid.utils.logging import LoggerEnums, get_logger
 
 from ..dm_exceptions import UnknownIdentifier
@@ -135,47 +132,9 @@ class RouteCalc(Resource):
                 logger.debug('Using routefile from DB')
                 return saved_route
 
-        export_data = []
-        if use_s2:
-            logger.debug("Using S2 method for calculation with S2 level: {}", s2_level)
-
-        less_coords = coords
-        if len(coords) > 0 and max_radius and max_coords_within_radius:
-            logger.info("Calculating route for {}", route_name)
-            new_coords = self.get_less_coords(coords, max_radius, max_coords_within_radius, use_s2, s2_level)
-            less_coords = np.zeros(shape=(len(new_coords), 2))
-            for i in range(len(less_coords)):
-                less_coords[i][0] = new_coords[i][0]
-                less_coords[i][1] = new_coords[i][1]
-            logger.debug("Coords summed up: {}, that's just {} coords", less_coords, len(less_coords))
-        logger.debug("Got {} coordinates", len(less_coords))
-        if len(less_coords) < 3:
-            logger.debug("less than 3 coordinates... not gonna take a shortest route on that")
-            export_data = []
-            for i in range(len(less_coords)):
-                export_data.append({'lat': less_coords[i][0].item(),
-                                    'lng': less_coords[i][1].item()})
-        else:
-            logger.info("Calculating a short route through all those coords. Might take a while")
-            from timeit import default_timer as timer
-            start = timer()
-            from mapadroid.route.routecalc.calculate_route_all import \
-                route_calc_all
-            sol_best = route_calc_all(less_coords, route_name, num_processes, algorithm)
-
-            end = timer()
-
-            calc_dur = (end - start) / 60
-            time_unit = 'minutes'
-            if calc_dur < 1:
-                calc_dur = int(calc_dur * 60)
-                time_unit = 'seconds'
-
-            logger.info("Calculated route for {} in {} {}", route_name, calc_dur, time_unit)
-
-            for i in range(len(sol_best)):
-                export_data.append({'lat': less_coords[int(sol_best[i])][0].item(),
-                                    'lng': less_coords[int(sol_best[i])][1].item()})
+        route = calculate_route(coords, max_radius, max_coords_within_radius, algorithm=algorithm, use_s2=use_s2,
+                                s2_level=s2_level, route_name=route_name, num_processes=num_processes)
+        export_data = [{'lat': lat, 'lng': lng} for lat, lng in route.tolist()]
         if not in_memory:
             calc_coords = []
             for coord in export_data:
@@ -186,22 +145,6 @@ class RouteCalc(Resource):
             self.save(update_time=True)
         return export_data
 
-    def get_less_coords(self, np_coords: List[Tuple[str, str]], max_radius: int, max_coords_within_radius: int,
-                        use_s2: bool = False, s2_level: int = 15):
-        coordinates = []
-        for coord in np_coords:
-            coordinates.append(
-                (0, Location(coord[0].item(), coord[1].item()))
-            )
-
-        clustering_helper = ClusteringHelper(max_radius=max_radius, max_count_per_circle=max_coords_within_radius,
-                                             max_timedelta_seconds=0, use_s2=use_s2, s2_level=s2_level)
-        clustered_events = clustering_helper.get_clustered(coordinates)
-        coords_cleaned_up = []
-        for event in clustered_events:
-            coords_cleaned_up.append(event[1])
-        return coords_cleaned_up
-
     def set_recalc_status(self, status: int) -> None:
         data = {
             'recalc_status': int(status)
@@ -1,9 +1,11 @@
 import sys
+from typing import Optional
 from multiprocessing.managers import SyncManager
 
 from mapadroid.db.DbWrapper import DbWrapper
 from mapadroid.db.PooledQueryExecutor import (PooledQueryExecutor,
-                                              PooledQuerySyncManager)
+                                              PooledQuerySyncManager,
+                                              ProcessLocalQueryExecutor)
 from mapadroid.utils.logging import LoggerEnums, get_logger
 
 logger = get_logger(LoggerEnums.database)
@@ -11,7 +13,7 @@ logger = get_logger(LoggerEnums.database)
 
 class DbFactory:
     @staticmethod
-    def get_wrapper(args) -> (DbWrapper, SyncManager):
+    def get_wrapper(args) -> (DbWrapper, Optional[SyncManager]):
         if args.db_method == "monocle":
             logger.error(
                 "MAD has dropped Monocle support. Please consider checking out the "
@@ -22,6 +24,13 @@ class DbFactory:
             logger.error("Invalid db_method in config. Exiting")
             sys.exit(1)
 
+        if args.db_process_local_pool:
+            logger.info("Using a DB pool of size {} per process", args.db_poolsize)
+            db_exec = ProcessLocalQueryExecutor(host=args.dbip, port=args.dbport,
+                                                username=args.dbusername, password=args.dbpassword,
+                                                database=args.dbname, poolsize=args.db_poolsize)
+            return DbWrapper(db_exec=db_exec, args=args), None
+
         PooledQuerySyncManager.register("PooledQueryExecutor", PooledQueryExecutor)
         db_pool_manager = PooledQuerySyncManager()
         db_pool_manager.start()
@@ -1,17 +1,21 @@
 import json
 import math
 import time
+from contextlib import contextmanager
 from datetime import datetime, timedelta
+from typing import Dict, Hashable, Iterable, List, Optional, Set, Tuple
 
 from bitstring import BitArray
 
 from mapadroid.cache import get_cache
 from mapadroid.db.PooledQueryExecutor import PooledQueryExecutor
+from mapadroid.db.WriteBehindBuffer import WriteBehindBuffer
 from mapadroid.utils.gamemechanicutil import (gen_despawn_timestamp,
                                               is_mon_ditto)
 from mapadroid.utils.logging import LoggerEnums, get_logger, get_origin_logger
 from mapadroid.utils.questGen import questtask
 from mapadroid.utils.s2Helper import S2Helper
+from mapadroid.webhook.WebhookStream import WebhookStream
 
 logger = get_logger(LoggerEnums.database)
 
@@ -23,10 +27,106 @@ class DbPogoProtoSubmit:
     moved outside the db package.
     """
     default_spawndef = 240
+    # Known end times of spawnpoints (calc_endminsec) are kept in memory for an hour, up to the given amount of
+    # spawnpoints per process
+    spawn_endtime_cache_ttl = 3600
+    spawn_endtime_cache_size = 250000
 
     def __init__(self, db_exec: PooledQueryExecutor, args):
         self._db_exec: PooledQueryExecutor = db_exec
         self._args = args
+        self._spawn_endtimes: Dict[int, Tuple[str, float]] = {}
+        # upserts collected by unit_of_work, None if not within a unit of work
+        self._pending_writes: Optional[List[Tuple[str, list]]] = None
+        # changes of the upserts collected by unit_of_work to be published once committed
+        self._pending_changes: Optional[List[Tuple[str, list]]] = None
+        # buffer coalescing upserts of frequently updated rows, None if writing through
+        self._write_behind: Optional[WriteBehindBuffer] = None
+        self._webhook_stream: Optional[WebhookStream] = None
+
+    def set_webhook_stream(self, webhook_stream: Optional[WebhookStream]):
+        """
+        The primary keys of mons, raids and quests written are published to the given stream once committed
+        """
+        self._webhook_stream = webhook_stream
+
+    def start_write_behind(self, max_delay: float):
+        """
+        Upserts of stops, gyms and cells are buffered for up to max_delay seconds and coalesced by their primary
+        key before being written. To be called within the process submitting the data.
+        """
+        if self._write_behind is not None:
+            return
+        self._write_behind = WriteBehindBuffer(self._db_exec, max_delay, on_written=self._publish_written)
+        self._write_behind.start()
+
+    def stop_write_behind(self):
+        """
+        Writes all buffered upserts and writes through from now on
+        """
+        write_behind, self._write_behind = self._write_behind, None
+        if write_behind is not None:
+            write_behind.stop()
+
+    @contextmanager
+    def unit_of_work(self):
+        """
+        The upserts of all submissions within the context are collected and written on a single connection within one
+        transaction when leaving the context instead of committing every submission on its own.
+        Not to be shared by threads.
+        """
+        self._pending_writes = []
+        self._pending_changes = []
+        try:
+            yield
+        finally:
+            pending, self._pending_writes = self._pending_writes, None
+            changes, self._pending_changes = self._pending_changes, None
+            if not pending or self._db_exec.execute_transaction(pending):
+                for webhook_type, keys in changes:
+                    self._publish_committed(webhook_type, keys)
+
+    def _write_many(self, query: str, args: list, coalesce_by: Optional[int] = None,
+                    webhook_type: Optional[str] = None):
+        """
+        :param coalesce_by: index of the primary key within the args. If set, the rows are handed to the write-behind
+        buffer if enabled.
+        :param webhook_type: if set, the primary keys (first of the args) are published to the webhook stream once
+        the rows have been committed
+        """
+        if not args:
+            return
+        if coalesce_by is not None and self._write_behind is not None:
+            self._write_behind.add(query, args, coalesce_by, webhook_type)
+            return
+        if self._pending_writes is not None:
+            self._pending_writes.append((query, args))
+        else:
+            self._db_exec.executemany(query, args, commit=True)
+        if webhook_type is not None:
+            self._publish_changes(webhook_type, [row[0] for row in args])
+
+    def _publish_changes(self, webhook_type: str, keys: List[Hashable]):
+        """
+        Publishes the keys of rows written to the webhook stream, within a unit of work once it has been committed
+        """
+        if self._webhook_stream is None:
+            return
+        if self._pending_changes is not None:
+            self._pending_changes.append((webhook_type, keys))
+        else:
+            self._publish_committed(webhook_type, keys)
+
+    def _publish_committed(self, webhook_type: str, keys: List[Hashable]):
+        # the rows may refer to gyms and stops still buffered (e.g. raids and quests of those seen the first time),
+        # which are read along with them for the webhooks
+        if self._write_behind is not None and self._write_behind.defer(webhook_type, keys):
+            return
+        self._publish_written(webhook_type, keys)
+
+    def _publish_written(self, webhook_type: str, keys: Iterable[Hashable]):
+        if self._webhook_stream is not None:
+            self._webhook_stream.publish(webhook_type, keys)
 
     def mons(self, origin: str, timestamp: float, map_proto: dict, mitm_mapper):
         """
@@ -56,59 +156,68 @@ class DbPogoProtoSubmit:
 
         mon_args = []
         encounters = []
-        for cell in cells:
-            for wild_mon in cell["wild_pokemon"]:
-                spawnid = int(str(wild_mon["spawnpoint_id"]), 16)
-                lat = wild_mon["latitude"]
-                lon = wild_mon["longitude"]
-                mon_id = wild_mon["pokemon_data"]["id"]
-                encounter_id = wild_mon["encounter_id"]
-
-                pokemon_display = wild_mon.get("pokemon_data", {}).get("display", {})
-                weather_boosted = pokemon_display.get('weather_boosted_value')
-                gender = pokemon_display.get('gender_value')
-                costume = pokemon_display.get('costume_value')
-                form = pokemon_display.get('form_value')
-
-                if encounter_id < 0:
-                    encounter_id = encounter_id + 2 ** 64
-
-                mitm_mapper.collect_mon_stats(origin, str(encounter_id))
-
-                now = datetime.utcfromtimestamp(time.time()).strftime("%Y-%m-%d %H:%M:%S")
+        cache_entries = []
+        wild_mons = [wild_mon for cell in cells for wild_mon in cell["wild_pokemon"]]
+        spawn_endtimes = self._get_detected_endtimes(
+            [int(str(wild_mon["spawnpoint_id"]), 16) for wild_mon in wild_mons])
+        cache_keys = [self._mon_cache_key(self._unsigned_encounter_id(wild_mon["encounter_id"]),
+                                          wild_mon["pokemon_data"]["id"])
+                      for wild_mon in wild_mons]
+        cached_keys = self._get_cached_keys(cache, cache_keys)
+        for wild_mon, cache_key in zip(wild_mons, cache_keys):
+            spawnid = int(str(wild_mon["spawnpoint_id"]), 16)
+            lat = wild_mon["latitude"]
+            lon = wild_mon["longitude"]
+            mon_id = wild_mon["pokemon_data"]["id"]
+            encounter_id = wild_mon["encounter_id"]
+
+            pokemon_display = wild_mon.get("pokemon_data", {}).get("display", {})
+            weather_boosted = pokemon_display.get('weather_boosted_value')
+            gender = pokemon_display.get('gender_value')
+            costume = pokemon_display.get('costume_value')
+            form = pokemon_display.get('form_value')
+
+            if encounter_id < 0:
+                encounter_id = encounter_id + 2 ** 64
+
+            mitm_mapper.collect_mon_stats(origin, str(encounter_id))
+
+            now = datetime.utcfromtimestamp(time.time()).strftime("%Y-%m-%d %H:%M:%S")
+
+            # get known spawn end time and feed into despawn time calculation
+            getdetspawntime = spawn_endtimes.get(spawnid, False)
+            despawn_time_unix = gen_despawn_timestamp(getdetspawntime, timestamp,
+                                                      self._args.default_unknown_timeleft)
+            despawn_time = datetime.utcfromtimestamp(despawn_time_unix).strftime("%Y-%m-%d %H:%M:%S")
+
+            if getdetspawntime is None:
+                origin_logger.debug3("adding mon (#{}) at {}, {}. Despawns at {} (init) ({})", mon_id, lat, lon,
+                                     despawn_time, spawnid)
+            else:
+                origin_logger.debug3("adding mon (#{}) at {}, {}. Despawns at {} (non-init) ({})", mon_id, lat, lon,
+                                     despawn_time, spawnid)
 
-                # get known spawn end time and feed into despawn time calculation
-                getdetspawntime = self._get_detected_endtime(str(spawnid))
-                despawn_time_unix = gen_despawn_timestamp(getdetspawntime, timestamp,
-                                                          self._args.default_unknown_timeleft)
-                despawn_time = datetime.utcfromtimestamp(despawn_time_unix).strftime("%Y-%m-%d %H:%M:%S")
+            if cache_key in cached_keys:
+                continue
+            cached_keys.add(cache_key)
 
-                if getdetspawntime is None:
-                    origin_logger.debug3("adding mon (#{}) at {}, {}. Despawns at {} (init) ({})", mon_id, lat, lon,
-                                         despawn_time, spawnid)
-                else:
-                    origin_logger.debug3("adding mon (#{}) at {}, {}. Despawns at {} (non-init) ({})", mon_id, lat, lon,
-                                         despawn_time, spawnid)
-
-                cache_key = "mon{}-{}".format(encounter_id, mon_id)
-                if cache.exists(cache_key):
-                    continue
-
-                mon_args.append(
-                    (
-                        encounter_id, spawnid, mon_id, lat, lon,
-                        despawn_time, None, None, None, None, None, None,
-                        None, None, None, gender, None, None, None, None,
-                        None, weather_boosted, now, costume, form, "wild"
-                    )
+            mon_args.append(
+                (
+                    encounter_id, spawnid, mon_id, lat, lon,
+                    despawn_time, None, None, None, None, None, None,
+                    None, None, None, gender, None, None, None, None,
+                    None, weather_boosted, now, costume, form, "wild"
                 )
-                encounters.append((encounter_id, now))
+            )
+            encounters.append((encounter_id, now))
 
-                cache_time = int(despawn_time_unix - int(datetime.now().timestamp()))
-                if cache_time > 0:
-                    cache.set(cache_key, 1, ex=cache_time)
+            cache_time = int(despawn_time_unix - int(datetime.now().timestamp()))
+            if cache_time > 0:
+                cache_entries.append((cache_key, 1, cache_time))
 
-        self._db_exec.executemany(query_mons, mon_args, commit=True)
+        cache.set_many(cache_entries)
+        # not written behind as an encounter following shortly after would be overwritten by the wild mon
+        self._write_many(query_mons, mon_args, webhook_type="pokemon")
         return encounters
 
     def nearby_mons(self, origin: str, timestamp: float, map_proto: dict, mitm_mapper):
@@ -146,66 +255,80 @@ class DbPogoProtoSubmit:
         nearby_args = []
         stop_encounters = []
         cell_encounters = []
-        for cell in cells:
-            cellid = cell.get("id")
-            for nearby_mon in cell["nearby_pokemon"]:
-                stopid = nearby_mon["fort_id"]
-
-                mon_id = nearby_mon["id"]
-                encounter_id = nearby_mon["encounter_id"]
-                display = nearby_mon["display"]
-                weather_boosted = display["weather_boosted_value"]
-
-                if encounter_id < 0:
-                    encounter_id = encounter_id + 2 ** 64
-                # Hotfix for a PD issue.
-
-                cache_key = "monnear{}-{}".format(encounter_id, mon_id)
-                encounter_key = "moniv{}-{}-{}".format(encounter_id, weather_boosted, mon_id)
-                wild_key = "mon{}-{}".format(encounter_id, mon_id)
-                if cache.exists(cache_key) or cache.exists(encounter_key) or cache.exists(wild_key):
-                    continue
-
-                form = display["form_value"]
-                costume = display["costume_value"]
-                gender = display["gender_value"]
-
-                now = datetime.utcfromtimestamp(time.time())
-                disappear_time = now + timedelta(minutes=self._args.default_nearby_timeleft)
-                disappear_time = disappear_time.strftime("%Y-%m-%d %H:%M:%S")
-                now = now.strftime("%Y-%m-%d %H:%M:%S")
-
-                if (not stopid and cellid) and (not self._args.disable_nearby_cell):
-                    lat, lon, _ = S2Helper.get_position_from_cell(cellid)
-                    stopid = None
-                    db_cell = cellid
-                    seen_type = "nearby_cell"
-                    cell_encounters.append((encounter_id, now))
-                else:
-                    db_cell = None
-                    seen_type = "nearby_stop"
+        cache_entries = []
+        nearby_mons = [(cell.get("id"), nearby_mon) for cell in cells for nearby_mon in cell["nearby_pokemon"]]
+        # the nearby, encounter and wild key of every mon, all of them are checked with one round trip
+        mon_cache_keys = []
+        for _, nearby_mon in nearby_mons:
+            encounter_id = self._unsigned_encounter_id(nearby_mon["encounter_id"])
+            mon_id = nearby_mon["id"]
+            weather_boosted = nearby_mon["display"]["weather_boosted_value"]
+            mon_cache_keys.append((self._mon_nearby_cache_key(encounter_id, mon_id),
+                                   self._mon_iv_cache_key(encounter_id, weather_boosted, mon_id),
+                                   self._mon_cache_key(encounter_id, mon_id)))
+        cached_keys = self._get_cached_keys(cache, [key for keys in mon_cache_keys for key in keys])
+        fort_locations = {fort["id"]: (fort["latitude"], fort["longitude"])
+                          for cell in cells for fort in cell.get("forts", [])}
+        for (cellid, nearby_mon), (cache_key, encounter_key, wild_key) in zip(nearby_mons, mon_cache_keys):
+            stopid = nearby_mon["fort_id"]
+
+            mon_id = nearby_mon["id"]
+            encounter_id = nearby_mon["encounter_id"]
+            display = nearby_mon["display"]
+            weather_boosted = display["weather_boosted_value"]
+
+            if encounter_id < 0:
+                encounter_id = encounter_id + 2 ** 64
+            # Hotfix for a PD issue.
+
+            if cache_key in cached_keys or encounter_key in cached_keys or wild_key in cached_keys:
+                continue
+            cached_keys.add(cache_key)
+
+            form = display["form_value"]
+            costume = display["costume_value"]
+            gender = display["gender_value"]
+
+            now = datetime.utcfromtimestamp(time.time())
+            disappear_time = now + timedelta(minutes=self._args.default_nearby_timeleft)
+            disappear_time = disappear_time.strftime("%Y-%m-%d %H:%M:%S")
+            now = now.strftime("%Y-%m-%d %H:%M:%S")
+
+            if (not stopid and cellid) and (not self._args.disable_nearby_cell):
+                lat, lon, _ = S2Helper.get_position_from_cell(cellid)
+                stopid = None
+                db_cell = cellid
+                seen_type = "nearby_cell"
+                cell_encounters.append((encounter_id, now))
+            else:
+                db_cell = None
+                seen_type = "nearby_stop"
+                # forts of the same GMO may not have been committed yet
+                stop = [fort_locations[stopid]] if stopid in fort_locations else None
+                if not stop:
                     stop = self._db_exec.execute(stop_query, stopid)
-                    if (not stop) or (not len(stop) > 0) or (not stop[0][0]):
-                        stop = self._db_exec.execute(gym_query, stopid)
+                if (not stop) or (not len(stop) > 0) or (not stop[0][0]):
+                    stop = self._db_exec.execute(gym_query, stopid)
 
-                    if stop:
-                        lat, lon = stop[0]
-                    else:
-                        lat, lon = (0, 0)
+                if stop:
+                    lat, lon = stop[0]
+                else:
+                    lat, lon = (0, 0)
 
-                    stop_encounters.append((encounter_id, now))
+                stop_encounters.append((encounter_id, now))
 
-                spawnpoint = 0
+            spawnpoint = 0
 
-                nearby_args.append(
-                    (
-                        encounter_id, spawnpoint, mon_id, stopid, db_cell, disappear_time,
-                        gender, weather_boosted, now, costume, form, lat, lon, seen_type
-                    )
+            nearby_args.append(
+                (
+                    encounter_id, spawnpoint, mon_id, stopid, db_cell, disappear_time,
+                    gender, weather_boosted, now, costume, form, lat, lon, seen_type
                 )
-                cache.set(cache_key, 1, ex=60 * 60)
+            )
+            cache_entries.append((cache_key, 1, 60 * 60))
 
-        self._db_exec.executemany(query_nearby, nearby_args, commit=True)
+        cache.set_many(cache_entries)
+        self._write_many(query_nearby, nearby_args, webhook_type="pokemon")
         return cell_encounters, stop_encounters
 
     def mon_iv(self, origin: str, timestamp: float, encounter_proto: dict, mitm_mapper):
@@ -224,7 +347,7 @@ class DbPogoProtoSubmit:
 
         spawnid = int(str(wild_pokemon["spawnpoint_id"]), 16)
 
-        getdetspawntime = self._get_detected_endtime(str(spawnid))
+        getdetspawntime = self._get_detected_endtimes([spawnid]).get(spawnid, False)
         despawn_time_unix = gen_despawn_timestamp(getdetspawntime, timestamp, self._args.default_unknown_timeleft)
         despawn_time = datetime.utcfromtimestamp(despawn_time_unix).strftime("%Y-%m-%d %H:%M:%S")
 
@@ -240,7 +363,7 @@ class DbPogoProtoSubmit:
         if encounter_id < 0:
             encounter_id = encounter_id + 2 ** 64
 
-        cache_key = "moniv{}-{}-{}".format(encounter_id, weather_boosted, mon_id)
+        cache_key = self._mon_iv_cache_key(encounter_id, weather_boosted, mon_id)
         if cache.exists(cache_key):
             return
 
@@ -317,6 +440,7 @@ class DbPogoProtoSubmit:
         )
 
         self._db_exec.execute(query, insert_values, commit=True)
+        self._publish_changes("pokemon", [encounter_id])
         cache_time = int(despawn_time_unix - datetime.now().timestamp())
         if cache_time > 0:
             cache.set(cache_key, 1, ex=int(cache_time))
@@ -343,7 +467,7 @@ class DbPogoProtoSubmit:
         if encounter_id < 0:
             encounter_id = encounter_id + 2 ** 64
 
-        cache_key = "moniv{}-{}-{}".format(encounter_id, weather_boosted, mon_id)
+        cache_key = self._mon_iv_cache_key(encounter_id, weather_boosted, mon_id)
         if cache.exists(cache_key):
             return
 
@@ -395,6 +519,7 @@ class DbPogoProtoSubmit:
         )
 
         self._db_exec.execute(query, insert_values, commit=True)
+        self._publish_changes("pokemon", [encounter_id])
         cache.set(cache_key, 1, ex=60 * 3)
         origin_logger.debug3("Done updating lure mon with iv in DB")
         return [(encounter_id, now)]
@@ -422,45 +547,50 @@ class DbPogoProtoSubmit:
 
         lure_args = []
         encounters = []
-        for cell in cells:
-            for fort in cell["forts"]:
-                lure_mon = fort.get("active_pokemon", {})
-                mon_id = lure_mon.get("id", 0)
-                if fort["type"] == 1 and mon_id > 0:
-                    encounter_id = lure_mon["encounter_id"]
-
-                    if encounter_id < 0:
-                        encounter_id = encounter_id + 2 ** 64
-
-                    cache_key = "monlurenoiv{}".format(encounter_id)
-                    if cache.exists(cache_key):
-                        continue
-
-                    lat = fort["latitude"]
-                    lon = fort["longitude"]
-                    stopid = fort["id"]
-                    disappear_time = datetime.utcfromtimestamp(
-                        lure_mon["expiration_timestamp"] / 1000)
-
-                    disappear_time = disappear_time.strftime("%Y-%m-%d %H:%M:%S")
-                    now = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
-
-                    display = lure_mon["display"]
-                    form = display["form_value"]
-                    costume = display["costume_value"]
-                    gender = display["gender_value"]
-                    weather_boosted = display["weather_boosted_value"]
-
-                    cache.set(cache_key, 1, ex=60 * 3)
-                    lure_args.append(
-                        (
-                            encounter_id, 0, mon_id, stopid, disappear_time, gender,
-                            weather_boosted, now, costume, form, lat, lon, "lure_wild"
-                        )
-                    )
-                    encounters.append((encounter_id, now))
+        cache_entries = []
+        lured_forts = [fort for cell in cells for fort in cell["forts"]
+                       if fort["type"] == 1 and fort.get("active_pokemon", {}).get("id", 0) > 0]
+        cache_keys = [self._mon_lure_noiv_cache_key(self._unsigned_encounter_id(fort["active_pokemon"]["encounter_id"]))
+                      for fort in lured_forts]
+        cached_keys = self._get_cached_keys(cache, cache_keys)
+        for fort, cache_key in zip(lured_forts, cache_keys):
+            lure_mon = fort["active_pokemon"]
+            mon_id = lure_mon["id"]
+            encounter_id = lure_mon["encounter_id"]
+
+            if encounter_id < 0:
+                encounter_id = encounter_id + 2 ** 64
+
+            if cache_key in cached_keys:
+                continue
+            cached_keys.add(cache_key)
+
+            lat = fort["latitude"]
+            lon = fort["longitude"]
+            stopid = fort["id"]
+            disappear_time = datetime.utcfromtimestamp(
+                lure_mon["expiration_timestamp"] / 1000)
+
+            disappear_time = disappear_time.strftime("%Y-%m-%d %H:%M:%S")
+            now = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
 
-        self._db_exec.executemany(query_lures, lure_args, commit=True)
+            display = lure_mon["display"]
+            form = display["form_value"]
+            costume = display["costume_value"]
+            gender = display["gender_value"]
+            weather_boosted = display["weather_boosted_value"]
+
+            cache_entries.append((cache_key, 1, 60 * 3))
+            lure_args.append(
+                (
+                    encounter_id, 0, mon_id, stopid, disappear_time, gender,
+                    weather_boosted, now, costume, form, lat, lon, "lure_wild"
+                )
+            )
+            encounters.append((encounter_id, now))
+
+        cache.set_many(cache_entries)
+        self._write_many(query_lures, lure_args, webhook_type="pokemon")
         return encounters
 
     def update_seen_type_stats(self, **kwargs):
@@ -503,7 +633,7 @@ class DbPogoProtoSubmit:
                     nearby_cell, lure_encounter, lure_wild
                 )
             )
-        self._db_exec.executemany(base_query, base_args, commit=True)
+        self._write_many(base_query, base_args)
 
     def spawnpoints(self, origin: str, map_proto: dict, proto_dt: datetime):
         origin_logger = get_origin_logger(logger, origin=origin)
@@ -588,9 +718,9 @@ class DbPogoProtoSubmit:
                         (spawnid, lat, lng, earliest_unseen, last_non_scanned, newspawndef)
                     )
 
-        self._db_exec.executemany(query_spawnpoints, spawnpoint_args, commit=True)
-        self._db_exec.executemany(query_spawnpoints_unseen,
-                                  spawnpoint_args_unseen, commit=True)
+        self._write_many(query_spawnpoints, spawnpoint_args)
+        self._write_many(query_spawnpoints_unseen, spawnpoint_args_unseen)
+        self._cache_detected_endtimes({args[0]: args[6] for args in spawnpoint_args})
 
     def stops(self, origin: str, map_proto: dict):
         """
@@ -616,18 +746,21 @@ class DbPogoProtoSubmit:
         )
 
         stops_args = []
-        for cell in cells:
-            for fort in cell["forts"]:
-                if fort["type"] == 1:
-                    stop = self._extract_args_single_stop(fort)
-                    alt_modified_time = int(math.ceil(datetime.utcnow().timestamp() / 1000)) * 1000
-                    cache_key = "stop{}{}".format(fort["id"], fort.get("last_modified_timestamp_ms", alt_modified_time))
-                    if cache.exists(cache_key):
-                        continue
-                    cache.set(cache_key, 1, ex=900)
-                    stops_args.append(stop)
-
-        self._db_exec.executemany(query_stops, stops_args, commit=True)
+        cache_entries = []
+        alt_modified_time = int(math.ceil(datetime.utcnow().timestamp() / 1000)) * 1000
+        stops = [fort for cell in cells for fort in cell["forts"] if fort["type"] == 1]
+        cache_keys = ["stop{}{}".format(fort["id"], fort.get("last_modified_timestamp_ms", alt_modified_time))
+                      for fort in stops]
+        cached_keys = self._get_cached_keys(cache, cache_keys)
+        for fort, cache_key in zip(stops, cache_keys):
+            if cache_key in cached_keys:
+                continue
+            cached_keys.add(cache_key)
+            cache_entries.append((cache_key, 1, 900))
+            stops_args.append(self._extract_args_single_stop(fort))
+
+        cache.set_many(cache_entries)
+        self._write_many(query_stops, stops_args, coalesce_by=0)
         return True
 
     def stop_details(self, stop_proto: dict):
@@ -722,6 +855,7 @@ class DbPogoProtoSubmit:
         )
         origin_logger.debug3("DbPogoProtoSubmit::quest submitted quest type {} at stop {}", quest_type, fort_id)
         self._db_exec.execute(query_quests, insert_values, commit=True)
+        self._publish_changes("quest", [fort_id])
 
         return True
 
@@ -757,46 +891,49 @@ class DbPogoProtoSubmit:
             "url=IF(VALUES(url) IS NOT NULL AND VALUES(url) <> '', VALUES(url), url)"
         )
 
-        for cell in cells:
-            for gym in cell["forts"]:
-                if gym["type"] == 0:
-                    guard_pokemon_id = gym["gym_details"]["guard_pokemon"]
-                    gymid = gym["id"]
-                    team_id = gym["gym_details"]["owned_by_team"]
-                    latitude = gym["latitude"]
-                    longitude = gym["longitude"]
-                    slots_available = gym["gym_details"]["slots_available"]
-                    last_modified_ts = gym["last_modified_timestamp_ms"] / 1000
-                    last_modified = datetime.utcfromtimestamp(
-                        last_modified_ts).strftime("%Y-%m-%d %H:%M:%S")
-                    is_ex_raid_eligible = gym["gym_details"]["is_ex_raid_eligible"]
-                    is_ar_scan_eligible = gym["is_ar_scan_eligible"]
-
-                    cache_key = "gym{}{}".format(gymid, last_modified_ts)
-                    if cache.exists(cache_key):
-                        continue
-
-                    gym_args.append(
-                        (
-                            gymid, team_id, guard_pokemon_id, slots_available,
-                            1,  # enabled
-                            latitude, longitude,
-                            0,  # total CP
-                            0,  # is_in_battle
-                            last_modified,  # last_modified
-                            now,  # last_scanned
-                            is_ex_raid_eligible,
-                            is_ar_scan_eligible
-                        )
-                    )
+        cache_entries = []
+        gyms = [gym for cell in cells for gym in cell["forts"] if gym["type"] == 0]
+        cache_keys = [self._gym_cache_key(gym["id"], gym["last_modified_timestamp_ms"] / 1000) for gym in gyms]
+        cached_keys = self._get_cached_keys(cache, cache_keys)
+        for gym, cache_key in zip(gyms, cache_keys):
+            guard_pokemon_id = gym["gym_details"]["guard_pokemon"]
+            gymid = gym["id"]
+            team_id = gym["gym_details"]["owned_by_team"]
+            latitude = gym["latitude"]
+            longitude = gym["longitude"]
+            slots_available = gym["gym_details"]["slots_available"]
+            last_modified_ts = gym["last_modified_timestamp_ms"] / 1000
+            last_modified = datetime.utcfromtimestamp(
+                last_modified_ts).strftime("%Y-%m-%d %H:%M:%S")
+            is_ex_raid_eligible = gym["gym_details"]["is_ex_raid_eligible"]
+            is_ar_scan_eligible = gym["is_ar_scan_eligible"]
+
+            if cache_key in cached_keys:
+                continue
+            cached_keys.add(cache_key)
 
-                    gym_details_args.append(
-                        (gym["id"], "unknown", gym["image_url"], now)
-                    )
+            gym_args.append(
+                (
+                    gymid, team_id, guard_pokemon_id, slots_available,
+                    1,  # enabled
+                    latitude, longitude,
+                    0,  # total CP
+                    0,  # is_in_battle
+                    last_modified,  # last_modified
+                    now,  # last_scanned
+                    is_ex_raid_eligible,
+                    is_ar_scan_eligible
+                )
+            )
+
+            gym_details_args.append(
+                (gym["id"], "unknown", gym["image_url"], now)
+            )
 
-                    cache.set(cache_key, 1, ex=900)
-        self._db_exec.executemany(query_gym, gym_args, commit=True)
-        self._db_exec.executemany(query_gym_details, gym_details_args, commit=True)
+            cache_entries.append((cache_key, 1, 900))
+        cache.set_many(cache_entries)
+        self._write_many(query_gym, gym_args, coalesce_by=0)
+        self._write_many(query_gym_details, gym_details_args, coalesce_by=0)
         return True
 
     def gym(self, origin: str, map_proto: dict):
@@ -864,74 +1001,82 @@ class DbPogoProtoSubmit:
             "form=VALUES(form), gender=VALUES(gender), costume=VALUES(costume), evolution=VALUES(evolution)"
         )
 
-        for cell in cells:
-            for gym in cell["forts"]:
-                if gym["type"] == 0 and gym["gym_details"]["has_raid"]:
-                    gym_has_raid = gym["gym_details"]["raid_info"]["has_pokemon"]
-                    if gym_has_raid:
-                        raid_info = gym["gym_details"]["raid_info"]
-
-                        pokemon_id = raid_info["raid_pokemon"]["id"]
-                        cp = raid_info["raid_pokemon"]["cp"]
-                        move_1 = raid_info["raid_pokemon"]["move_1"]
-                        move_2 = raid_info["raid_pokemon"]["move_2"]
-                        form = raid_info["raid_pokemon"]["display"]["form_value"]
-                        gender = raid_info["raid_pokemon"]["display"]["gender_value"]
-                        costume = raid_info["raid_pokemon"]["display"]["costume_value"]
-                        evolution = raid_info["raid_pokemon"]["display"].get("current_temp_evolution", 0)
-                    else:
-                        pokemon_id = None
-                        cp = 0
-                        move_1 = 1
-                        move_2 = 2
-                        form = None
-                        gender = None
-                        costume = None
-                        evolution = 0
-
-                    raid_end_sec = int(gym["gym_details"]["raid_info"]["raid_end"] / 1000)
-                    raid_spawn_sec = int(gym["gym_details"]["raid_info"]["raid_spawn"] / 1000)
-                    raid_battle_sec = int(gym["gym_details"]["raid_info"]["raid_battle"] / 1000)
-
-                    raidend_date = datetime.utcfromtimestamp(
-                        float(raid_end_sec)).strftime("%Y-%m-%d %H:%M:%S")
-                    raidspawn_date = datetime.utcfromtimestamp(float(raid_spawn_sec)).strftime(
-                        "%Y-%m-%d %H:%M:%S")
-                    raidstart_date = datetime.utcfromtimestamp(float(raid_battle_sec)).strftime(
-                        "%Y-%m-%d %H:%M:%S")
-
-                    is_exclusive = gym["gym_details"]["raid_info"]["is_exclusive"]
-                    level = gym["gym_details"]["raid_info"]["level"]
-                    gymid = gym["id"]
-
-                    mitm_mapper.collect_raid_stats(origin, gymid)
-
-                    origin_logger.debug3("Adding/Updating gym {} with level {} ending at {}", gymid, level,
-                                         raidend_date)
-
-                    cache_key = "raid{}{}{}".format(gymid, pokemon_id, raid_end_sec)
-                    if cache.exists(cache_key):
-                        continue
-
-                    raid_args.append(
-                        (
-                            gymid,
-                            level,
-                            raidspawn_date,
-                            raidstart_date,
-                            raidend_date,
-                            pokemon_id, cp, move_1, move_2, now,
-                            form,
-                            is_exclusive,
-                            gender,
-                            costume,
-                            evolution
-                        )
-                    )
+        cache_entries = []
+        raid_gyms = [gym for cell in cells for gym in cell["forts"]
+                     if gym["type"] == 0 and gym["gym_details"]["has_raid"]]
+        cache_keys = [self._raid_cache_key(gym["id"],
+                                           gym["gym_details"]["raid_info"]["raid_pokemon"]["id"]
+                                           if gym["gym_details"]["raid_info"]["has_pokemon"] else None,
+                                           int(gym["gym_details"]["raid_info"]["raid_end"] / 1000))
+                      for gym in raid_gyms]
+        cached_keys = self._get_cached_keys(cache, cache_keys)
+        for gym, cache_key in zip(raid_gyms, cache_keys):
+            gym_has_raid = gym["gym_details"]["raid_info"]["has_pokemon"]
+            if gym_has_raid:
+                raid_info = gym["gym_details"]["raid_info"]
+
+                pokemon_id = raid_info["raid_pokemon"]["id"]
+                cp = raid_info["raid_pokemon"]["cp"]
+                move_1 = raid_info["raid_pokemon"]["move_1"]
+                move_2 = raid_info["raid_pokemon"]["move_2"]
+                form = raid_info["raid_pokemon"]["display"]["form_value"]
+                gender = raid_info["raid_pokemon"]["display"]["gender_value"]
+                costume = raid_info["raid_pokemon"]["display"]["costume_value"]
+                evolution = raid_info["raid_pokemon"]["display"].get("current_temp_evolution", 0)
+            else:
+                pokemon_id = None
+                cp = 0
+                move_1 = 1
+                move_2 = 2
+                form = None
+                gender = None
+                costume = None
+                evolution = 0
+
+            raid_end_sec = int(gym["gym_details"]["raid_info"]["raid_end"] / 1000)
+            raid_spawn_sec = int(gym["gym_details"]["raid_info"]["raid_spawn"] / 1000)
+            raid_battle_sec = int(gym["gym_details"]["raid_info"]["raid_battle"] / 1000)
+
+            raidend_date = datetime.utcfromtimestamp(
+                float(raid_end_sec)).strftime("%Y-%m-%d %H:%M:%S")
+            raidspawn_date = datetime.utcfromtimestamp(float(raid_spawn_sec)).strftime(
+                "%Y-%m-%d %H:%M:%S")
+            raidstart_date = datetime.utcfromtimestamp(float(raid_battle_sec)).strftime(
+                "%Y-%m-%d %H:%M:%S")
+
+            is_exclusive = gym["gym_details"]["raid_info"]["is_exclusive"]
+            level = gym["gym_details"]["raid_info"]["level"]
+            gymid = gym["id"]
+
+            mitm_mapper.collect_raid_stats(origin, gymid)
+
+            origin_logger.debug3("Adding/Updating gym {} with level {} ending at {}", gymid, level,
+                                 raidend_date)
+
+            if cache_key in cached_keys:
+                continue
+            cached_keys.add(cache_key)
+
+            raid_args.append(
+                (
+                    gymid,
+                    level,
+                    raidspawn_date,
+                    raidstart_date,
+                    raidend_date,
+                    pokemon_id, cp, move_1, move_2, now,
+                    form,
+                    is_exclusive,
+                    gender,
+                    costume,
+                    evolution
+                )
+            )
 
-                    cache.set(cache_key, 1, ex=900)
+            cache_entries.append((cache_key, 1, 900))
 
-        self._db_exec.executemany(query_raid, raid_args, commit=True)
+        cache.set_many(cache_entries)
+        self._write_many(query_raid, raid_args, webhook_type="raid")
         origin_logger.debug3("DbPogoProtoSubmit::raids: Done submitting raids with data received")
         return True
 
@@ -958,18 +1103,22 @@ class DbPogoProtoSubmit:
         )
 
         list_of_weather_args = []
-        for client_weather in map_proto["client_weather"]:
-            time_of_day = map_proto.get("time_of_day_value", 0)
-            weather = self._extract_args_single_weather(client_weather, time_of_day, received_timestamp)
-
-            cache_key = "weather{}{}{}{}{}{}{}".format(weather[0], weather[4], weather[5], weather[6],
-                                                       weather[7], weather[8], weather[9])
-            if cache.exists(cache_key):
+        cache_entries = []
+        time_of_day = map_proto.get("time_of_day_value", 0)
+        weathers = [self._extract_args_single_weather(client_weather, time_of_day, received_timestamp)
+                    for client_weather in map_proto["client_weather"]]
+        cache_keys = ["weather{}{}{}{}{}{}{}".format(weather[0], weather[4], weather[5], weather[6],
+                                                     weather[7], weather[8], weather[9])
+                      for weather in weathers]
+        cached_keys = self._get_cached_keys(cache, cache_keys)
+        for weather, cache_key in zip(weathers, cache_keys):
+            if cache_key in cached_keys:
                 continue
-
+            cached_keys.add(cache_key)
             list_of_weather_args.append(weather)
-            cache.set(cache_key, 1, ex=900)
-        self._db_exec.executemany(query_weather, list_of_weather_args, commit=True)
+            cache_entries.append((cache_key, 1, 900))
+        cache.set_many(cache_entries)
+        self._write_many(query_weather, list_of_weather_args)
         return True
 
     def cells(self, origin: str, map_proto: dict):
@@ -992,7 +1141,7 @@ class DbPogoProtoSubmit:
 
             cells.append((cell_id, 15, lat, lng, cell["current_timestamp"] / 1000))
 
-        self._db_exec.executemany(query, cells, commit=True)
+        self._write_many(query, cells, coalesce_by=0)
 
     def _extract_args_single_stop(self, stop_data):
         if stop_data["type"] != 1:
@@ -1094,24 +1243,88 @@ class DbPogoProtoSubmit:
             time_of_day, now
         )
 
-    def _get_detected_endtime(self, spawn_id):
-        logger.debug3("DbPogoProtoSubmit::_get_detected_endtime called")
+    @staticmethod
+    def _unsigned_encounter_id(encounter_id: int) -> int:
+        if encounter_id < 0:
+            encounter_id = encounter_id + 2 ** 64
+        return encounter_id
+
+    @staticmethod
+    def _mon_cache_key(encounter_id: int, mon_id: int) -> str:
+        return "mon{}-{}".format(encounter_id, mon_id)
+
+    @staticmethod
+    def _mon_iv_cache_key(encounter_id: int, weather_boosted: int, mon_id: int) -> str:
+        return "moniv{}-{}-{}".format(encounter_id, weather_boosted, mon_id)
+
+    @staticmethod
+    def _mon_nearby_cache_key(encounter_id: int, mon_id: int) -> str:
+        return "monnear{}-{}".format(encounter_id, mon_id)
+
+    @staticmethod
+    def _mon_lure_noiv_cache_key(encounter_id: int) -> str:
+        return "monlurenoiv{}".format(encounter_id)
+
+    @staticmethod
+    def _gym_cache_key(gym_id: str, last_modified_ts: float) -> str:
+        return "gym{}{}".format(gym_id, last_modified_ts)
+
+    @staticmethod
+    def _raid_cache_key(gym_id: str, mon_id: Optional[int], raid_end_sec: int) -> str:
+        return "raid{}{}{}".format(gym_id, mon_id, raid_end_sec)
+
+    @staticmethod
+    def _get_cached_keys(cache, keys: List[str]) -> Set[str]:
+        """
+        Checks all keys with a single round trip to the cache
+        :return: the keys present in the cache
+        """
+        return {key for key, exists in zip(keys, cache.exists_many(keys)) if exists}
+
+    def _get_detected_endtimes(self, spawn_ids: List[int]) -> Dict[int, str]:
+        """
+        Resolves the known end times (MM:SS) of the spawnpoints given. Spawnpoints unknown to this process are
+        retrieved with a single query. Spawnpoints without a known end time are not part of the result.
+        """
+        logger.debug3("DbPogoProtoSubmit::_get_detected_endtimes called")
+        endtimes: Dict[int, str] = {}
+        to_query = set()
+        now = time.time()
+        for spawn_id in spawn_ids:
+            cached = self._spawn_endtimes.get(spawn_id, None)
+            if cached is not None and cached[1] > now:
+                endtimes[spawn_id] = cached[0]
+            else:
+                to_query.add(spawn_id)
+        if not to_query:
+            return endtimes
 
         query = (
-            "SELECT calc_endminsec "
+            "SELECT spawnpoint, calc_endminsec "
             "FROM trs_spawn "
-            "WHERE spawnpoint=%s"
+            "WHERE spawnpoint IN (%s)" % ",".join(["%s"] * len(to_query))
         )
-        args = (
-            spawn_id,
-        )
-
-        found = self._db_exec.execute(query, args)
-
-        if found and len(found) > 0 and found[0][0]:
-            return str(found[0][0])
-        else:
-            return False
+        found = self._db_exec.execute(query, tuple(to_query))
+        queried: Dict[int, str] = {}
+        for spawnpoint, calc_endminsec in found or []:
+            if calc_endminsec:
+                queried[int(spawnpoint)] = str(calc_endminsec)
+        self._cache_detected_endtimes(queried)
+        endtimes.update(queried)
+        return endtimes
+
+    def _cache_detected_endtimes(self, endtimes: Dict[int, str]):
+        if not endtimes:
+            return
+        now = time.time()
+        if len(self._spawn_endtimes) + len(endtimes) > self.spawn_endtime_cache_size:
+            self._spawn_endtimes = {spawn_id: cached for spawn_id, cached in self._spawn_endtimes.items()
+                                    if cached[1] > now}
+            if len(self._spawn_endtimes) + len(endtimes) > self.spawn_endtime_cache_size:
+                self._spawn_endtimes.clear()
+        expiry = now + self.spawn_endtime_cache_ttl
+        for spawn_id, endtime in endtimes.items():
+            self._spawn_endtimes[spawn_id] = (endtime, expiry)
 
     def _get_spawndef(self, spawn_ids):
         if not spawn_ids:
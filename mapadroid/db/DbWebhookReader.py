@@ -1,4 +1,5 @@
 from datetime import datetime, timezone
+from typing import Collection
 
 from mapadroid.db.PooledQueryExecutor import PooledQueryExecutor
 from mapadroid.utils.logging import LoggerEnums, get_logger
@@ -17,6 +18,16 @@ class DbWebhookReader:
 
     def get_raids_changed_since(self, timestamp):
         logger.debug2("DbWebhookReader::get_raids_changed_since called")
+        tsdt = datetime.utcfromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S")
+        return self.__get_raids("raid.last_scanned >= %s", (tsdt,))
+
+    def get_raids_of_gyms(self, gym_ids: Collection[str]):
+        logger.debug2("DbWebhookReader::get_raids_of_gyms called")
+        if not gym_ids:
+            return []
+        return self.__get_raids("raid.gym_id IN ({})".format(",".join(["%s"] * len(gym_ids))), tuple(gym_ids))
+
+    def __get_raids(self, condition: str, args: tuple):
         query = (
             "SELECT raid.gym_id, raid.level, raid.spawn, raid.start, raid.end, raid.pokemon_id, "
             "raid.cp, raid.move_1, raid.move_2, raid.last_scanned, raid.form, raid.is_exclusive, raid.gender, "
@@ -25,10 +36,9 @@ class DbWebhookReader:
             "FROM raid "
             "LEFT JOIN gymdetails ON gymdetails.gym_id = raid.gym_id "
             "LEFT JOIN gym ON gym.gym_id = raid.gym_id "
-            "WHERE raid.last_scanned >= %s"
+            "WHERE " + condition
         )
-        tsdt = datetime.utcfromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S")
-        res = self._db_exec.execute(query, (tsdt,))
+        res = self._db_exec.execute(query, args)
 
         ret = []
         for (gym_id, level, spawn, start, end, pokemon_id,
@@ -97,6 +107,12 @@ class DbWebhookReader:
         logger.debug2("DbWebhookReader::get_quests_changed_since called")
         return self._db_wrapper.quests_from_db(timestamp=timestamp)
 
+    def get_quests_of_stops(self, stop_ids: Collection[str]):
+        logger.debug2("DbWebhookReader::get_quests_of_stops called")
+        if not stop_ids:
+            return {}
+        return self._db_wrapper.quests_from_db(stop_ids=stop_ids)
+
     def get_gyms_changed_since(self, timestamp):
         logger.debug2("DbWebhookReader::get_gyms_changed_since called")
         query = (
@@ -172,6 +188,17 @@ class DbWebhookReader:
 
     def get_mon_changed_since(self, timestamp, mon_types=None):
         logger.debug2("DbWebhookReader::get_mon_changed_since called")
+        tsdt = datetime.utcfromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S")
+        return self.__get_mons("pokemon.last_modified >= %s ", (tsdt,), mon_types)
+
+    def get_mons_of_encounters(self, encounter_ids: Collection[int], mon_types=None):
+        logger.debug2("DbWebhookReader::get_mons_of_encounters called")
+        if not encounter_ids:
+            return []
+        return self.__get_mons("pokemon.encounter_id IN ({}) ".format(",".join(["%s"] * len(encounter_ids))),
+                               tuple(encounter_ids), mon_types)
+
+    def __get_mons(self, condition: str, args: tuple, mon_types=None):
         if mon_types is None:
             mon_types = {"encounter", "lure_encounter"}
         query = (
@@ -182,7 +209,7 @@ class DbWebhookReader:
             "(trs_spawn.calc_endminsec IS NOT NULL) AS verified, seen_type, {}"
             "FROM pokemon "
             "LEFT JOIN trs_spawn ON pokemon.spawnpoint_id = trs_spawn.spawnpoint {}"
-            "WHERE pokemon.last_modified >= %s "
+            "WHERE " + condition
         )
         query_mon_types = ["'" + t + "'" for t in mon_types]
         query += "AND seen_type in (" + ",".join(query_mon_types) + ")"
@@ -202,8 +229,7 @@ class DbWebhookReader:
 
         query = query.format(extra_select, extra_join)
 
-        tsdt = datetime.utcfromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S")
-        res = self._db_exec.execute(query, (tsdt,))
+        res = self._db_exec.execute(query, args)
 
         ret = []
         for (encounter_id, spawnpoint_id, pokemon_id, latitude,
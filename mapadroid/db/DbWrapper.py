@@ -54,6 +54,9 @@ class DbWrapper:
     def executemany(self, sql, args, commit=False, **kwargs):
         return self._db_exec.executemany(sql, args, commit, **kwargs)
 
+    def get_pool_stats(self) -> Dict:
+        return self._db_exec.get_pool_stats()
+
     def autofetch_all(self, sql, args=(), **kwargs):
         """ Fetch all data and have it returned as a dictionary """
         return self._db_exec.autofetch_all(sql, args=args, **kwargs)
@@ -288,9 +291,9 @@ class DbWrapper:
             return list_of_coords
 
     def quests_from_db(self, ne_lat=None, ne_lon=None, sw_lat=None, sw_lon=None, o_ne_lat=None, o_ne_lon=None,
-                       o_sw_lat=None, o_sw_lon=None, timestamp=None, fence=None):
+                       o_sw_lat=None, o_sw_lon=None, timestamp=None, fence=None, stop_ids=None):
         """
-        Retrieve all the pokestops valid within the area set by geofence_helper
+        Retrieve all the pokestops valid within the area set by geofence_helper or of the given stop_ids
         :return: numpy array with coords
         """
         logger.debug3("DbWrapper::quests_from_db called")
@@ -308,6 +311,7 @@ class DbWrapper:
         )
 
         query_where = ""
+        query_args = None
 
         if ne_lat is not None and ne_lon is not None and sw_lat is not None and sw_lon is not None:
             oquery_where = (
@@ -332,7 +336,11 @@ class DbWrapper:
             query_where = query_where + " and ST_CONTAINS(ST_GEOMFROMTEXT( 'POLYGON(( {} ))'), " \
                                         "POINT(pokestop.latitude, pokestop.longitude))".format(str(fence))
 
-        res = self.execute(query + query_where)
+        if stop_ids is not None:
+            query_where = query_where + " AND pokestop.pokestop_id IN ({})".format(",".join(["%s"] * len(stop_ids)))
+            query_args = tuple(stop_ids)
+
+        res = self.execute(query + query_where, query_args)
 
         for (pokestop_id, latitude, longitude, quest_type, quest_stardust, quest_pokemon_id,
              quest_pokemon_form_id, quest_pokemon_costume_id, quest_reward_type,
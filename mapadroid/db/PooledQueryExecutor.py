@@ -1,5 +1,9 @@
+import os
+import threading
+import time
 from multiprocessing import Lock, Semaphore
 from multiprocessing.managers import SyncManager
+from typing import Dict, List, Tuple
 
 import mysql
 from mysql.connector import ProgrammingError
@@ -28,8 +32,18 @@ class PooledQueryExecutor:
 
         self._connection_semaphore = Semaphore(poolsize)
 
+        self._stats_mutex = threading.Lock()
+        self._reset_stats()
+
         self._init_pool()
 
+    def _reset_stats(self):
+        self._stats_queries: int = 0
+        self._stats_query_time: float = 0.0
+        self._stats_wait_time: float = 0.0
+        self._stats_max_wait: float = 0.0
+        self._stats_in_use: int = 0
+
     def _init_pool(self):
         logger.info("Connecting to DB")
         dbconfig = {
@@ -44,6 +58,53 @@ class PooledQueryExecutor:
                                              pool_size=self._poolsize,
                                              **dbconfig)
 
+    def _get_connection(self):
+        """
+        Blocks until a connection of the pool is available and checks it out
+        :return: a connection of the pool which has to be released by _release_connection
+        """
+        wait_start = time.time()
+        self._connection_semaphore.acquire()
+        try:
+            conn = self._pool.get_connection()
+        except Exception:
+            self._connection_semaphore.release()
+            raise
+        waited = time.time() - wait_start
+        with self._stats_mutex:
+            self._stats_wait_time += waited
+            self._stats_max_wait = max(self._stats_max_wait, waited)
+            self._stats_in_use += 1
+        return conn
+
+    def _release_connection(self, conn, cursor, started: float):
+        try:
+            self.close(conn, cursor)
+        finally:
+            self._connection_semaphore.release()
+            with self._stats_mutex:
+                self._stats_queries += 1
+                self._stats_query_time += time.time() - started
+                self._stats_in_use -= 1
+
+    def get_pool_stats(self) -> Dict:
+        """
+        Stats of the queries executed by this executor (per process in case of ProcessLocalQueryExecutor)
+        Times are given in seconds, the average ones per query.
+        """
+        with self._stats_mutex:
+            queries = self._stats_queries
+            return {
+                "executor": type(self).__name__,
+                "pid": os.getpid(),
+                "poolsize": self._poolsize,
+                "queries": queries,
+                "in_use": self._stats_in_use,
+                "avg_query_time": self._stats_query_time / queries if queries else 0.0,
+                "avg_wait_time": self._stats_wait_time / queries if queries else 0.0,
+                "max_wait_time": self._stats_max_wait
+            }
+
     def close(self, conn, cursor):
         """
         A method used to close connection of mysql.
@@ -73,8 +134,8 @@ class PooledQueryExecutor:
         :param commit: whether to commit
         :return: if commit, return None, else, return result
         """
-        self._connection_semaphore.acquire()
-        conn = self._pool.get_connection()
+        started = time.time()
+        conn = self._get_connection()
         cursor = self.setup_cursor(conn, **kwargs)
         get_id = kwargs.get('get_id', False)
         get_dict = kwargs.get('get_dict', False)
@@ -131,8 +192,7 @@ class PooledQueryExecutor:
             logger.error("Unspecified exception in dbWrapper: {}", str(e))
             return None
         finally:
-            self.close(conn, cursor)
-            self._connection_semaphore.release()
+            self._release_connection(conn, cursor, started)
 
     def executemany(self, sql, args, commit=False, **kwargs):
         """
@@ -148,8 +208,8 @@ class PooledQueryExecutor:
             return None
 
         # get connection form connection pool instead of create one.
-        self._connection_semaphore.acquire()
-        conn = self._pool.get_connection()
+        started = time.time()
+        conn = self._get_connection()
         cursor = conn.cursor()
 
         try:
@@ -168,8 +228,41 @@ class PooledQueryExecutor:
             logger.error("Unspecified exception in dbWrapper: {}", str(e))
             return None
         finally:
-            self.close(conn, cursor)
-            self._connection_semaphore.release()
+            self._release_connection(conn, cursor, started)
+
+    def execute_transaction(self, statements: List[Tuple[str, list]]) -> bool:
+        """
+        Runs executemany for all statements on a single connection and commits them at once.
+        In case the transaction fails, the statements are retried with a commit each to not lose all of them due to
+        one failing statement.
+        :param statements: list of (sql clause, args)
+        :return: whether the transaction succeeded
+        """
+        statements = [(sql, args) for sql, args in statements if args]
+        if not statements:
+            return True
+
+        started = time.time()
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        try:
+            for sql, args in statements:
+                cursor.executemany(sql, args)
+            conn.commit()
+            return True
+        except Exception as e:
+            logger.warning("Failed executing transaction of {} statements, retrying them separately: {}",
+                           len(statements), str(e))
+            try:
+                conn.rollback()
+            except mysql.connector.Error as err:
+                logger.error("Failed rolling back transaction: {}", str(err))
+        finally:
+            self._release_connection(conn, cursor, started)
+
+        for sql, args in statements:
+            self.executemany(sql, args, commit=True)
+        return False
 
     # ===================================================
     # =============== DB Helper Functions ===============
@@ -401,3 +494,53 @@ class PooledQueryExecutor:
             first_sub.append("\nAND".join(where_clause) % tuple(where_literal_val))
         query = query % tuple(first_sub)
         self.execute(query, args=tuple(actual_values), commit=True, raise_exc=True, **kwargs)
+
+
+class ProcessLocalQueryExecutor(PooledQueryExecutor):
+    """
+    Query executor without a manager process in between. Every process using an instance owns a pool of its own which
+    is (re-)created lazily on the first query after the instance has been forked or unpickled into a new process.
+    Thus poolsize applies per process.
+    """
+    def __init__(self, host, port, username, password, database, poolsize=1):
+        self._pool_pid = None
+        super().__init__(host, port, username, password, database, poolsize=poolsize)
+
+    def _init_pool(self):
+        # locks of the multiprocessing module would be shared by all forked processes, a pool is local though
+        self._pool_mutex = threading.Lock()
+        self._connection_semaphore = threading.BoundedSemaphore(self._poolsize)
+        self._stats_mutex = threading.Lock()
+        self._reset_stats()
+        logger.info("Connecting to DB (process {})", os.getpid())
+        self._pool = MySQLConnectionPool(pool_name="db_wrapper_pool_%s" % os.getpid(),
+                                         pool_size=self._poolsize,
+                                         host=self.host,
+                                         port=self.port,
+                                         user=self.user,
+                                         password=self.password,
+                                         database=self.database)
+        self._pool_pid = os.getpid()
+
+    def _get_connection(self):
+        if self._pool_pid != os.getpid():
+            # Connections of the parent must not be used by the child. Locks are created alongside the pool, the
+            # double check covers threads of the new process racing for the initialisation
+            with _process_init_mutex:
+                if self._pool_pid != os.getpid():
+                    self._init_pool()
+        return super()._get_connection()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for attribute in ("_pool", "_pool_mutex", "_connection_semaphore", "_stats_mutex"):
+            state[attribute] = None
+        state["_pool_pid"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._stats_mutex = threading.Lock()
+
+
+_process_init_mutex = threading.Lock()
@@ -0,0 +1,154 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+from mapadroid.db.PooledQueryExecutor import PooledQueryExecutor
+from mapadroid.utils.logging import LoggerEnums, get_logger
+
+logger = get_logger(LoggerEnums.database)
+
+
+class WriteBehindBuffer:
+    """
+    Buffers upserts of rows which are written over and over again (e.g. cells, stops and gyms seen by neighbouring
+    devices) for a short window instead of writing them right away.
+    Rows of the same query are coalesced by their primary key with the latest row winning. Every query is written as
+    a single multi-row insert once the buffer is flushed, which happens at the latest max_delay seconds after the
+    oldest pending row has been added or as soon as max_rows rows are pending.
+    Queries are flushed in the order they have first been added in to satisfy foreign keys (e.g. gym -> gymdetails).
+    Once written, the primary keys of rows added with a webhook type are handed to on_written, as are the keys
+    deferred until then.
+    """
+
+    def __init__(self, db_exec: PooledQueryExecutor, max_delay: float, max_rows: int = 10000,
+                 on_written: Optional[Callable[[str, Iterable[Hashable]], None]] = None):
+        self._db_exec: PooledQueryExecutor = db_exec
+        self._max_delay: float = max_delay
+        self._max_rows: int = max_rows
+        # query -> primary key -> row
+        self._pending: Dict[str, Dict[Hashable, tuple]] = OrderedDict()
+        # query -> webhook type of its rows
+        self._webhook_types: Dict[str, str] = {}
+        # webhook type and keys of changes to be handed to on_written once the pending rows have been written
+        self._deferred: List[Tuple[str, Iterable[Hashable]]] = []
+        self._on_written: Optional[Callable[[str, Iterable[Hashable]], None]] = on_written
+        self._pending_rows: int = 0
+        self._rows_added: int = 0
+        self._first_pending_at: Optional[float] = None
+        self._writing: bool = False
+        self._pending_mutex = threading.Lock()
+        # flushes are serialized to not have older rows overwrite newer ones of a concurrent flush
+        self._flush_mutex = threading.Lock()
+        self._stop_event = threading.Event()
+        self._flush_thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """
+        Starts the thread flushing the buffer in time. Needs to be called within the process using the buffer.
+        """
+        if self._flush_thread is not None:
+            return
+        self._stop_event.clear()
+        self._flush_thread = threading.Thread(name="WriteBehindBuffer", target=self._flush_loop)
+        self._flush_thread.daemon = True
+        self._flush_thread.start()
+
+    def stop(self):
+        """
+        Stops the flush thread and writes all rows still pending
+        """
+        self._stop_event.set()
+        if self._flush_thread is not None:
+            self._flush_thread.join()
+            self._flush_thread = None
+        self.flush()
+
+    def add(self, query: str, rows: List[tuple], key_index: int = 0, webhook_type: Optional[str] = None):
+        """
+        Adds rows to be written using the given query
+        :param query: the INSERT ... ON DUPLICATE KEY UPDATE clause
+        :param rows: the args of the query
+        :param key_index: index of the primary key within the rows
+        :param webhook_type: type of the webhook to send the rows with once written, if any
+        """
+        if not rows:
+            return
+        with self._pending_mutex:
+            if webhook_type is not None:
+                self._webhook_types[query] = webhook_type
+            pending = self._pending.setdefault(query, OrderedDict())
+            previous_size = len(pending)
+            for row in rows:
+                pending[row[key_index]] = row
+            self._pending_rows += len(pending) - previous_size
+            self._rows_added += len(rows)
+            if self._first_pending_at is None:
+                self._first_pending_at = time.time()
+            buffer_full = self._pending_rows >= self._max_rows
+        if buffer_full:
+            logger.debug2("Write-behind buffer is full, flushing")
+            self.flush()
+
+    def defer(self, webhook_type: str, keys: Iterable[Hashable]) -> bool:
+        """
+        Defers changes written elsewhere until the rows pending have been written as the changes may refer to them
+        (e.g. raids of gyms seen the first time). Deferred changes are dropped if writing the rows fails.
+        :return: whether the changes have been deferred rather than there being no rows pending or being written
+        """
+        with self._pending_mutex:
+            if not self._pending and not self._writing:
+                return False
+            self._deferred.append((webhook_type, keys))
+            if self._first_pending_at is None:
+                # deferred while rows are being written, handed over by the next flush
+                self._first_pending_at = time.time()
+            return True
+
+    def flush(self) -> bool:
+        """
+        Writes all pending rows within a single transaction
+        :return: whether the transaction succeeded
+        """
+        with self._flush_mutex:
+            with self._pending_mutex:
+                pending, self._pending = self._pending, OrderedDict()
+                deferred, self._deferred = self._deferred, []
+                rows_added, self._rows_added = self._rows_added, 0
+                rows_to_write, self._pending_rows = self._pending_rows, 0
+                self._first_pending_at = None
+                self._writing = bool(pending)
+            written = True
+            if pending:
+                logger.debug2("Flushing write-behind buffer: {} upserts coalesced to {} rows of {} queries",
+                              rows_added, rows_to_write, len(pending))
+                try:
+                    written = self._db_exec.execute_transaction(
+                        [(query, list(rows.values())) for query, rows in pending.items()])
+                finally:
+                    with self._pending_mutex:
+                        self._writing = False
+            if written and self._on_written is not None:
+                for query, rows in pending.items():
+                    webhook_type = self._webhook_types.get(query, None)
+                    if webhook_type is not None:
+                        self._on_written(webhook_type, rows.keys())
+                for webhook_type, keys in deferred:
+                    self._on_written(webhook_type, keys)
+            return written
+
+    def _flush_loop(self):
+        while not self._stop_event.is_set():
+            with self._pending_mutex:
+                first_pending_at = self._first_pending_at
+            if first_pending_at is None:
+                # any row added meanwhile is due max_delay after being added, i.e. after the next wakeup
+                self._stop_event.wait(self._max_delay)
+                continue
+            remaining = first_pending_at + self._max_delay - time.time()
+            if remaining > 0 and self._stop_event.wait(remaining):
+                break
+            try:
+                self.flush()
+            except Exception as e:
+                logger.exception("Failed flushing write-behind buffer: {}", e)
@@ -1,4 +1,7 @@
 import sys
+from typing import Any, List, Tuple
+
+import numpy as np
 
 from mapadroid.utils.logging import LoggerEnums, get_logger
 
@@ -28,6 +31,9 @@ class GeofenceHelper:
                 exclude_geofence, excluded=True, fence_fallback=fence_name)
             logger.debug2("Loaded {} geofenced and {} excluded areas.", len(self.geofenced_areas),
                           len(self.excluded_areas))
+        # polygons are compiled once to check whole arrays of coordinates against them
+        self._geofenced_polygons = self._compile_polygons(self.geofenced_areas)
+        self._excluded_polygons = self._compile_polygons(self.excluded_areas)
 
     def get_polygon_from_fence(self):
         max_lat, min_lat, max_lon, min_lon = -90, 90, -180, 180
@@ -42,18 +48,7 @@ class GeofenceHelper:
         return min_lat, min_lon, max_lat, max_lon
 
     def is_coord_inside_include_geofence(self, coordinate):
-        # Coordinate is not valid if in one excluded area.
-        if self._is_excluded(coordinate):
-            return False
-
-        # Coordinate is geofenced if in one geofenced area.
-        if self.geofenced_areas:
-            for va in self.geofenced_areas:
-                if self._in_area(coordinate, va):
-                    return True
-        else:
-            return True
-        return False
+        return bool(self.contains_many(np.array([(coordinate[0], coordinate[1])], dtype=float))[0])
 
     def get_geofenced_coordinates(self, coordinates):
 
@@ -62,24 +57,30 @@ class GeofenceHelper:
         logger.debug('Using matplotlib: {}.', self.use_matplotlib)
         logger.debug2('Found {} coordinates to geofence.', len(coordinates))
 
-        geofenced_coordinates = []
-        for coord in coordinates:
-            # Coordinate is not valid if in one excluded area.
-            if self._is_excluded(coord):
-                continue
-
-            # Coordinate is geofenced if in one geofenced area.
-            if self.geofenced_areas:
-                for va in self.geofenced_areas:
-                    if self._in_area(coord, va):
-                        geofenced_coordinates.append(coord)
-                        break
-            else:
-                geofenced_coordinates.append(coord)
+        inside = self.contains_many(np.array([(coord[0], coord[1]) for coord in coordinates], dtype=float))
+        geofenced_coordinates = [coord for coord, coord_inside in zip(coordinates, inside) if coord_inside]
 
         logger.debug2("Geofenced to {} coordinates", len(geofenced_coordinates))
         return geofenced_coordinates
 
+    def contains_many(self, coordinates: np.ndarray) -> np.ndarray:
+        """
+        Checks which coordinates are inside one of the geofenced areas (or any if there are none) and not inside one
+        of the excluded areas
+        :param coordinates: array of shape (n, 2) holding the latitudes and longitudes
+        :return: boolean array of shape (n,)
+        """
+        coordinates = np.asarray(coordinates, dtype=float).reshape(-1, 2)
+        if self.geofenced_areas:
+            inside = self._in_any_polygon(coordinates, self._geofenced_polygons)
+        else:
+            inside = np.ones(len(coordinates), dtype=bool)
+
+        if self._excluded_polygons:
+            candidates = np.flatnonzero(inside)
+            inside[candidates] = ~self._in_any_polygon(coordinates[candidates], self._excluded_polygons)
+        return inside
+
     def is_enabled(self):
         return self.geofenced_areas or self.excluded_areas
 
@@ -121,66 +122,54 @@ class GeofenceHelper:
 
         return geofences
 
-    def _is_excluded(self, coordinate):
-        for ea in self.excluded_areas:
-            if self._in_area(coordinate, ea):
-                return True
-
-        return False
-
-    def _in_area(self, coordinate, area):
-        point = {'lat': coordinate[0], 'lon': coordinate[1]}
-        polygon = area['polygon']
-        if self.use_matplotlib:
-            return self.is_point_in_polygon_matplotlib(point, polygon)
-        else:
-            return self.is_point_in_polygon_custom(point, polygon)
-
-    @staticmethod
-    def is_point_in_polygon_matplotlib(point, polygon):
-        point_tuple = (point['lat'], point['lon'])
+    def _compile_polygons(self, areas) -> List[Tuple[Tuple[float, float, float, float], np.ndarray, Any]]:
+        """
+        Converts the polygons of the areas to arrays of (lat, lon) vertices along with their bounding box and, if
+        matplotlib is available, a Path
+        """
         polygons = []
-        for coord in polygon:
-            coord_tuple = (coord['lat'], coord['lon'])
-            polygons.append(coord_tuple)
-
-        polygons.append(polygons[0])
-        path = Path(polygons)
-        return path.contains_point(point_tuple)
+        for area in areas:
+            if not area['polygon']:
+                continue
+            vertices = np.array([(coord['lat'], coord['lon']) for coord in area['polygon']], dtype=float)
+            bounding_box = (vertices[:, 0].min(), vertices[:, 0].max(), vertices[:, 1].min(), vertices[:, 1].max())
+            path = Path(np.vstack((vertices, vertices[:1]))) if self.use_matplotlib else None
+            polygons.append((bounding_box, vertices, path))
+        return polygons
+
+    def _in_any_polygon(self, coordinates: np.ndarray, polygons) -> np.ndarray:
+        inside = np.zeros(len(coordinates), dtype=bool)
+        for (min_lat, max_lat, min_lon, max_lon), vertices, path in polygons:
+            # only coordinates within the bounding box not inside a previous polygon need to be checked
+            candidates = np.flatnonzero(~inside
+                                        & (coordinates[:, 0] >= min_lat) & (coordinates[:, 0] <= max_lat)
+                                        & (coordinates[:, 1] >= min_lon) & (coordinates[:, 1] <= max_lon))
+            if len(candidates) == 0:
+                continue
+            if path is not None:
+                inside[candidates] = path.contains_points(coordinates[candidates])
+            else:
+                inside[candidates] = self._points_in_polygon(coordinates[candidates], vertices)
+        return inside
 
     @staticmethod
-    def is_point_in_polygon_custom(point, polygon):
-        # Initialize first coordinate as default.
-        max_lat = polygon[0]['lat']
-        min_lat = polygon[0]['lat']
-        max_lon = polygon[0]['lon']
-        min_lon = polygon[0]['lon']
-
-        for coords in polygon:
-            max_lat = max(coords['lat'], max_lat)
-            min_lat = min(coords['lat'], min_lat)
-            max_lon = max(coords['lon'], max_lon)
-            min_lon = min(coords['lon'], min_lon)
-
-        if ((point['lat'] > max_lat) or (point['lat'] < min_lat) or
-                (point['lon'] > max_lon) or (point['lon'] < min_lon)):
-            return False
-
-        inside = False
-        lat1, lon1 = polygon[0]['lat'], polygon[0]['lon']
-        poly_sides = len(polygon)
-        for poly_point in range(1, poly_sides + 1):
-            lat2, lon2 = polygon[poly_point % poly_sides]['lat'], polygon[poly_point % poly_sides]['lon']
-            if (min(lon1, lon2) < point['lon'] <= max(lon1, lon2) and
-                    point['lat'] <= max(lat1, lat2)):
-                if lon1 != lon2:
-                    lat_intersection = ((point['lon'] - lon1) * (lat2 - lat1) / (lon2 - lon1) + lat1)
-
-                if lat1 == lat2 or point['lat'] <= lat_intersection:
-                    inside = not inside
-
+    def _points_in_polygon(points: np.ndarray, vertices: np.ndarray) -> np.ndarray:
+        """
+        Ray casting of all points at once, iterating the edges of the polygon
+        """
+        lats = points[:, 0]
+        lons = points[:, 1]
+        inside = np.zeros(len(points), dtype=bool)
+        lat1, lon1 = vertices[-1]
+        for lat2, lon2 in vertices:
+            # edges along a meridian are never crossed
+            if lon1 != lon2:
+                crossing = (min(lon1, lon2) < lons) & (lons <= max(lon1, lon2)) & (lats <= max(lat1, lat2))
+                if lat1 != lat2:
+                    lat_intersection = (lons - lon1) * (lat2 - lat1) / (lon2 - lon1) + lat1
+                    crossing &= lats <= lat_intersection
+                inside ^= crossing
             lat1, lon1 = lat2, lon2
-
         return inside
 
     def get_middle_from_fence(self):
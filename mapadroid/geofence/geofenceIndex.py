@@ -0,0 +1,106 @@
+import math
+from typing import List
+
+import numpy as np
+
+from mapadroid.geofence.geofenceHelper import GeofenceHelper
+from mapadroid.utils.logging import LoggerEnums, get_logger
+
+logger = get_logger(LoggerEnums.system)
+
+_OUTSIDE = 0
+_INSIDE = 1
+_BOUNDARY = 2
+
+
+class GeofenceIndex:
+    """
+    Grid over the geofences of multiple areas to check coordinates against all of them at once.
+    Every cell of the grid is known to be inside an area, outside of all areas or to be crossed by the border of an
+    area. Only coordinates within the latter are checked against the polygons of the areas.
+    """
+
+    def __init__(self, geofence_helpers: List[GeofenceHelper], resolution: int = 256):
+        self._helpers: List[GeofenceHelper] = [helper for helper in geofence_helpers if helper.geofenced_areas]
+        # areas without geofenced areas contain anything but their excluded areas and are not indexed
+        self._unbounded: List[GeofenceHelper] = [helper for helper in geofence_helpers
+                                                 if not helper.geofenced_areas]
+        self._resolution: int = max(1, resolution)
+        self._cells = np.zeros((0, 0), dtype=np.int8)
+        self._min_lat = self._min_lon = 0.0
+        self._cell_height = self._cell_width = 1.0
+        if self._helpers:
+            self._build()
+
+    def _build(self):
+        vertices = np.vstack([np.array([(coord['lat'], coord['lon']) for coord in area['polygon']], dtype=float)
+                              for helper in self._helpers for area in helper.geofenced_areas if area['polygon']])
+        self._min_lat, self._min_lon = vertices.min(axis=0)
+        max_lat, max_lon = vertices.max(axis=0)
+        # cells slightly larger than needed to have the max vertices fall into the last cell
+        self._cell_height = max(max_lat - self._min_lat, 1e-9) / self._resolution * (1 + 1e-9)
+        self._cell_width = max(max_lon - self._min_lon, 1e-9) / self._resolution * (1 + 1e-9)
+        self._cells = np.full((self._resolution, self._resolution), _OUTSIDE, dtype=np.int8)
+
+        rows, cols = np.mgrid[0:self._resolution, 0:self._resolution]
+        centers = np.column_stack(((rows.ravel() + 0.5) * self._cell_height + self._min_lat,
+                                   (cols.ravel() + 0.5) * self._cell_width + self._min_lon))
+        for helper in self._helpers:
+            boundary = np.zeros(self._cells.shape, dtype=bool)
+            for area in helper.geofenced_areas + helper.excluded_areas:
+                self._mark_border(boundary, area['polygon'])
+            # any cell not crossed by a border is either entirely inside or outside, its center tells which
+            inside = np.zeros(self._cells.shape, dtype=bool)
+            candidates = np.flatnonzero(~boundary.ravel())
+            inside.ravel()[candidates] = helper.contains_many(centers[candidates])
+            self._cells[boundary & (self._cells == _OUTSIDE)] = _BOUNDARY
+            self._cells[inside] = _INSIDE
+        logger.debug2("Indexed {} areas: {} cells inside, {} on a border", len(self._helpers),
+                      np.count_nonzero(self._cells == _INSIDE), np.count_nonzero(self._cells == _BOUNDARY))
+
+    def _mark_border(self, boundary: np.ndarray, polygon):
+        if not polygon:
+            return
+        vertices = np.array([(coord['lat'], coord['lon']) for coord in polygon], dtype=float)
+        for (lat1, lon1), (lat2, lon2) in zip(vertices, np.roll(vertices, -1, axis=0)):
+            # points along the edge less than a cell apart, the edge crosses the cells of each pair of points only
+            steps = int(math.ceil(max(abs(lat2 - lat1) / self._cell_height, abs(lon2 - lon1) / self._cell_width))) + 1
+            fractions = np.linspace(0, 1, steps + 1)
+            rows = self._clip_cells((lat1 + (lat2 - lat1) * fractions - self._min_lat) / self._cell_height)
+            cols = self._clip_cells((lon1 + (lon2 - lon1) * fractions - self._min_lon) / self._cell_width)
+            boundary[rows[:-1], cols[:-1]] = True
+            boundary[rows[:-1], cols[1:]] = True
+            boundary[rows[1:], cols[:-1]] = True
+            boundary[rows[1:], cols[1:]] = True
+
+    def _clip_cells(self, positions: np.ndarray) -> np.ndarray:
+        return np.clip(np.floor(positions).astype(int), 0, self._resolution - 1)
+
+    def contains_many(self, coordinates: np.ndarray) -> np.ndarray:
+        """
+        Checks which coordinates are inside any of the areas
+        :param coordinates: array of shape (n, 2) holding the latitudes and longitudes
+        :return: boolean array of shape (n,)
+        """
+        coordinates = np.asarray(coordinates, dtype=float).reshape(-1, 2)
+        inside = np.zeros(len(coordinates), dtype=bool)
+        if self._helpers:
+            rows = np.floor((coordinates[:, 0] - self._min_lat) / self._cell_height)
+            cols = np.floor((coordinates[:, 1] - self._min_lon) / self._cell_width)
+            within = np.flatnonzero((rows >= 0) & (rows < self._resolution) & (cols >= 0) & (cols < self._resolution))
+            states = self._cells[rows[within].astype(int), cols[within].astype(int)]
+            inside[within[states == _INSIDE]] = True
+            on_border = within[states == _BOUNDARY]
+            for helper in self._helpers:
+                if len(on_border) == 0:
+                    break
+                contained = helper.contains_many(coordinates[on_border])
+                inside[on_border[contained]] = True
+                on_border = on_border[~contained]
+        for helper in self._unbounded:
+            candidates = np.flatnonzero(~inside)
+            inside[candidates] = helper.contains_many(coordinates[candidates])
+        return inside
+
+    def __len__(self):
+        return len(self._helpers) + len(self._unbounded)
@@ -1,11 +1,10 @@
-import gzip
-import io
 import json
 import socket
 import sys
 import time
+import zlib
 from functools import wraps
-from multiprocessing import JoinableQueue, Process
+from multiprocessing import Process
 from threading import RLock
 from typing import Any, Dict, Optional, Union
 
@@ -15,17 +14,66 @@ from gevent.pywsgi import WSGIServer
 from mapadroid.data_manager.dm_exceptions import UpdateIssue
 from mapadroid.mad_apk import (APKType, lookup_package_info, parse_frontend,
                                stream_package, supported_pogo_version)
+from mapadroid.mitm_receiver.MitmDataQueue import MitmDataQueue
 from mapadroid.mitm_receiver.MitmMapper import MitmMapper
+from mapadroid.mitm_receiver.OriginAuthCache import OriginAuthCache
 from mapadroid.utils import MappingManager
-from mapadroid.utils.authHelper import check_auth
 from mapadroid.utils.autoconfig import PDConfig, RGCConfig, origin_generator
 from mapadroid.utils.collections import Location
 from mapadroid.utils.logging import (LoggerEnums, LogLevelChanger, get_logger,
                                      get_origin_logger)
 
+try:
+    import orjson
+except ImportError:
+    # Pass as this is an optional requirement, orjson parses the protos a lot faster than json if installed
+    orjson = None
+
 logger = get_logger(LoggerEnums.mitm)
 app = Flask(__name__)
 
+# bytes read from the request at once while decompressing it
+REQUEST_READ_CHUNK_SIZE = 64 * 1024
+# method IDs of the protos processed, anything else is trash to us
+PROTO_TYPES_PROCESSED = frozenset((106, 102, 101, 104, 4, 156, 145))
+
+
+def create_listener(listen_ip: str, listen_port: int, backlog: int = 1024) -> socket.socket:
+    """
+    Creates the socket to be shared by multiple receiver processes, every process accepting connections of it
+    """
+    listener = socket.socket(socket.AF_INET6 if ":" in listen_ip else socket.AF_INET, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind((listen_ip, listen_port))
+    listener.listen(backlog)
+    listener.setblocking(False)
+    return listener
+
+
+def read_gzipped_request() -> bytes:
+    """
+    Decompresses the body of the request while reading it from the stream rather than buffering the compressed data
+    """
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    decompressed = bytearray()
+    while True:
+        chunk = request.stream.read(REQUEST_READ_CHUNK_SIZE)
+        if not chunk:
+            break
+        decompressed += decompressor.decompress(chunk)
+    decompressed += decompressor.flush()
+    return bytes(decompressed)
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # e.g. integers beyond 64 bit or NaN, which json is less strict about
+            pass
+    return json.loads(data)
+
 
 def validate_accepted(func) -> Any:
     @wraps(func)
@@ -67,11 +115,11 @@ def validate_session(func) -> Any:
 
 class EndpointAction(object):
 
-    def __init__(self, action, application_args, mapping_manager: MappingManager, data_manager):
+    def __init__(self, action, application_args, auth_cache: OriginAuthCache, data_manager):
         self.action = action
         self.response = Response(status=200, headers={})
         self.application_args = application_args
-        self.mapping_manager: MappingManager = mapping_manager
+        self.auth_cache: OriginAuthCache = auth_cache
         self.__data_manager = data_manager
 
     def __call__(self, *args, **kwargs):
@@ -89,7 +137,7 @@ class EndpointAction(object):
                 abort = False
         elif 'autoconfig/' in str(request.url):
             auth = request.headers.get('Authorization', None)
-            if not check_auth(logger, auth, self.application_args, self.mapping_manager.get_auths()):
+            if not self.auth_cache.check_auth(logger, auth, self.application_args):
                 origin_logger.warning("Unauthorized attempt to POST from {}", request.remote_addr)
                 self.response = Response(status=403, headers={})
                 abort = True
@@ -101,13 +149,13 @@ class EndpointAction(object):
                     self.response = Response(status=403, headers={})
         elif str(request.url_rule) == '/origin_generator':
             auth = request.headers.get('Authorization', None)
-            if not check_auth(logger, auth, self.application_args, self.mapping_manager.get_auths()):
+            if not self.auth_cache.check_auth(logger, auth, self.application_args):
                 origin_logger.warning("Unauthorized attempt to POST from {}", request.remote_addr)
                 self.response = Response(status=403, headers={})
                 abort = True
         elif 'download' in request.url:
             auth = request.headers.get('Authorization', None)
-            if not check_auth(logger, auth, self.application_args, self.mapping_manager.get_auths()):
+            if not self.auth_cache.check_auth(logger, auth, self.application_args):
                 origin_logger.warning("Unauthorized attempt to POST from {}", request.remote_addr)
                 self.response = Response(status=403, headers={})
                 abort = True
@@ -116,15 +164,13 @@ class EndpointAction(object):
                 origin_logger.warning("Missing Origin header in request")
                 self.response = Response(status=500, headers={})
                 abort = True
-            elif self.mapping_manager.get_all_devicemappings().keys() is not None and \
-                    origin not in self.mapping_manager.get_all_devicemappings().keys():
+            elif not self.auth_cache.is_origin_allowed(origin):
                 origin_logger.warning("MITMReceiver request without Origin or disallowed Origin")
                 self.response = Response(status=403, headers={})
                 abort = True
-            elif self.mapping_manager.get_auths() is not None:
+            elif self.auth_cache.auth_required():
                 auth = request.headers.get('Authorization', None)
-                if auth is None or not check_auth(origin_logger, auth, self.application_args,
-                                                  self.mapping_manager.get_auths()):
+                if auth is None or not self.auth_cache.check_auth(origin_logger, auth, self.application_args):
                     origin_logger.warning("Unauthorized attempt to POST from {}", request.remote_addr)
                     self.response = Response(status=403, headers={})
                     abort = True
@@ -132,20 +178,14 @@ class EndpointAction(object):
         if not abort:
             try:
                 content_encoding = request.headers.get('Content-Encoding', None)
+                content_type = request.headers.get('Content-Type', None)
                 if content_encoding and content_encoding == "gzip":
-                    # we need to unpack the data first
-                    # https://stackoverflow.com/questions/28304515/receiving-gzip-with-flask
-                    compressed_data = io.BytesIO(request.data)
-                    text_data = gzip.GzipFile(fileobj=compressed_data, mode='r')
-                    request_data = json.loads(text_data.read())
+                    # gzipped data is always JSON
+                    request_data = loads(read_gzipped_request())
+                elif content_type and content_type == "application/json":
+                    request_data = loads(request.data)
                 else:
                     request_data = request.data
-
-                content_type = request.headers.get('Content-Type', None)
-                if content_type and content_type == "application/json":
-                    request_data = json.loads(request_data)
-                else:
-                    request_data = request_data
                 response_payload = self.action(origin, request_data, *args, **kwargs)
                 if response_payload is None:
                     response_payload = ""
@@ -162,19 +202,22 @@ class EndpointAction(object):
 
 class MITMReceiver(Process):
     def __init__(self, listen_ip, listen_port, mitm_mapper, args_passed, mapping_manager: MappingManager,
-                 db_wrapper, data_manager, storage_obj, data_queue: JoinableQueue,
-                 name=None, enable_configmode: Optional[bool] = False):
+                 db_wrapper, data_manager, storage_obj, data_queue: MitmDataQueue,
+                 name=None, enable_configmode: Optional[bool] = False, listener: Optional[socket.socket] = None):
         Process.__init__(self, name=name)
         self.__application_args = args_passed
         self.__mapping_manager = mapping_manager
+        self.__auth_cache = OriginAuthCache(mapping_manager)
         self.__listen_ip = listen_ip
         self.__listen_port = listen_port
+        # socket shared with other receiver processes, listen on our own if not given
+        self.__listener: Optional[socket.socket] = listener
         self.__mitm_mapper: MitmMapper = mitm_mapper
         self.__data_manager = data_manager
         self.__hopper_mutex = RLock()
         self._db_wrapper = db_wrapper
         self.__storage_obj = storage_obj
-        self._data_queue: JoinableQueue = data_queue
+        self._data_queue: MitmDataQueue = data_queue
         self.app = Flask("MITMReceiver")
         self.add_endpoint(endpoint='/get_addresses/', endpoint_name='get_addresses/',
                           handler=self.get_addresses,
@@ -224,12 +267,15 @@ class MITMReceiver(Process):
 
     def shutdown(self):
         logger.info("MITMReceiver stop called...")
-        for _ in range(self.__application_args.mitmreceiver_data_workers):
-            self._add_to_queue(None)
+        # stops the processors of all lanes
+        self._add_to_queue(None)
 
     def run(self):
-        httpsrv = WSGIServer((self.__listen_ip, int(
-            self.__listen_port)), self.app.wsgi_app, log=LogLevelChanger)
+        if self.__listener is not None:
+            listener = self.__listener
+        else:
+            listener = (self.__listen_ip, int(self.__listen_port))
+        httpsrv = WSGIServer(listener, self.app.wsgi_app, log=LogLevelChanger)
         try:
             httpsrv.serve_forever()
         except KeyboardInterrupt:
@@ -241,7 +287,7 @@ class MITMReceiver(Process):
             logger.error("Invalid REST method specified")
             sys.exit(1)
         self.app.add_url_rule(endpoint, endpoint_name,
-                              EndpointAction(handler, self.__application_args, self.__mapping_manager,
+                              EndpointAction(handler, self.__application_args, self.__auth_cache,
                                              self.__data_manager),
                               methods=methods_passed)
 
@@ -269,7 +315,7 @@ class MITMReceiver(Process):
             origin_logger.warning("Could not read method ID. Stopping processing of proto")
             return
 
-        if proto_type not in (106, 102, 101, 104, 4, 156, 145):
+        if proto_type not in PROTO_TYPES_PROCESSED:
             # trash protos - ignoring
             return
 
@@ -1,23 +1,35 @@
 import threading
 import time
-from multiprocessing import JoinableQueue
+from typing import List, Optional, Tuple
 
 from mapadroid.db.DbWrapper import DbWrapper
+from mapadroid.mitm_receiver.MitmDataQueue import MitmDataQueue
 from mapadroid.mitm_receiver.MitmMapper import MitmMapper
 from mapadroid.mitm_receiver.SerializedMitmDataProcessor import \
     SerializedMitmDataProcessor
 from mapadroid.utils.logging import LoggerEnums, get_logger
+from mapadroid.webhook.WebhookStream import WebhookStream
 
 logger = get_logger(LoggerEnums.mitm)
 
 
 class MitmDataProcessorManager():
-    def __init__(self, args, mitm_mapper: MitmMapper, db_wrapper: DbWrapper):
+    _processor_stop_timeout = 10
+    # items queued in a single lane considered to be a backlog
+    _lane_size_warning = 50
+
+    def __init__(self, args, mitm_mapper: MitmMapper, db_wrapper: DbWrapper,
+                 webhook_stream: Optional[WebhookStream] = None):
         self._worker_threads = []
         self._args = args
-        self._mitm_data_queue: JoinableQueue = JoinableQueue()
+        # one lane per processor
+        self._mitm_data_queue: MitmDataQueue = MitmDataQueue(args.mitmreceiver_data_workers,
+                                                             max_size=args.mitm_queue_max_size,
+                                                             shed_types=self._get_shed_types(args))
+        self._last_shed_counts: List[Tuple[int, int]] = []
         self._mitm_mapper: MitmMapper = mitm_mapper
         self._db_wrapper: DbWrapper = db_wrapper
+        self._webhook_stream: Optional[WebhookStream] = webhook_stream
         self._queue_check_thread = None
         self._stop_queue_check_thread = False
 
@@ -29,32 +41,56 @@ class MitmDataProcessorManager():
         return self._mitm_data_queue
 
     def get_queue_size(self):
-        # for whatever reason, there's no actual implementation of qsize()
-        # on MacOS. There are better solutions for this but c'mon, who is
-        # running MAD on MacOS anyway?
-        try:
-            item_count = self._mitm_data_queue.qsize()
-        except NotImplementedError:
-            item_count = 0
+        return self._mitm_data_queue.qsize()
+
+    @staticmethod
+    def _get_shed_types(args) -> List[int]:
+        return [int(proto_type) for proto_type in args.mitm_queue_shed_types.split(",") if proto_type.strip()]
+
+    def get_lane_stats(self) -> List[Tuple[int, float]]:
+        """
+        :return: the amount of items queued and the average seconds they waited recently for every lane
+        """
+        return [(self._mitm_data_queue.get_lane_size(lane), self._mitm_data_queue.get_lane_latency(lane))
+                for lane in range(self._mitm_data_queue.get_lane_count())]
 
-        return item_count
+    def get_shed_counts(self) -> List[Tuple[int, int]]:
+        """
+        :return: the amount of items dropped as the lane was full and of items superseded by newer ones per lane
+        """
+        return [self._mitm_data_queue.get_lane_shed_counts(lane)
+                for lane in range(self._mitm_data_queue.get_lane_count())]
 
     def _queue_size_check(self):
         while not self._stop_queue_check_thread:
-            item_count = self.get_queue_size()
-            if item_count > 50:
-                logger.warning("MITM data processing workers are falling behind! Queue length: {}", item_count)
+            for lane, (item_count, latency) in enumerate(self.get_lane_stats()):
+                if item_count > self._lane_size_warning:
+                    logger.warning("MITM data processor of lane {} is falling behind! Queue length: {}, items "
+                                   "waited {:.1f}s recently", lane, item_count, latency)
+            shed_counts = self.get_shed_counts()
+            for lane, (shed_full, shed_coalesced) in enumerate(shed_counts):
+                last_shed_full, last_shed_coalesced = (self._last_shed_counts[lane] if self._last_shed_counts
+                                                       else (0, 0))
+                if shed_full > last_shed_full:
+                    logger.warning("Lane {} of the MITM data processors is full, dropped {} items (total: {})",
+                                   lane, shed_full - last_shed_full, shed_full)
+                if shed_coalesced > last_shed_coalesced:
+                    logger.info("Lane {} of the MITM data processors skipped {} items superseded by newer ones "
+                                "(total: {})", lane, shed_coalesced - last_shed_coalesced, shed_coalesced)
+            self._last_shed_counts = shed_counts
 
             time.sleep(3)
 
     def launch_processors(self):
-        for i in range(self._args.mitmreceiver_data_workers):
+        for i in range(self._mitm_data_queue.get_lane_count()):
             data_processor: SerializedMitmDataProcessor = SerializedMitmDataProcessor(
                 self._mitm_data_queue,
+                i,
                 self._args,
                 self._mitm_mapper,
                 self._db_wrapper,
-                name="SerialiedMitmDataProcessor-%s" % str(i))
+                name="SerialiedMitmDataProcessor-%s" % str(i),
+                webhook_stream=self._webhook_stream)
 
             data_processor.start()
             self._worker_threads.append(data_processor)
@@ -63,9 +99,13 @@ class MitmDataProcessorManager():
         self._stop_queue_check_thread = True
 
         logger.info("Stopping {} MITM data processors", len(self._worker_threads))
+        # let the processors stop on their own to have them flush buffered data
+        self._mitm_data_queue.put(None)
         for worker_thread in self._worker_threads:
-            worker_thread.terminate()
-            worker_thread.join()
+            worker_thread.join(self._processor_stop_timeout)
+            if worker_thread.is_alive():
+                worker_thread.terminate()
+                worker_thread.join()
         logger.info("Stopped MITM data processors")
 
         if self._mitm_data_queue is not None:
@@ -0,0 +1,162 @@
+import time
+import zlib
+from multiprocessing import JoinableQueue, Value
+from queue import Empty
+from typing import Callable, Hashable, Iterable, List, Optional, Tuple
+
+# weight of the latest wait when averaging the time items wait in a lane
+LATENCY_SMOOTHING = 0.2
+# items taken from a lane at most at once unless the lane is backlogged
+MAX_BATCH_SIZE = 100
+# seconds to wait for items counted by a lane but still being fed into it
+FEED_TIMEOUT = 1
+
+
+class MitmDataQueue:
+    """
+    Queue of the MITM data partitioned into lanes by the origin, one lane per data processor.
+    All data of a device ends up in the same lane and is thus processed in the order it has been received in.
+    Every lane keeps track of the time its items wait to be processed. Shared between processes by forking.
+
+    Data of the shed_types (e.g. GMOs) is coalesced while queued: of multiple items of the same type, origin and
+    location only the latest is processed. Once a lane holds max_size items, new data of the shed types is refused
+    to bound the lane even if its processor is stuck, and the processor takes all items at once keeping only the
+    latest item of the shed types of every origin. Any other data is never dropped.
+    """
+
+    def __init__(self, lanes: int, max_size: int = 0, shed_types: Iterable[int] = ()):
+        self._lanes: List[JoinableQueue] = [JoinableQueue() for _ in range(max(1, lanes))]
+        self._latencies = [Value('d', 0.0) for _ in self._lanes]
+        self._max_size: int = max_size
+        self._shed_types = frozenset(shed_types)
+        self._shed_full = [Value('L', 0) for _ in self._lanes]
+        self._shed_coalesced = [Value('L', 0) for _ in self._lanes]
+
+    def get_lane_count(self) -> int:
+        return len(self._lanes)
+
+    def lane_of(self, origin: str) -> int:
+        # crc32 rather than hash() to get the same lane in every process regardless of the hash seed
+        return zlib.crc32(origin.encode('utf-8')) % len(self._lanes)
+
+    def put(self, item: Optional[Tuple[float, dict, str]]) -> bool:
+        """
+        Adds (timestamp, data, origin) to the lane of the origin. None stops the processors of all lanes.
+        :return: whether the item has been queued rather than shed as the lane is full
+        """
+        if item is None:
+            for lane in self._lanes:
+                lane.put(None)
+            return True
+        lane = self.lane_of(item[2])
+        if self._max_size > 0 and self._is_sheddable(item) and self.get_lane_size(lane) >= self._max_size:
+            self._increment(self._shed_full[lane])
+            return False
+        self._lanes[lane].put((time.time(), item))
+        return True
+
+    def get(self, lane: int) -> Optional[Tuple[float, dict, str]]:
+        """
+        Waits for the next item of the lane and records how long it has been waiting
+        """
+        return self._unwrap(lane, self._lanes[lane].get())
+
+    def get_batch(self, lane: int, max_items: int = MAX_BATCH_SIZE) -> List[Optional[Tuple[float, dict, str]]]:
+        """
+        Waits for the next item of the lane and takes any other item queued up to max_items at once, coalescing
+        the items of the shed types. If the lane holds max_size items, all of them are taken and only the latest
+        item of the shed types of every origin is kept. The batch ends with None if the processor is to be stopped.
+        """
+        batch = [self.get(lane)]
+        backlog = self.get_lane_size(lane)
+        backlogged = self._max_size > 0 and backlog + 1 >= self._max_size
+        for _ in range(backlog if backlogged else max_items - 1):
+            if batch[-1] is None:
+                break
+            try:
+                batch.append(self._unwrap(lane, self._get_queued(lane)))
+            except Empty:
+                break
+        if backlogged:
+            batch = self._shed(lane, batch)
+        return self._coalesce(lane, batch)
+
+    def _get_queued(self, lane: int):
+        # items are counted by the lane before a feeder thread has put them into the pipe, wait for those
+        if self.get_lane_size(lane) > 0:
+            return self._lanes[lane].get(timeout=FEED_TIMEOUT)
+        return self._lanes[lane].get_nowait()
+
+    def _unwrap(self, lane: int, entry) -> Optional[Tuple[float, dict, str]]:
+        if entry is None:
+            return None
+        enqueued_at, item = entry
+        latency = self._latencies[lane]
+        with latency.get_lock():
+            latency.value += (time.time() - enqueued_at - latency.value) * LATENCY_SMOOTHING
+        return item
+
+    def _shed(self, lane: int, batch: List[Optional[Tuple[float, dict, str]]]):
+        return self._keep_latest(lane, batch, self._shed_full[lane],
+                                 lambda item: (item[1].get("type"), item[2]))
+
+    def _coalesce(self, lane: int, batch: List[Optional[Tuple[float, dict, str]]]):
+        return self._keep_latest(lane, batch, self._shed_coalesced[lane],
+                                 lambda item: (item[1].get("type"), item[2], item[1].get("lat"), item[1].get("lng")))
+
+    def _keep_latest(self, lane: int, batch: List[Optional[Tuple[float, dict, str]]], dropped_counter,
+                     key_of: Callable[[Tuple[float, dict, str]], Hashable]):
+        # walking backwards to keep the latest item of the shed types for every key
+        seen = set()
+        kept = []
+        for item in reversed(batch):
+            if item is not None and self._is_sheddable(item):
+                key = key_of(item)
+                if key in seen:
+                    self._increment(dropped_counter)
+                    self._lanes[lane].task_done()
+                    continue
+                seen.add(key)
+            kept.append(item)
+        kept.reverse()
+        return kept
+
+    def _is_sheddable(self, item: Tuple[float, dict, str]) -> bool:
+        return isinstance(item[1], dict) and item[1].get("type") in self._shed_types
+
+    @staticmethod
+    def _increment(counter):
+        with counter.get_lock():
+            counter.value += 1
+
+    def task_done(self, lane: int):
+        self._lanes[lane].task_done()
+
+    def get_lane_size(self, lane: int) -> int:
+        # for whatever reason, there's no actual implementation of qsize()
+        # on MacOS. There are better solutions for this but c'mon, who is
+        # running MAD on MacOS anyway?
+        try:
+            return self._lanes[lane].qsize()
+        except NotImplementedError:
+            return 0
+
+    def get_lane_latency(self, lane: int) -> float:
+        """
+        :return: the average seconds items have recently been waiting in the lane
+        """
+        return self._latencies[lane].value
+
+    def get_lane_shed_counts(self, lane: int) -> Tuple[int, int]:
+        """
+        :return: the amount of items of the lane dropped as it was full and dropped in favour of newer ones of the
+        same location
+        """
+        return self._shed_full[lane].value, self._shed_coalesced[lane].value
+
+    def qsize(self) -> int:
+        return sum(self.get_lane_size(lane) for lane in range(len(self._lanes)))
+
+    def close(self):
+        for lane in self._lanes:
+            lane.close()
@@ -2,8 +2,9 @@ import time
 from multiprocessing import Lock, Queue
 from multiprocessing.managers import SyncManager
 from queue import Empty
-from threading import Event, Thread
-from typing import Dict
+from threading import Condition, Event, Thread
+from threading import Lock as ThreadLock
+from typing import Dict, List, Optional, Tuple, Union
 
 from mapadroid.db.DbStatsSubmit import DbStatsSubmit
 from mapadroid.mitm_receiver.PlayerStats import PlayerStats
@@ -23,6 +24,8 @@ class MitmMapper(object):
         self.__mapping = {}
         self.__playerstats: Dict[str, PlayerStats] = {}
         self.__mapping_mutex = Lock()
+        self.__data_conditions: Dict[str, Condition] = {}
+        self.__data_conditions_mutex: ThreadLock = ThreadLock()
         self.__mapping_manager: MappingManager = mapping_manager
         self.__injected = {}
         self.__last_cellsid = {}
@@ -142,6 +145,48 @@ class MitmMapper(object):
         origin_logger.debug2("Request latest done")
         return result
 
+    def wait_for_data(self, origin: str, keys: List[Union[int, str]], newer_than: Optional[float] = None,
+                      timeout: float = 0) -> Optional[dict]:
+        """
+        Blocks until any of the entries of the keys of the origin has been updated with a timestamp newer than
+        newer_than or the timeout has passed. Returns immediately if newer_than is None.
+        In contrast to request_latest only the entries of the keys requested are returned alongside the location and
+        timestamps of the origin rather than a copy of everything received from the device.
+        :return: None if nothing has been received from the origin yet
+        """
+        if newer_than is not None and timeout > 0:
+            condition = self.__get_data_condition(origin)
+            with condition:
+                condition.wait_for(lambda: self.__has_data_newer_than(origin, keys, newer_than), timeout=timeout)
+        with self.__mapping_mutex:
+            retrieved = self.__mapping.get(origin, None)
+            if retrieved is None:
+                return None
+            result = {key: retrieved[key].copy() for key in keys if retrieved.get(key, None) is not None}
+            for key in ("location", "timestamp_last_data", "timestamp_receiver"):
+                if key in retrieved:
+                    result[key] = retrieved[key]
+        return result
+
+    def __get_data_condition(self, origin: str) -> Condition:
+        with self.__data_conditions_mutex:
+            condition = self.__data_conditions.get(origin, None)
+            if condition is None:
+                condition = Condition()
+                self.__data_conditions[origin] = condition
+            return condition
+
+    def __has_data_newer_than(self, origin: str, keys: List[Union[int, str]], newer_than: float) -> bool:
+        with self.__mapping_mutex:
+            retrieved = self.__mapping.get(origin, None)
+            if retrieved is None:
+                return False
+            for key in keys:
+                entry = retrieved.get(key, None)
+                if entry is not None and entry.get("timestamp", 0) > newer_than:
+                    return True
+        return False
+
     # origin, method, data, timestamp
     def update_latest(self, origin: str, key: str, values_dict, timestamp_received_raw: float = None,
                       timestamp_received_receiver: float = None, location: Location = None):
@@ -158,7 +203,11 @@ class MitmMapper(object):
             if origin not in self.__mapping.keys() and origin in self.__mapping_manager.get_all_devicemappings().keys():
                 origin_logger.info("New device detected.  Setting up the device configuration")
                 self.__add_new_device(origin)
-            if origin in self.__mapping.keys():
+            if origin in self.__mapping.keys() and \
+                    self.__mapping[origin].get(key, {}).get("timestamp", 0) > timestamp_received_raw:
+                # multiple receiver processes may handle requests of a device out of order, keep the latest data
+                origin_logger.debug2("Not updating proto {} with older data of {}", key, timestamp_received_raw)
+            elif origin in self.__mapping.keys():
                 origin_logger.debug2("Updating timestamp at {} with method {} to {}", location, key,
                                      timestamp_received_raw)
                 if self.__mapping.get(origin) is not None and self.__mapping[origin].get(key) is not None:
@@ -175,6 +224,10 @@ class MitmMapper(object):
                 updated = True
             else:
                 origin_logger.warning("Not updating timestamp since origin is unknown")
+        if updated:
+            condition = self.__get_data_condition(origin)
+            with condition:
+                condition.notify_all()
         origin_logger.debug2("Done updating proto {}", key)
         return updated
 
@@ -231,6 +284,16 @@ class MitmMapper(object):
         if self.__playerstats.get(origin, None) is not None:
             self.__playerstats.get(origin).stats_collect_quest(stop_id)
 
+    def collect_stats(self, origin: str, mons: Dict[str, int], mon_ivs: Dict[str, Tuple[int, int]],
+                      raids: Dict[str, int], quests: Dict[str, int]):
+        """
+        Adds the stats of mons, IVs, raids and quests collected by a data processor and runs the stats collector
+        """
+        playerstats = self.__playerstats.get(origin, None)
+        if playerstats is not None:
+            playerstats.stats_collect_many(mons, mon_ivs, raids, quests)
+            playerstats.stats_collector()
+
     def generate_player_stats(self, origin: str, inventory_proto: dict):
         if self.__playerstats.get(origin, None) is not None:
             self.__playerstats.get(origin).gen_player_stats(inventory_proto)
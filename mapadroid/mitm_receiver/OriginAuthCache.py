@@ -0,0 +1,59 @@
+import time
+from threading import Lock
+from typing import Optional, Set, Tuple
+
+from mapadroid.utils import MappingManager
+from mapadroid.utils.authHelper import check_auth
+from mapadroid.utils.logging import LoggerEnums, get_logger
+
+logger = get_logger(LoggerEnums.mitm)
+
+
+class OriginAuthCache:
+    """
+    Copy of the origins of the devices and the auths of the MappingManager held within the process of the receiver to
+    authorise requests without fetching (and pickling) the device mappings with every request.
+    The copy is replaced once the version of the mappings changed, which is checked at most every
+    version_check_interval seconds. Auth headers having passed check_auth are remembered until then.
+    """
+
+    def __init__(self, mapping_manager: MappingManager, version_check_interval: float = 1.0):
+        self._mapping_manager: MappingManager = mapping_manager
+        self._version_check_interval: float = version_check_interval
+        self._version: Optional[int] = None
+        # origins allowed, auths and auth headers known to be valid, replaced at once
+        self._snapshot: Tuple[Set[str], Optional[dict], Set[str]] = (set(), None, set())
+        self._next_version_check: float = 0
+        self._refresh_mutex = Lock()
+
+    def _refresh(self) -> Tuple[Set[str], Optional[dict], Set[str]]:
+        now = time.time()
+        if now >= self._next_version_check:
+            with self._refresh_mutex:
+                if now >= self._next_version_check:
+                    version = self._mapping_manager.get_mappings_version()
+                    if version != self._version:
+                        self._version, origins, auths = self._mapping_manager.get_auth_snapshot()
+                        self._snapshot = (origins, auths, set())
+                        logger.debug("Refreshed origins and auths to version {}", self._version)
+                    self._next_version_check = now + self._version_check_interval
+        return self._snapshot
+
+    def is_origin_allowed(self, origin: str) -> bool:
+        origins, _, _ = self._refresh()
+        return origin in origins
+
+    def auth_required(self) -> bool:
+        _, auths, _ = self._refresh()
+        return auths is not None
+
+    def check_auth(self, origin_logger, auth_header: Optional[str], args) -> bool:
+        _, auths, valid_headers = self._refresh()
+        if auths is None:
+            return True
+        if auth_header in valid_headers:
+            return True
+        valid = check_auth(origin_logger, auth_header, args, auths)
+        if valid:
+            valid_headers.add(auth_header)
+        return valid
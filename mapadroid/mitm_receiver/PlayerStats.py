@@ -5,6 +5,7 @@ import time
 from math import floor
 from multiprocessing import Lock
 from pathlib import Path
+from typing import Dict, Tuple
 
 from mapadroid.mitm_receiver import MitmMapper
 from mapadroid.utils.logging import LoggerEnums, get_logger, get_origin_logger
@@ -185,6 +186,45 @@ class PlayerStats(object):
             else:
                 self.__stats_collected[106]['quest'][stop_id] += 1
 
+    def stats_collect_many(self, mons: Dict[str, int], mon_ivs: Dict[str, Tuple[int, int]], raids: Dict[str, int],
+                           quests: Dict[str, int]):
+        """
+        Adds the stats collected elsewhere at once
+        :param mons: times seen by encounter ID
+        :param mon_ivs: times encountered and shiny by encounter ID
+        :param raids: times seen by gym ID
+        :param quests: times seen by stop ID
+        """
+        if not self._generate_stats:
+            return
+        with self.__mapping_mutex:
+            self.__add_counts(106, 'mon', mons)
+            self.__add_counts(106, 'raid', raids)
+            self.__add_counts(106, 'quest', quests)
+            if mon_ivs:
+                stats = self.__stats_collected.setdefault(102, {})
+                collected = stats.setdefault('mon_iv', {})
+                stats.setdefault('mon_iv_count', 0)
+                for encounter_id, (count, shiny) in mon_ivs.items():
+                    if encounter_id not in collected:
+                        collected[encounter_id] = {'count': count, 'shiny': shiny}
+                        stats['mon_iv_count'] += 1
+                    else:
+                        collected[encounter_id]['count'] += count
+
+    def __add_counts(self, proto_type: int, key: str, counts: Dict[str, int]):
+        if not counts:
+            return
+        stats = self.__stats_collected.setdefault(proto_type, {})
+        collected = stats.setdefault(key, {})
+        stats.setdefault(key + '_count', 0)
+        for identifier, count in counts.items():
+            if identifier not in collected:
+                collected[identifier] = count
+                stats[key + '_count'] += 1
+            else:
+                collected[identifier] += count
+
     def stats_collect_location_data(self, location, datarec, start_timestamp, positiontype, rec_timestamp, walker,
                                     transporttype):
         if not self._generate_stats:
@@ -0,0 +1,79 @@
+import time
+from collections import Counter
+from typing import Dict, Set, Tuple
+
+from mapadroid.mitm_receiver.MitmMapper import MitmMapper
+from mapadroid.utils.logging import LoggerEnums, get_logger
+
+logger = get_logger(LoggerEnums.mitm)
+
+
+class _CollectedStats:
+    def __init__(self):
+        self.mons: Dict[str, int] = Counter()
+        self.mon_ivs: Dict[str, Tuple[int, int]] = {}
+        self.raids: Dict[str, int] = Counter()
+        self.quests: Dict[str, int] = Counter()
+
+
+class PlayerStatsBuffer:
+    """
+    Collects the player stats of mons, IVs, raids and quests within a MITM data processor and hands them to the
+    MitmMapper in a single call per origin every flush_interval seconds rather than calling the MitmMapper (a proxy)
+    for every single mon. Offers the collect_*_stats methods of the MitmMapper to be passed to DbPogoProtoSubmit in
+    its place. Does not collect anything unless game stats are enabled.
+    """
+
+    def __init__(self, mitm_mapper: MitmMapper, application_args, flush_interval: float = 5):
+        self.__mitm_mapper: MitmMapper = mitm_mapper
+        self.__enabled: bool = application_args.game_stats
+        self.__flush_interval: float = flush_interval
+        self.__collected: Dict[str, _CollectedStats] = {}
+        # origins whose stats collector is due to be run
+        self.__collector_due: Set[str] = set()
+        self.__last_flush: Dict[str, float] = {}
+
+    def __get_collected(self, origin: str) -> _CollectedStats:
+        collected = self.__collected.get(origin, None)
+        if collected is None:
+            collected = self.__collected[origin] = _CollectedStats()
+        return collected
+
+    def run_stats_collector(self, origin: str):
+        if self.__enabled:
+            self.__collector_due.add(origin)
+
+    def collect_mon_stats(self, origin: str, encounter_id: str):
+        if self.__enabled:
+            self.__get_collected(origin).mons[encounter_id] += 1
+
+    def collect_mon_iv_stats(self, origin: str, encounter_id: str, shiny: int):
+        if self.__enabled:
+            mon_ivs = self.__get_collected(origin).mon_ivs
+            count, first_shiny = mon_ivs.get(encounter_id, (0, shiny))
+            mon_ivs[encounter_id] = (count + 1, first_shiny)
+
+    def collect_raid_stats(self, origin: str, gym_id: str):
+        if self.__enabled:
+            self.__get_collected(origin).raids[gym_id] += 1
+
+    def collect_quest_stats(self, origin: str, stop_id: str):
+        if self.__enabled:
+            self.__get_collected(origin).quests[stop_id] += 1
+
+    def flush(self, force: bool = False):
+        """
+        Hands the stats of every origin not flushed within flush_interval (or all if forced) to the MitmMapper
+        """
+        now = time.time()
+        for origin in self.__collector_due | set(self.__collected.keys()):
+            if not force and now - self.__last_flush.get(origin, 0) < self.__flush_interval:
+                continue
+            self.__last_flush[origin] = now
+            self.__collector_due.discard(origin)
+            collected = self.__collected.pop(origin, None) or _CollectedStats()
+            try:
+                self.__mitm_mapper.collect_stats(origin, dict(collected.mons), collected.mon_ivs,
+                                                 dict(collected.raids), dict(collected.quests))
+            except Exception as e:
+                logger.warning("Failed handing player stats of {} to the MITM mapper: {}", origin, e)
@@ -1,41 +1,59 @@
 import time
 from datetime import datetime
-from multiprocessing import Process, Queue
+from multiprocessing import Process
+from typing import Optional
 
 from mapadroid.db.DbPogoProtoSubmit import DbPogoProtoSubmit
 from mapadroid.db.DbWrapper import DbWrapper
+from mapadroid.mitm_receiver.MitmDataQueue import MitmDataQueue
 from mapadroid.mitm_receiver.MitmMapper import MitmMapper
+from mapadroid.mitm_receiver.PlayerStatsBuffer import PlayerStatsBuffer
 from mapadroid.utils.logging import LoggerEnums, get_logger, get_origin_logger
+from mapadroid.webhook.WebhookStream import WebhookStream
 
 logger = get_logger(LoggerEnums.mitm)
 
 
 class SerializedMitmDataProcessor(Process):
-    def __init__(self, multi_proc_queue: Queue, application_args, mitm_mapper: MitmMapper,
-                 db_wrapper: DbWrapper, name=None):
+    def __init__(self, multi_proc_queue: MitmDataQueue, lane: int, application_args, mitm_mapper: MitmMapper,
+                 db_wrapper: DbWrapper, name=None, webhook_stream: Optional[WebhookStream] = None):
         Process.__init__(self, name=name)
-        self.__queue: Queue = multi_proc_queue
+        self.__queue: MitmDataQueue = multi_proc_queue
+        self.__lane: int = lane
         self.__db_submit: DbPogoProtoSubmit = db_wrapper.proto_submit
         self.__application_args = application_args
         self.__mitm_mapper: MitmMapper = mitm_mapper
+        self.__stats_buffer: PlayerStatsBuffer = PlayerStatsBuffer(mitm_mapper, application_args)
         self.__name = name
+        self.__webhook_stream: Optional[WebhookStream] = webhook_stream
 
     def run(self):
-        logger.info("Starting serialized MITM data processor")
-        while True:
+        logger.info("Starting serialized MITM data processor of lane {}", self.__lane)
+        self.__db_submit.set_webhook_stream(self.__webhook_stream)
+        write_behind_window = self.__application_args.mitm_write_behind_window
+        if write_behind_window > 0:
+            logger.info("Buffering upserts of stops, gyms and cells for up to {}s", write_behind_window)
+            self.__db_submit.start_write_behind(write_behind_window)
+        stop = False
+        while not stop:
             try:
-                start_time = self.get_time_ms()
-                item = self.__queue.get()
-                if item is None:
-                    logger.info("Received signal to stop MITM data processor")
-                    break
-                self.process_data(item[0], item[1], item[2])
-                self.__queue.task_done()
-                end_time = self.get_time_ms() - start_time
-                logger.debug("MITM data processor {} finished queue item in {}ms", self.__name, end_time)
+                # anything queued up is taken at once to drop data superseded by newer data
+                for item in self.__queue.get_batch(self.__lane):
+                    if item is None:
+                        logger.info("Received signal to stop MITM data processor")
+                        stop = True
+                        break
+                    start_time = self.get_time_ms()
+                    self.process_data(item[0], item[1], item[2])
+                    self.__queue.task_done(self.__lane)
+                    self.__stats_buffer.flush()
+                    end_time = self.get_time_ms() - start_time
+                    logger.debug("MITM data processor {} finished queue item in {}ms", self.__name, end_time)
             except KeyboardInterrupt:
                 logger.info("Received keyboard interrupt, stopping MITM data processor")
                 break
+        self.__db_submit.stop_write_behind()
+        self.__stats_buffer.flush(force=True)
 
     @logger.catch
     def process_data(self, received_timestamp, data, origin):
@@ -45,7 +63,7 @@ class SerializedMitmDataProcessor(Process):
         processed_timestamp = datetime.fromtimestamp(received_timestamp)
 
         if data_type and not data.get("raw", False):
-            self.__mitm_mapper.run_stats_collector(origin)
+            self.__stats_buffer.run_stats_collector(origin)
 
             origin_logger.debug4("Received data: {}", data)
             start_time = self.get_time_ms()
@@ -62,77 +80,81 @@ class SerializedMitmDataProcessor(Process):
             if data_type == 106:
                 origin_logger.info("Processing GMO. Received at {}", processed_timestamp)
 
-                weather_time_start = self.get_time_ms()
-                self.__db_submit.weather(origin, data["payload"], received_timestamp)
-                weather_time = self.get_time_ms() - weather_time_start
-
-                stops_time_start = self.get_time_ms()
-                self.__db_submit.stops(origin, data["payload"])
-                stops_time = self.get_time_ms() - stops_time_start
-
-                gyms_time_start = self.get_time_ms()
-                self.__db_submit.gyms(origin, data["payload"])
-                gyms_time = self.get_time_ms() - gyms_time_start
-
-                raids_time_start = self.get_time_ms()
-                self.__db_submit.raids(origin, data["payload"], self.__mitm_mapper)
-                raids_time = self.get_time_ms() - raids_time_start
-
-                spawnpoints_time_start = self.get_time_ms()
-                self.__db_submit.spawnpoints(origin, data["payload"], processed_timestamp)
-                spawnpoints_time = self.get_time_ms() - spawnpoints_time_start
-
-                mons_time_start = self.get_time_ms()
-                wild_encounters = self.__db_submit.mons(
-                    origin, received_timestamp, data["payload"], self.__mitm_mapper)
-                mons_time = self.get_time_ms() - mons_time_start
-
-                cells_time_start = self.get_time_ms()
-                self.__db_submit.cells(origin, data["payload"])
-                cells_time = self.get_time_ms() - cells_time_start
+                # all upserts of the GMO are written within a single transaction when leaving the unit of work
+                with self.__db_submit.unit_of_work():
+                    weather_time_start = self.get_time_ms()
+                    self.__db_submit.weather(origin, data["payload"], received_timestamp)
+                    weather_time = self.get_time_ms() - weather_time_start
+
+                    stops_time_start = self.get_time_ms()
+                    self.__db_submit.stops(origin, data["payload"])
+                    stops_time = self.get_time_ms() - stops_time_start
+
+                    gyms_time_start = self.get_time_ms()
+                    self.__db_submit.gyms(origin, data["payload"])
+                    gyms_time = self.get_time_ms() - gyms_time_start
+
+                    raids_time_start = self.get_time_ms()
+                    self.__db_submit.raids(origin, data["payload"], self.__stats_buffer)
+                    raids_time = self.get_time_ms() - raids_time_start
+
+                    spawnpoints_time_start = self.get_time_ms()
+                    self.__db_submit.spawnpoints(origin, data["payload"], processed_timestamp)
+                    spawnpoints_time = self.get_time_ms() - spawnpoints_time_start
+
+                    mons_time_start = self.get_time_ms()
+                    wild_encounters = self.__db_submit.mons(
+                        origin, received_timestamp, data["payload"], self.__stats_buffer)
+                    mons_time = self.get_time_ms() - mons_time_start
+
+                    cells_time_start = self.get_time_ms()
+                    self.__db_submit.cells(origin, data["payload"])
+                    cells_time = self.get_time_ms() - cells_time_start
+
+                    gmo_loc_start = self.get_time_ms()
+                    self.__mitm_mapper.submit_gmo_for_location(origin, data["payload"])
+                    gmo_loc_time = self.get_time_ms() - gmo_loc_start
+
+                    if self.__application_args.scan_lured_mons:
+                        lurenoiv_start = self.get_time_ms()
+                        lure_wild = self.__db_submit.mon_lure_noiv(origin, data["payload"])
+                        lurenoiv_time = self.get_time_ms() - lurenoiv_start
+                    else:
+                        lurenoiv_time = 0
+                        lure_wild = []
+
+                    if self.__application_args.scan_nearby_mons:
+                        nearby_mons_time_start = self.get_time_ms()
+                        cell_encounters, stop_encounters = self.__db_submit.nearby_mons(
+                            origin, received_timestamp, data["payload"], self.__stats_buffer)
+                        nearby_mons_time = self.get_time_ms() - nearby_mons_time_start
+                    else:
+                        cell_encounters = []
+                        stop_encounters = []
+                        nearby_mons_time = 0
 
-                gmo_loc_start = self.get_time_ms()
-                self.__mitm_mapper.submit_gmo_for_location(origin, data["payload"])
-                gmo_loc_time = self.get_time_ms() - gmo_loc_start
-
-                if self.__application_args.scan_lured_mons:
-                    lurenoiv_start = self.get_time_ms()
-                    lure_wild = self.__db_submit.mon_lure_noiv(origin, data["payload"])
-                    lurenoiv_time = self.get_time_ms() - lurenoiv_start
-                else:
-                    lurenoiv_time = 0
-                    lure_wild = []
-
-                if self.__application_args.scan_nearby_mons:
-                    nearby_mons_time_start = self.get_time_ms()
-                    cell_encounters, stop_encounters = self.__db_submit.nearby_mons(
-                        origin, received_timestamp, data["payload"], self.__mitm_mapper)
-                    nearby_mons_time = self.get_time_ms() - nearby_mons_time_start
-                else:
-                    cell_encounters = []
-                    stop_encounters = []
-                    nearby_mons_time = 0
-
-                if self.__application_args.game_stats:
-                    self.__db_submit.update_seen_type_stats(
-                        wild=wild_encounters, lure_wild=lure_wild,
-                        nearby_cell=cell_encounters, nearby_stop=stop_encounters
-                    )
+                    if self.__application_args.game_stats:
+                        self.__db_submit.update_seen_type_stats(
+                            wild=wild_encounters, lure_wild=lure_wild,
+                            nearby_cell=cell_encounters, nearby_stop=stop_encounters
+                        )
+                    commit_time_start = self.get_time_ms()
+                commit_time = self.get_time_ms() - commit_time_start
 
                 full_time = self.get_time_ms() - start_time
 
                 origin_logger.debug("Done processing GMO in {}ms (weather={}ms, stops={}ms, gyms={}ms, raids={}ms, " +
                                     "spawnpoints={}ms, mons={}ms, nearby_mons={}, lure_noiv={}, cells={}ms, " +
-                                    "gmo_loc={}ms)",
+                                    "gmo_loc={}ms, commit={}ms)",
                                     full_time, weather_time, stops_time, gyms_time, raids_time,
                                     spawnpoints_time, mons_time, nearby_mons_time, lurenoiv_time,
-                                    cells_time, gmo_loc_time)
+                                    cells_time, gmo_loc_time, commit_time)
             elif data_type == 102:
                 playerlevel = self.__mitm_mapper.get_playerlevel(origin)
                 if playerlevel >= 30:
                     origin_logger.debug("Processing encounter received at {}", processed_timestamp)
                     encounter = self.__db_submit.mon_iv(
-                        origin, received_timestamp, data["payload"], self.__mitm_mapper)
+                        origin, received_timestamp, data["payload"], self.__stats_buffer)
 
                     if self.__application_args.game_stats:
                         self.__db_submit.update_seen_type_stats(
@@ -163,7 +185,7 @@ class SerializedMitmDataProcessor(Process):
 
             elif data_type == 101:
                 origin_logger.debug("Processing proto 101 (FORT_SEARCH)")
-                self.__db_submit.quest(origin, data["payload"], self.__mitm_mapper)
+                self.__db_submit.quest(origin, data["payload"], self.__stats_buffer)
                 end_time = self.get_time_ms() - start_time
                 origin_logger.debug("Done processing proto 101 in {}ms", end_time)
             elif data_type == 104:
@@ -1,12 +1,79 @@
+import heapq
+import math
+from typing import Dict, List, Tuple
+
+import numpy as np
 import s2sphere
 
-from mapadroid.utils.collections import Relation
-from mapadroid.utils.geo import (get_distance_of_two_points_in_meters,
-                                 get_middle_of_coord_list)
+from mapadroid.utils.geo import get_middle_of_coord_list
 from mapadroid.utils.s2Helper import S2Helper
 
+# approximate radius of earth in meters as used by get_distance_of_two_points_in_meters
+EARTH_RADIUS = 6373000.0
+# maximum diagonal of S2 cells in radians at level 0, halved with every level
+S2_MAX_DIAGONAL = 2.438654594434021
+
+
+class _EventIndex:
+    """
+    Grid of buckets spanning cell_size meters holding the indexes of the events located within them
+    """
+
+    def __init__(self, lats: np.ndarray, lngs: np.ndarray, cell_size: float):
+        self._lats = lats
+        self._lngs = lngs
+        self._cell_size = max(cell_size, 1.0)
+        # the longitudinal size of the cells is chosen for the latitude closest to the poles to never miss an event
+        max_abs_lat = min(float(np.max(np.abs(lats))), 89.0)
+        self._lat_step = math.degrees(self._cell_size / EARTH_RADIUS)
+        self._lng_step = self._lat_step / math.cos(math.radians(max_abs_lat))
+        buckets: Dict[Tuple[int, int], List[int]] = {}
+        for index, bucket in enumerate(zip(np.floor(lats / self._lat_step).astype(np.int64).tolist(),
+                                           np.floor(lngs / self._lng_step).astype(np.int64).tolist())):
+            buckets.setdefault(bucket, []).append(index)
+        self._buckets: Dict[Tuple[int, int], np.ndarray] = {
+            bucket: np.array(indexes, dtype=np.int64) for bucket, indexes in buckets.items()}
+
+    def within(self, lat: float, lng: float, radius: float) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        :return: the indexes of the events within radius meters of the location in ascending order and their distances
+        """
+        rings = int(math.ceil(radius / self._cell_size))
+        lat_bucket = int(math.floor(lat / self._lat_step))
+        lng_bucket = int(math.floor(lng / self._lng_step))
+        found = [self._buckets[(lat_index, lng_index)]
+                 for lat_index in range(lat_bucket - rings, lat_bucket + rings + 1)
+                 for lng_index in range(lng_bucket - rings, lng_bucket + rings + 1)
+                 if (lat_index, lng_index) in self._buckets]
+        if not found:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        indexes = np.sort(np.concatenate(found))
+        distances = distances_in_meters(lat, lng, self._lats[indexes], self._lngs[indexes])
+        in_range = distances <= radius
+        return indexes[in_range], distances[in_range]
+
+
+def distances_in_meters(lat: float, lng: float, lats: np.ndarray, lngs: np.ndarray) -> np.ndarray:
+    """
+    Vectorised get_distance_of_two_points_in_meters of one location to many
+    """
+    lat1 = math.radians(lat)
+    lon1 = math.radians(lng)
+    lat2 = np.radians(lats)
+    lon2 = np.radians(lngs)
+    angle = np.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    angle = np.clip(angle, 0, 1)
+    return EARTH_RADIUS * 2 * np.arctan2(np.sqrt(angle), np.sqrt(1 - angle))
+
 
 class ClusteringHelper:
+    """
+    Clusters events (timestamp, Location) to circles of max_radius holding up to max_count_per_circle events within
+    max_timedelta_seconds. Circles are returned as (timestamp, Location, timedelta, True), single events as they are.
+    Events within range of each other are looked up in a grid of buckets and events clustered are flagged rather than
+    removed from all relations to scale with the amount of events.
+    """
+
     def __init__(self, max_radius, max_count_per_circle, max_timedelta_seconds, use_s2: bool = False,
                  s2_level: int = 30):
         self.max_radius = max_radius
@@ -15,185 +82,160 @@ class ClusteringHelper:
         self.useS2 = use_s2
         self.S2level = s2_level
 
-    def _get_relations_in_range_within_time(self, queue, max_radius):
-        relations = {}
-        for event in queue:
-            for other_event in queue:
-                if event[1].lat == other_event[1].lat and event[1].lng == other_event[1].lng and \
-                   event not in relations.keys():
-                    relations[event] = []
-                distance = get_distance_of_two_points_in_meters(event[1].lat, event[1].lng,
-                                                                other_event[1].lat, other_event[1].lng)
-                # we will always build relations from the event at hand subtracted by the event inspected
-                timedelta = event[0] - other_event[0]
-                if 0 <= distance <= max_radius * 2 and 0 <= timedelta <= self.max_timedelta_seconds:
-                    if event not in relations.keys():
-                        relations[event] = []
-                    # avoid duplicates
-                    already_present = False
-                    for relation in relations[event]:
-                        if relation[0][1].lat == other_event[1].lat and \
-                           relation[0][1].lng == other_event[1].lng:
-                            already_present = True
-                    if not already_present:
-                        relations[event].append(
-                            Relation(other_event, distance, timedelta))
-        return relations
-
-    def _get_most_west_amongst_relations(self, relations):
-        selected = list(relations.keys())[0]
-        for event in relations.keys():
-            if event[1].lng < selected[1].lng:
-                selected = event
-            elif event[1].lng == selected[1].lng and event[1].lat > selected[1].lat:
-                selected = event
-        return selected
-
-    def _get_farthest_in_relation(self, to_be_inspected):
-        # retrieve the relation farthest within the given timedelta, do not bother about maximizing the timedelta
-        # if a coord is not within the given timedeltas, it will simply remain in the original set anyway ;)
-        # ignore any relations of previously merged origins for now
-        distance = -1
-        farthest = None
-        for relation in to_be_inspected:
-            if (len(relation.other_event) == 4 and not relation.other_event[3] or len(relation) < 4) and \
-               relation.timedelta <= self.max_timedelta_seconds and relation.distance > distance:
-                distance = relation.distance
-                farthest = relation
-        return farthest.other_event, distance
-
-    def _get_count_and_coords_in_circle_within_timedelta(self, middle, relations, earliest_timestamp,
-                                                         latest_timestamp, max_radius):
+    def get_clustered(self, queue):
+        # events are unique just like the keys of a dict, keep the first occurrence
+        events = list(dict.fromkeys(queue))
+        if not events:
+            return []
+        return _Clustering(self, events).sum_up()
+
+
+class _Clustering:
+    """
+    State of clustering a list of unique events
+    """
+
+    def __init__(self, helper: ClusteringHelper, events: list):
+        self._helper = helper
+        self._events = events
+        self._timestamps = np.array([event[0] for event in events], dtype=float)
+        self._lats = np.array([event[1].lat for event in events], dtype=float)
+        self._lngs = np.array([event[1].lng for event in events], dtype=float)
+        # events of the same location share an ID as relations to them are dropped once one of them is clustered
+        _, self._location_ids = np.unique(np.stack((self._lats, self._lngs), axis=1), axis=0, return_inverse=True)
+        self._location_ids = self._location_ids.reshape(-1)
+        self._alive = np.ones(len(events), dtype=bool)
+        self._location_removed = np.zeros(len(self._location_ids), dtype=bool)
+        # previously clustered events are part of every circle
+        self._clustered = np.array([index for index, event in enumerate(events) if len(event) == 4 and event[3]],
+                                   dtype=np.int64)
+        self._index = _EventIndex(self._lats, self._lngs, helper.max_radius * 2)
+        self._s2_search_radius = 0
+        if helper.useS2:
+            self._s2_search_radius = helper.max_radius + S2_MAX_DIAGONAL * 2 ** -helper.S2level * EARTH_RADIUS
+        self._relations = [self._get_relations_in_range_within_time(index) for index in range(len(events))]
+
+    def _get_relations_in_range_within_time(self, index: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        :return: indexes and distances of the events in range of the event, one per location
+        """
+        others, distances = self._index.within(self._lats[index], self._lngs[index], self._helper.max_radius * 2)
+        # we will always build relations from the event at hand subtracted by the event inspected
+        timedeltas = self._timestamps[index] - self._timestamps[others]
+        within_time = (timedeltas >= 0) & (timedeltas <= self._helper.max_timedelta_seconds)
+        others = others[within_time]
+        distances = distances[within_time]
+        # avoid duplicates
+        _, first_of_location = np.unique(self._location_ids[others], return_index=True)
+        first_of_location.sort()
+        return others[first_of_location], distances[first_of_location]
+
+    def sum_up(self) -> list:
+        # most west first, the most north of those first
+        west_first = [(lng, -lat, index)
+                      for index, (lat, lng) in enumerate(zip(self._lats.tolist(), self._lngs.tolist()))]
+        heapq.heapify(west_first)
+        final_set = []
+        while west_first:
+            _, _, west_next = heapq.heappop(west_first)
+            if not self._alive[west_next]:
+                continue
+            middle_event, events_to_be_removed = self._get_circle(west_next)
+            final_set.append(middle_event)
+            self._alive[west_next] = False
+            for index in events_to_be_removed:
+                self._alive[index] = False
+                self._location_removed[self._location_ids[index]] = True
+        return final_set
+
+    def _get_circle(self, index: int):
+        event = self._events[index]
+        others, distances = self._relations[index]
+        to_be_inspected = ~self._location_removed[self._location_ids[others]]
+        others, distances = others[to_be_inspected], distances[to_be_inspected]
+        max_radius = self._helper.max_radius
+        while True:
+            if len(others) <= 1:
+                return event, [index]
+            # use the get_farthest... since we have previously moved the middle, we need to check for matching
+            # events in such cases and build new circle events in time
+            if len(event) == 4 and event[3]:
+                # this is a previously clustered event, we will simply check for other events that have not been
+                # clustered to include those in our current circle
+                middle_event = event
+                middle = event[1]
+                earliest_timestamp = event[0] - event[2]
+                latest_timestamp = event[0]
+                farthest_away = index
+                distance_to_farthest = max_radius
+            else:
+                farthest = int(np.argmax(distances))
+                farthest_away = int(others[farthest])
+                distance_to_farthest = float(distances[farthest])
+                timestamps = (event[0], self._events[farthest_away][0])
+                earliest_timestamp = min(timestamps)
+                latest_timestamp = max(timestamps)
+                middle = get_middle_of_coord_list([event[1], self._events[farthest_away][1]])
+                middle_event = (latest_timestamp, middle, latest_timestamp - earliest_timestamp, True)
+
+            events_in_circle, highest_timedelta, latest_timestamp = self._get_coords_in_circle_within_timedelta(
+                middle, earliest_timestamp, latest_timestamp, max_radius)
+            middle_event = (latest_timestamp, middle_event[1], highest_timedelta, middle_event[3])
+            if len(events_in_circle) > self._helper.max_count_per_circle:
+                remaining = others != farthest_away
+                if remaining.all():
+                    # nothing left to shrink the circle by
+                    return middle_event, events_in_circle
+                others, distances = others[remaining], distances[remaining]
+                max_radius = distance_to_farthest
+            else:
+                return middle_event, events_in_circle
+
+    def _get_coords_in_circle_within_timedelta(self, middle, earliest_timestamp, latest_timestamp, max_radius):
         inside_circle = []
         highest_timedelta = 0
-        if self.useS2:
+        max_timedelta_seconds = self._helper.max_timedelta_seconds
+        if self._helper.useS2:
             region = s2sphere.CellUnion(
-                S2Helper.get_s2cells_from_circle(middle.lat, middle.lng, self.max_radius, self.S2level))
+                S2Helper.get_s2cells_from_circle(middle.lat, middle.lng, self._helper.max_radius,
+                                                 self._helper.S2level))
+            candidates, _ = self._index.within(middle.lat, middle.lng, self._s2_search_radius)
+        else:
+            candidates, _ = self._index.within(middle.lat, middle.lng, max_radius)
+        candidates = np.union1d(candidates, self._clustered)
+        candidates = candidates[self._alive[candidates]]
 
-        for event_relations in relations:
+        for candidate in candidates.tolist():
+            event = self._events[candidate]
             # exclude previously clustered events...
-            if len(event_relations) == 4 and event_relations[3]:
-                inside_circle.append(event_relations)
+            if len(event) == 4 and event[3]:
+                inside_circle.append(candidate)
                 continue
-            distance = get_distance_of_two_points_in_meters(middle.lat, middle.lng,
-                                                            event_relations[1].lat,
-                                                            event_relations[1].lng)
-            event_in_range = 0 <= distance <= max_radius
-            if self.useS2:
-                event_in_range = region.contains(s2sphere.LatLng.from_degrees(event_relations[1].lat,
-                                                                              event_relations[1].lng).to_point())
+            if self._helper.useS2:
+                event_in_range = region.contains(s2sphere.LatLng.from_degrees(event[1].lat,
+                                                                              event[1].lng).to_point())
+            else:
+                # candidates of the index are within range already
+                event_in_range = True
             # timedelta of event being inspected to the earliest timestamp
-            timedelta_end = latest_timestamp - event_relations[0]
-            timedelta_start = event_relations[0] - earliest_timestamp
+            timedelta_end = latest_timestamp - event[0]
+            timedelta_start = event[0] - earliest_timestamp
             if timedelta_end < 0 and event_in_range:
                 # we found an event starting past the current latest timestamp, let's update the latest_timestamp
                 latest_timestamp_temp = latest_timestamp + abs(timedelta_end)
-                if latest_timestamp_temp - earliest_timestamp <= self.max_timedelta_seconds:
+                if latest_timestamp_temp - earliest_timestamp <= max_timedelta_seconds:
                     latest_timestamp = latest_timestamp_temp
                     highest_timedelta = highest_timedelta + abs(timedelta_end)
-                    inside_circle.append(event_relations)
+                    inside_circle.append(candidate)
             elif timedelta_start < 0 and event_in_range:
                 # we found an event starting before earliest_timestamp, let's check that...
                 earliest_timestamp_temp = earliest_timestamp - abs(timedelta_start)
-                if latest_timestamp - earliest_timestamp_temp <= self.max_timedelta_seconds:
+                if latest_timestamp - earliest_timestamp_temp <= max_timedelta_seconds:
                     earliest_timestamp = earliest_timestamp_temp
                     highest_timedelta = highest_timedelta + abs(timedelta_start)
-                    inside_circle.append(event_relations)
+                    inside_circle.append(candidate)
             elif timedelta_end >= 0 and timedelta_start >= 0 and event_in_range:
                 # we found an event within our current timedelta and proximity, just append it to the list
-                inside_circle.append(event_relations)
-
-        return len(inside_circle), inside_circle, highest_timedelta, latest_timestamp
-
-    def _get_earliest_timestamp_in_queue(self, queue):
-        earliest = queue[0][0]
-        for item in queue:
-            if earliest > item[0]:
-                earliest = item[0]
-        return earliest
-
-    def _get_latest_timestamp_in_queue(self, queue):
-        latest = queue[0][0]
-        for item in queue:
-            if latest < item[0]:
-                latest = item[0]
-        return latest
-
-    def _get_circle(self, event, to_be_inspected, relations, max_radius):
-        if len(to_be_inspected) == 0:
-            return event, [event]
-        elif len(to_be_inspected) == 1:
-            # TODO: do relations hold themselves or is there a return missing here?
-            return event, [event]
-        # use the get_farthest... since we have previously moved the middle, we need to check for matching events in
-        # such cases and build new circle events in time
-        if len(event) == 4 and event[3]:
-            # this is a previously clustered event, we will simply check for other events that have not been clustered
-            # to include those in our current circle
-            # all we need to do is update timestamps to keep track as to whether we are still inside the max_timedelta
-            # constraint
-            middle_event = event
-            middle = event[1]
-            earliest_timestamp = event[0] - event[2]
-            latest_timestamp = event[0]
-            farthest_away = event
-            distance_to_farthest = max_radius
-        else:
-            farthest_away, distance_to_farthest = self._get_farthest_in_relation(
-                to_be_inspected)
-            all_events_within_range_and_time = [event, farthest_away]
-            earliest_timestamp = self._get_earliest_timestamp_in_queue(
-                all_events_within_range_and_time)
-            latest_timestamp = self._get_latest_timestamp_in_queue(
-                all_events_within_range_and_time)
-            middle = get_middle_of_coord_list(
-                [event[1], farthest_away[1]]
-            )
-            middle_event = (
-                latest_timestamp, middle, latest_timestamp - earliest_timestamp, True
-            )
-        count_inside, events_in_circle, highest_timedelta, latest_timestamp = \
-            self._get_count_and_coords_in_circle_within_timedelta(middle, relations,
-                                                                  earliest_timestamp, latest_timestamp,
-                                                                  max_radius)
-        middle_event = (latest_timestamp, middle_event[1],
-                        highest_timedelta, middle_event[3])
-        if count_inside <= self.max_count_per_circle and count_inside == len(to_be_inspected):
-            return middle_event, events_in_circle
-        elif count_inside > self.max_count_per_circle:
-            to_be_inspected = [
-                to_keep for to_keep in to_be_inspected if not to_keep.other_event == farthest_away]
-            return self._get_circle(event, to_be_inspected, relations, distance_to_farthest)
-        else:
-            return middle_event, events_in_circle
-
-    def _remove_coords_from_relations(self, relations, events_to_be_removed):
-        for source_event, relations_to_source in list(relations.items()):
-            # iterate relations, remove anything matching events_to_be_removed
-            for event in events_to_be_removed:
-                if event == source_event:
-                    relations.pop(source_event)
-                    break
-                # iterate through the entire distance relations as well...
-                for relation in relations_to_source:
-                    if relation.other_event[1] == event[1]:
-                        relations[source_event].remove(relation)
-        return relations
-
-    def _sum_up_relations(self, relations):
-        final_set = []
+                inside_circle.append(candidate)
 
-        while len(relations) > 0:
-            west_next = self._get_most_west_amongst_relations(relations)
-            middle_event, events_to_be_removed = self._get_circle(west_next, relations[west_next], relations,
-                                                                  self.max_radius)
-            final_set.append(middle_event)
-            relations = self._remove_coords_from_relations(
-                relations, events_to_be_removed)
-        return final_set
-
-    def get_clustered(self, queue):
-        relations = self._get_relations_in_range_within_time(
-            queue, max_radius=self.max_radius)
-        summed_up = self._sum_up_relations(relations)
-        return summed_up
+        return inside_circle, highest_timedelta, latest_timestamp
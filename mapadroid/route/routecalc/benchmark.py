@@ -0,0 +1,229 @@
+"""
+Benchmark of the route calculation without a database.
+
+Synthetic spawnpoints/stops are generated within sample geofences and run through the clustering and the route
+engines, reporting wall time, peak memory (as traced by tracemalloc) and the length of the round trip.
+
+Usage:
+    python -m mapadroid.route.routecalc.benchmark --sizes 100,1000,5000 --engines clustering,quick,ortools
+    python -m mapadroid.route.routecalc.benchmark --json results.json
+    python -m mapadroid.route.routecalc.benchmark --baseline results.json --tolerance 0.25
+
+With --baseline, the exit code is 1 if a case got slower or its route longer than allowed by the tolerance.
+"""
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from mapadroid.geofence.geofenceHelper import GeofenceHelper
+from mapadroid.route.routecalc.ClusteringHelper import ClusteringHelper
+from mapadroid.utils.collections import Location
+from mapadroid.utils.geo import get_distance_of_two_points_in_meters
+
+# sample geofences as written in the geofence editor, a city block and a concave area along a river
+SAMPLE_GEOFENCES = {
+    "block": [
+        "52.5000,13.3500", "52.5000,13.4500", "52.5400,13.4500", "52.5400,13.3500"
+    ],
+    "river": [
+        "52.4800,13.3000", "52.5000,13.3400", "52.4900,13.3800", "52.5100,13.4200", "52.5300,13.4000",
+        "52.5200,13.3600", "52.5350,13.3200", "52.5150,13.2900"
+    ]
+}
+DISTRIBUTIONS = ("uniform", "clustered")
+ENGINES = ("clustering", "quick", "ortools")
+# OR-Tools takes hours for the larger sizes, skip it unless --no-limits is given
+ENGINE_MAX_POINTS = {
+    "ortools": 500
+}
+CLUSTERING_RADIUS = 70
+CLUSTERING_MAX_COUNT = 100000
+
+
+def generate_points(geofence: str, size: int, distribution: str, seed: int = 0) -> np.ndarray:
+    """
+    Generates size points inside the geofence. Clustered points mimic spawnpoints lining up along paths by
+    scattering them around random centers.
+    """
+    geofence_helper = GeofenceHelper({"fence_data": ["[{}]".format(geofence)] + SAMPLE_GEOFENCES[geofence]}, None)
+    min_lat, min_lon, max_lat, max_lon = geofence_helper.get_polygon_from_fence()
+    rng = np.random.default_rng(seed)
+    points = np.empty((0, 2))
+    while len(points) < size:
+        if distribution == "clustered":
+            centers = rng.uniform((min_lat, min_lon), (max_lat, max_lon), size=(max(1, size // 20), 2))
+            candidates = (centers[rng.integers(len(centers), size=size)]
+                          + rng.normal(scale=0.0008, size=(size, 2)))
+        else:
+            candidates = rng.uniform((min_lat, min_lon), (max_lat, max_lon), size=(size, 2))
+        points = np.concatenate((points, candidates[geofence_helper.contains_many(candidates)]))
+    return points[:size]
+
+
+def tour_length(coords: np.ndarray, route: List[int]) -> float:
+    """
+    Length of the round trip in meters
+    """
+    length = 0.0
+    for start, end in zip(route, route[1:] + route[:1]):
+        length += get_distance_of_two_points_in_meters(coords[start][0], coords[start][1],
+                                                       coords[end][0], coords[end][1])
+    return length
+
+
+def run_clustering(coords: np.ndarray) -> Dict:
+    clustering_helper = ClusteringHelper(max_radius=CLUSTERING_RADIUS, max_count_per_circle=CLUSTERING_MAX_COUNT,
+                                         max_timedelta_seconds=0)
+    clustered = clustering_helper.get_clustered([(0, Location(lat, lng)) for lat, lng in coords.tolist()])
+    return {"points_out": len(clustered)}
+
+
+def run_quick(coords: np.ndarray) -> Dict:
+    from mapadroid.route.routecalc.calculate_route_quick import route_calc_impl
+    route = [int(index) for index in route_calc_impl(coords, "benchmark")]
+    return {"points_out": len(route), "length": tour_length(coords, route)}
+
+
+def run_ortools(coords: np.ndarray) -> Dict:
+    from mapadroid.route.routecalc.calculate_route_all import route_calc_ortools
+    route = [int(index) for index in route_calc_ortools(coords, "benchmark")]
+    return {"points_out": len(route), "length": tour_length(coords, route)}
+
+
+ENGINE_RUNNERS: Dict[str, Callable[[np.ndarray], Dict]] = {
+    "clustering": run_clustering,
+    "quick": run_quick,
+    "ortools": run_ortools
+}
+
+
+def ortools_available() -> bool:
+    try:
+        from ortools.constraint_solver import pywrapcp  # noqa: F401
+    except Exception:
+        return False
+    return True
+
+
+def run_case(engine: str, coords: np.ndarray, measure_memory: bool = True) -> Dict:
+    """
+    Runs the engine on the coords, measuring the wall time without and the peak memory with tracing as tracemalloc
+    slows down pure python code quite a bit
+    """
+    runner = ENGINE_RUNNERS[engine]
+    start = time.perf_counter()
+    result = runner(coords)
+    result["seconds"] = time.perf_counter() - start
+    result["peak_mb"] = None
+    if measure_memory:
+        tracemalloc.start()
+        try:
+            runner(coords)
+            result["peak_mb"] = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+def run_benchmark(sizes: List[int], engines: List[str], geofences: List[str], distributions: List[str],
+                  seed: int = 0, measure_memory: bool = True, limits: bool = True,
+                  report: Optional[Callable[[Dict], None]] = None) -> List[Dict]:
+    results = []
+    for geofence in geofences:
+        for distribution in distributions:
+            for size in sizes:
+                coords = generate_points(geofence, size, distribution, seed)
+                for engine in engines:
+                    case = {"engine": engine, "geofence": geofence, "distribution": distribution, "size": size}
+                    if engine == "ortools" and not ortools_available():
+                        case["skipped"] = "OR-Tools not installed"
+                    elif limits and size > ENGINE_MAX_POINTS.get(engine, size):
+                        case["skipped"] = "more than {} points".format(ENGINE_MAX_POINTS[engine])
+                    else:
+                        case.update(run_case(engine, coords, measure_memory))
+                    results.append(case)
+                    if report is not None:
+                        report(case)
+    return results
+
+
+def case_key(case: Dict) -> str:
+    return "{engine}/{geofence}/{distribution}/{size}".format(**case)
+
+
+def format_case(case: Dict) -> str:
+    if "skipped" in case:
+        return "{:<48} skipped: {}".format(case_key(case), case["skipped"])
+    peak = "{:9.1f}MB".format(case["peak_mb"]) if case["peak_mb"] is not None else "{:>11}".format("-")
+    length = "{:12.0f}m".format(case["length"]) if "length" in case else "{:>13}".format("-")
+    return "{:<48} {:9.3f}s {} {} {:7d} points".format(case_key(case), case["seconds"], peak, length,
+                                                       case["points_out"])
+
+
+def find_regressions(results: List[Dict], baseline: List[Dict], tolerance: float) -> List[str]:
+    baseline_cases = {case_key(case): case for case in baseline if "skipped" not in case}
+    regressions = []
+    for case in results:
+        previous = baseline_cases.get(case_key(case))
+        if previous is None or "skipped" in case:
+            continue
+        for metric in ("seconds", "length"):
+            if metric in case and metric in previous and case[metric] > previous[metric] * (1 + tolerance):
+                regressions.append("{} {}: {:.3f} -> {:.3f}".format(case_key(case), metric, previous[metric],
+                                                                    case[metric]))
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark of the route calculation on synthetic data")
+    parser.add_argument("--sizes", default="100,1000,5000,20000",
+                        help="Comma separated amounts of points. Default: 100,1000,5000,20000")
+    parser.add_argument("--engines", default=",".join(ENGINES),
+                        help="Comma separated engines out of {}. Default: all".format(", ".join(ENGINES)))
+    parser.add_argument("--geofences", default=",".join(SAMPLE_GEOFENCES),
+                        help="Comma separated sample geofences out of {}. Default: all".format(
+                            ", ".join(SAMPLE_GEOFENCES)))
+    parser.add_argument("--distributions", default=",".join(DISTRIBUTIONS),
+                        help="Comma separated distributions of points out of {}. Default: all".format(
+                            ", ".join(DISTRIBUTIONS)))
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the generated points. Default: 0")
+    parser.add_argument("--skip-memory", action="store_true", help="Do not measure the peak memory")
+    parser.add_argument("--no-limits", action="store_true",
+                        help="Run OR-Tools on all sizes, which may take hours")
+    parser.add_argument("--json", help="Write the results to the given file")
+    parser.add_argument("--baseline", help="Compare the results to those of a previous run written by --json")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Share by which time and length may exceed the baseline. Default: 0.25")
+    parser.add_argument("--verbose", action="store_true", help="Keep the log output of the route calculation")
+    args = parser.parse_args(argv)
+
+    if not args.verbose:
+        from loguru import logger
+        logger.remove()
+
+    results = run_benchmark([int(size) for size in args.sizes.split(",")], args.engines.split(","),
+                            args.geofences.split(","), args.distributions.split(","), seed=args.seed,
+                            measure_memory=not args.skip_memory, limits=not args.no_limits,
+                            report=lambda case: print(format_case(case), flush=True))
+
+    if args.json:
+        with open(args.json, "w") as results_file:
+            json.dump(results, results_file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            regressions = find_regressions(results, json.load(baseline_file), args.tolerance)
+        for regression in regressions:
+            print("Regression: {}".format(regression))
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+"""
+Process pool running the CPU bound part of route calculations (clustering and ordering the coordinates) of multiple
+areas in parallel as it does not scale using threads.
+Coordinates are passed to the workers as float arrays of shape (n, 2) and every calculation waits for its own route
+only, i.e. routes are returned as soon as they are done regardless of the order they have been submitted in.
+Without a pool having been started or if a route is not returned by the pool in time (e.g. the process calculating
+it has been killed), routes are calculated within the calling thread.
+"""
+import os
+import time
+from multiprocessing import TimeoutError
+from multiprocessing.pool import Pool
+from threading import Lock
+from typing import Optional
+
+import numpy as np
+
+from mapadroid.route.routecalc.calculate_route_all import route_calc_all
+from mapadroid.route.routecalc.ClusteringHelper import ClusteringHelper
+from mapadroid.utils.collections import Location
+from mapadroid.utils.logging import LoggerEnums, get_logger
+
+logger = get_logger(LoggerEnums.routemanager)
+
+_pool: Optional[Pool] = None
+_pool_size: int = 0
+_pool_timeout: float = 7200
+_pool_mutex = Lock()
+
+
+def start_pool(processes: int = 0, timeout: float = 7200) -> int:
+    """
+    Starts the pool of route calculation processes. Call it before starting threads as the workers are forked.
+    :param processes: amount of processes, 0 to use one per CPU
+    :param timeout: seconds to wait for a route of the pool before calculating it within the calling thread
+    :return: the amount of processes calculating routes in parallel
+    """
+    global _pool, _pool_size, _pool_timeout
+    if processes <= 0:
+        processes = os.cpu_count() or 1
+    with _pool_mutex:
+        if _pool is None and processes > 1:
+            logger.info("Starting {} processes to calculate routes", processes)
+            _pool = Pool(processes=processes)
+            _pool_size = processes
+            _pool_timeout = timeout
+        return max(_pool_size, 1)
+
+
+def stop_pool():
+    global _pool, _pool_size
+    with _pool_mutex:
+        pool, _pool, _pool_size = _pool, None, 0
+    if pool is not None:
+        pool.terminate()
+        pool.join()
+
+
+def get_pool_size() -> int:
+    """
+    :return: the amount of routes calculated in parallel
+    """
+    return max(_pool_size, 1)
+
+
+def calculate_route(coords: np.ndarray, max_radius: int, max_coords_within_radius: int, algorithm: str = 'route',
+                    use_s2: bool = False, s2_level: int = 15, route_name: str = 'Unknown',
+                    num_processes: int = 1) -> np.ndarray:
+    """
+    Calculates the route in a process of the pool if started
+    :return: the coordinates of the route as array of shape (n, 2) in the order to visit them
+    """
+    coords = np.asarray(coords, dtype=float).reshape(-1, 2)
+    args = (coords, max_radius, max_coords_within_radius, algorithm, use_s2, s2_level, route_name, num_processes)
+    with _pool_mutex:
+        pool, timeout = _pool, _pool_timeout
+    if pool is None:
+        return calculate_route_impl(*args)
+    logger.debug("Queueing route calculation of {} coords for {}", len(coords), route_name)
+    try:
+        # the pool replaces workers having died but never returns the route they were calculating
+        return pool.apply_async(calculate_route_impl, args).get(timeout=timeout)
+    except TimeoutError:
+        logger.warning("Route of {} has not been calculated within {}s by the pool, calculating it again",
+                       route_name, timeout)
+        return calculate_route_impl(*args)
+
+
+def calculate_route_impl(coords: np.ndarray, max_radius: int, max_coords_within_radius: int, algorithm: str,
+                         use_s2: bool, s2_level: int, route_name: str, num_processes: int) -> np.ndarray:
+    if use_s2:
+        logger.debug("Using S2 method for calculation with S2 level: {}", s2_level)
+
+    less_coords = coords
+    if len(coords) > 0 and max_radius and max_coords_within_radius:
+        logger.info("Calculating route for {}", route_name)
+        less_coords = get_less_coords(coords, max_radius, max_coords_within_radius, use_s2, s2_level)
+        logger.debug("Coords summed up: {}, that's just {} coords", less_coords, len(less_coords))
+    logger.debug("Got {} coordinates", len(less_coords))
+    if len(less_coords) < 3:
+        logger.debug("less than 3 coordinates... not gonna take a shortest route on that")
+        return less_coords
+
+    logger.info("Calculating a short route through all those coords. Might take a while")
+    start = time.perf_counter()
+    sol_best = route_calc_all(less_coords, route_name, num_processes, algorithm)
+    calc_dur = (time.perf_counter() - start) / 60
+    time_unit = 'minutes'
+    if calc_dur < 1:
+        calc_dur = int(calc_dur * 60)
+        time_unit = 'seconds'
+    logger.info("Calculated route for {} in {} {}", route_name, calc_dur, time_unit)
+    return less_coords[np.array(sol_best, dtype=np.int64)]
+
+
+def get_less_coords(coords: np.ndarray, max_radius: int, max_coords_within_radius: int, use_s2: bool = False,
+                    s2_level: int = 15) -> np.ndarray:
+    """
+    Clusters the coords to circles of max_radius
+    :return: the middles of the circles as array of shape (n, 2)
+    """
+    coordinates = [(0, Location(lat, lng)) for lat, lng in coords.tolist()]
+    clustering_helper = ClusteringHelper(max_radius=max_radius, max_count_per_circle=max_coords_within_radius,
+                                         max_timedelta_seconds=0, use_s2=use_s2, s2_level=s2_level)
+    clustered_events = clustering_helper.get_clustered(coordinates)
+    return np.array([(event[1].lat, event[1].lng) for event in clustered_events], dtype=float).reshape(-1, 2)
@@ -1,13 +1,23 @@
+import time
+from typing import List, Tuple
+
+import numpy as np
+
 from mapadroid.utils.logging import LoggerEnums, get_logger
 
 logger = get_logger(LoggerEnums.routemanager)
 
+# rows of the distance matrix calculated at once to limit the size of temporary arrays
+DISTANCE_MATRIX_BLOCK_SIZE = 256
+# seconds spent at most on improving the initial route
+IMPROVEMENT_TIME_LIMIT = 60
+# improvements smaller than this share of the average edge length are ignored to not loop due to rounding errors
+MIN_RELATIVE_IMPROVEMENT = 1e-5
+
 
 def route_calc_impl(coords, route_name, num_processes=1):
     with logger.contextualize(origin=route_name):
-        less_coords_array = []
-        for i in range(len(coords)):
-            less_coords_array.append([coords[i][0].item(), coords[i][1].item()])
+        less_coords_array = np.array([(coord[0], coord[1]) for coord in coords], dtype=float).reshape(-1, 2)
 
         length, path = tsp(less_coords_array)
         logger.info("Found {} long solution: ", length)
@@ -15,192 +25,233 @@ def route_calc_impl(coords, route_name, num_processes=1):
     return path
 
 
-def tsp(data):
+def tsp(data) -> Tuple[float, List[int]]:
+    """
+    Calculates a round trip through all points by building a route based on Christofides' algorithm (using a greedy
+    matching) which is then improved by 2-opt and Or-opt moves
+    :param data: array of shape (n, 2) holding the coordinates
+    :return: the length of the route and the indexes of the points in the order to visit them
+    """
+    data = np.asarray(data, dtype=float)
+    if len(data) < 4:
+        path = list(range(len(data)))
+        if len(data) < 2:
+            return 0, path
+        distances = build_distance_matrix(data)
+        return float(route_length(distances, np.array(path))), path
+
     logger.info("building the graph for a route of {}", len(data))
-    # build a graph
-    graph_data = build_graph(data)
+    distances = build_distance_matrix(data)
 
     # build a minimum spanning tree
     logger.info("Building a min span tree..")
-    min_span_tree = minimum_spanning_tree(graph_data)
+    min_span_tree = minimum_spanning_tree(distances)
 
     # find odd vertexes
     logger.info("Finding odd vertexes...")
-    odd_vertexes = find_odd_vertexes(min_span_tree)
+    odd_vertexes = find_odd_vertexes(min_span_tree, len(data))
 
     # add minimum weight matching edges to MST
     logger.info("Adding minimum weight matching edges to MST...")
-    minimum_weight_matching(min_span_tree, graph_data, odd_vertexes)
+    min_span_tree += minimum_weight_matching(distances, odd_vertexes)
 
     # find an eulerian tour
     logger.info("Finding and Eulerian tour...")
-    eulerian_tour = find_eulerian_tour(min_span_tree)
-
-    current = eulerian_tour[0]
-    path = [current]
-    visited = [False] * len(eulerian_tour)
-    visited[current] = True
-
-    length = 0
+    eulerian_tour = find_eulerian_tour(min_span_tree, len(data))
 
     logger.info("Visiting each node in our eulerian tour and making a route")
-    for node in eulerian_tour[1:]:
+    visited = np.zeros(len(data), dtype=bool)
+    path = []
+    for node in eulerian_tour:
         if not visited[node]:
-            path.append(node)
             visited[node] = True
+            path.append(node)
+    route = np.array(path, dtype=np.int64)
+    logger.debug("Initial route is {} long", route_length(distances, route))
 
-            length += graph_data[current][node]
-            current = node
+    logger.info("Improving the route...")
+    route = improve_route(distances, route, IMPROVEMENT_TIME_LIMIT)
 
     logger.info("Done making a route!")
-    return length, path
-
-
-def get_length(x1, y1, x2, y2):
-    return ((x1 - x2) ** 2 + (y1 - y2) ** 2) ** (1 / 2)
+    return float(route_length(distances, route)), route.tolist()
 
 
-def build_graph(data):
-    graph = {}
-    for this in range(len(data)):
-        for another_point in range(len(data)):
-            if this != another_point:
-                if this not in graph:
-                    graph[this] = {}
+def build_distance_matrix(data: np.ndarray) -> np.ndarray:
+    """
+    Euclidean distances between all points as float32 matrix of shape (n, n)
+    """
+    distances = np.empty((len(data), len(data)), dtype=np.float32)
+    for start in range(0, len(data), DISTANCE_MATRIX_BLOCK_SIZE):
+        block = data[start:start + DISTANCE_MATRIX_BLOCK_SIZE]
+        distances[start:start + len(block)] = np.hypot(block[:, np.newaxis, 0] - data[np.newaxis, :, 0],
+                                                       block[:, np.newaxis, 1] - data[np.newaxis, :, 1])
+    return distances
 
-                graph[this][another_point] = get_length(data[this][0], data[this][1], data[another_point][0],
-                                                        data[another_point][1])
 
-    return graph
+def route_length(distances: np.ndarray, route: np.ndarray) -> float:
+    return float(distances[route, np.roll(route, -1)].astype(np.float64).sum())
 
 
-class UnionFind:
-    def __init__(self):
-        self.weights = {}
-        self.parents = {}
+def minimum_spanning_tree(distances: np.ndarray) -> List[Tuple[int, int]]:
+    """
+    Prim's algorithm, updating the distances of all points to the tree at once
+    """
+    amount = len(distances)
+    in_tree = np.zeros(amount, dtype=bool)
+    in_tree[0] = True
+    distance_to_tree = distances[0].astype(np.float64)
+    distance_to_tree[0] = np.inf
+    closest_in_tree = np.zeros(amount, dtype=np.int64)
 
-    def __getitem__(self, obj):
-        if obj not in self.parents:
-            self.parents[obj] = obj
-            self.weights[obj] = 1
-            return obj
-
-        # find path of objects leading to the root
-        path = [obj]
-        root = self.parents[obj]
-        while root != path[-1]:
-            path.append(root)
-            root = self.parents[root]
-
-        # compress the path and return
-        for ancestor in path:
-            self.parents[ancestor] = root
-        return root
-
-    def __iter__(self):
-        return iter(self.parents)
-
-    def union(self, *objects):
-        roots = [self[x] for x in objects]
-        heaviest = max([(self.weights[r], r) for r in roots])[1]
-        for root in roots:
-            if root != heaviest:
-                self.weights[heaviest] += self.weights[root]
-                self.parents[root] = heaviest
-
-
-def minimum_spanning_tree(graph):
     tree = []
-    subtrees = UnionFind()
-    for W, u, v in sorted((graph[u][v], u, v) for u in graph for v in graph[u]):  # noqa: VNE001 N806
-        if subtrees[u] != subtrees[v]:
-            tree.append((u, v, W))
-            subtrees.union(u, v)
+    for _ in range(amount - 1):
+        vertex = int(np.argmin(distance_to_tree))
+        tree.append((int(closest_in_tree[vertex]), vertex))
+        in_tree[vertex] = True
+        distance_to_tree[vertex] = np.inf
+        closer = ~in_tree & (distances[vertex] < distance_to_tree)
+        distance_to_tree[closer] = distances[vertex][closer]
+        closest_in_tree[closer] = vertex
 
     return tree
 
 
-def find_odd_vertexes(min_span_tree):
-    tmp_g = {}
-    vertexes = []
-    for edge in min_span_tree:
-        if edge[0] not in tmp_g:
-            tmp_g[edge[0]] = 0
-
-        if edge[1] not in tmp_g:
-            tmp_g[edge[1]] = 0
-
-        tmp_g[edge[0]] += 1
-        tmp_g[edge[1]] += 1
-
-    for vertex in tmp_g:
-        if tmp_g[vertex] % 2 == 1:
-            vertexes.append(vertex)
-
-    return vertexes
-
-
-def minimum_weight_matching(min_span_tree, graph, odd_vert):
-    import random
-    random.shuffle(odd_vert)
-
-    while odd_vert:
-        vertex = odd_vert.pop()
-        length = float("inf")
-        index = 1
-        closest = 0
-        for index in odd_vert:
-            if vertex != index and graph[vertex][index] < length:
-                length = graph[vertex][index]
-                closest = index
-
-        min_span_tree.append((vertex, closest, length))
-        odd_vert.remove(closest)
-
-
-def find_eulerian_tour(matched_min_span_tree):
-    # find neigbours
-    neighbours = {}
-    for edge in matched_min_span_tree:
-        if edge[0] not in neighbours:
-            neighbours[edge[0]] = []
-
-        if edge[1] not in neighbours:
-            neighbours[edge[1]] = []
-
-        neighbours[edge[0]].append(edge[1])
-        neighbours[edge[1]].append(edge[0])
-
-    # finds the hamiltonian circuit
-    start_vertex = matched_min_span_tree[0][0]
-    ep = [neighbours[start_vertex][0]]
-
-    while len(matched_min_span_tree) > 0:
-        stop_ind = None
-        for ind, v in enumerate(ep):  # noqa: VNE001
-            if len(neighbours[v]) > 0:
-                stop_ind = ind
-                break
-
-        while len(neighbours[v]) > 0:
-            w = neighbours[v][0]  # noqa: VNE001
-
-            remove_edge_from_matched_mst(matched_min_span_tree, v, w)
-
-            del neighbours[v][(neighbours[v].index(w))]
-            del neighbours[w][(neighbours[w].index(v))]
-
-            stop_ind += 1
-            ep.insert(stop_ind, w)
-
-            v = w  # noqa: VNE001
-
-    return ep
-
-
-def remove_edge_from_matched_mst(matched_mst, v1, v2):
-    for i, item in enumerate(matched_mst):
-        if (item[0] == v2 and item[1] == v1) or (item[0] == v1 and item[1] == v2):
-            del matched_mst[i]
-
-    return matched_mst
+def find_odd_vertexes(min_span_tree: List[Tuple[int, int]], amount: int) -> List[int]:
+    degrees = np.bincount(np.array(min_span_tree, dtype=np.int64).ravel(), minlength=amount)
+    return np.flatnonzero(degrees % 2 == 1).tolist()
+
+
+def minimum_weight_matching(distances: np.ndarray, odd_vertexes: List[int]) -> List[Tuple[int, int]]:
+    """
+    Greedily matches every odd vertex with the closest odd vertex not matched yet
+    """
+    odd = np.array(odd_vertexes, dtype=np.int64)
+    odd_distances = distances[np.ix_(odd, odd)]
+    available = np.ones(len(odd), dtype=bool)
+
+    matching = []
+    for index in range(len(odd)):
+        if not available[index]:
+            continue
+        available[index] = False
+        closest = int(np.argmin(np.where(available, odd_distances[index], np.inf)))
+        available[closest] = False
+        matching.append((int(odd[index]), int(odd[closest])))
+
+    return matching
+
+
+def find_eulerian_tour(edges: List[Tuple[int, int]], amount: int) -> List[int]:
+    """
+    Hierholzer's algorithm on the multigraph given by the edges
+    """
+    neighbours = [[] for _ in range(amount)]
+    for edge_id, (start, end) in enumerate(edges):
+        neighbours[start].append((end, edge_id))
+        neighbours[end].append((start, edge_id))
+
+    used = bytearray(len(edges))
+    next_neighbour = [0] * amount
+    stack = [edges[0][0]]
+    tour = []
+    while stack:
+        vertex = stack[-1]
+        vertex_neighbours = neighbours[vertex]
+        position = next_neighbour[vertex]
+        while position < len(vertex_neighbours) and used[vertex_neighbours[position][1]]:
+            position += 1
+        next_neighbour[vertex] = position
+        if position == len(vertex_neighbours):
+            tour.append(stack.pop())
+        else:
+            neighbour, edge_id = vertex_neighbours[position]
+            used[edge_id] = 1
+            stack.append(neighbour)
+
+    tour.reverse()
+    return tour
+
+
+def improve_route(distances: np.ndarray, route: np.ndarray, time_limit: float) -> np.ndarray:
+    """
+    Applies 2-opt and Or-opt moves until there is no improvement left or the time limit is exceeded
+    """
+    deadline = time.time() + time_limit
+    min_improvement = route_length(distances, route) / len(route) * MIN_RELATIVE_IMPROVEMENT
+    improved = True
+    while improved and time.time() < deadline:
+        route, improved_two_opt = two_opt(distances, route, deadline, min_improvement)
+        route, improved_or_opt = or_opt(distances, route, deadline, min_improvement)
+        improved = improved_two_opt or improved_or_opt
+    return route
+
+
+def two_opt(distances: np.ndarray, route: np.ndarray, deadline: float,
+            min_improvement: float) -> Tuple[np.ndarray, bool]:
+    """
+    One pass replacing the edges (a, b) and (c, d) by (a, c) and (b, d) if shorter, checking all edges (c, d) of an
+    edge (a, b) at once
+    """
+    amount = len(route)
+    improved = False
+    successors = np.roll(route, -1)
+    edge_lengths = distances[route, successors]
+    for i in range(amount - 2):
+        if time.time() > deadline:
+            break
+        a, b = route[i], route[i + 1]
+        # the edge closing the round trip shares the first point with the edge (a, b)
+        last = amount - 1 if i == 0 else amount
+        # the matrix is symmetric, rows are faster to gather from than columns
+        gains = (edge_lengths[i] + edge_lengths[i + 2:last]
+                 - distances[a, route[i + 2:last]] - distances[b, successors[i + 2:last]])
+        best = int(np.argmax(gains))
+        if gains[best] > min_improvement:
+            j = i + 2 + best
+            route[i + 1:j + 1] = route[i + 1:j + 1][::-1].copy()
+            successors = np.roll(route, -1)
+            edge_lengths = distances[route, successors]
+            improved = True
+    return route, improved
+
+
+def or_opt(distances: np.ndarray, route: np.ndarray, deadline: float, min_improvement: float,
+           max_segment_length: int = 3) -> Tuple[np.ndarray, bool]:
+    """
+    One pass moving segments of up to max_segment_length points (reversed if shorter) to the edge (c, d) where
+    inserting them is the cheapest, checking all edges at once
+    """
+    amount = len(route)
+    improved = False
+    successors = np.roll(route, -1)
+    edge_lengths = distances[route, successors]
+    for segment_length in range(1, max_segment_length + 1):
+        if amount < segment_length + 3:
+            break
+        for i in range(1, amount - segment_length + 1):
+            if time.time() > deadline:
+                return route, improved
+            previous, first = route[i - 1], route[i]
+            last, following = route[i + segment_length - 1], route[(i + segment_length) % amount]
+            removal_gain = distances[previous, first] + distances[last, following] - distances[previous, following]
+            to_first = distances[first, route]
+            to_last = distances[last, route]
+            from_first = distances[first, successors]
+            from_last = distances[last, successors]
+            insertion_forward = to_first + from_last - edge_lengths
+            insertion_reversed = to_last + from_first - edge_lengths
+            insertion = np.minimum(insertion_forward, insertion_reversed)
+            # edges touching the segment are no valid targets
+            insertion[i - 1:i + segment_length] = np.inf
+            best = int(np.argmin(insertion))
+            if removal_gain - insertion[best] > min_improvement:
+                segment = route[i:i + segment_length]
+                if insertion_reversed[best] < insertion_forward[best]:
+                    segment = segment[::-1]
+                rest = np.concatenate((route[:i], route[i + segment_length:]))
+                position = best if best < i else best - segment_length
+                route = np.concatenate((rest[:position + 1], segment, rest[position + 1:]))
+                successors = np.roll(route, -1)
+                edge_lengths = distances[route, successors]
+                improved = True
+    return route, improved
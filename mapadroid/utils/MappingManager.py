@@ -11,6 +11,7 @@ from mapadroid.db.DbWrapper import DbWrapper
 from mapadroid.geofence.geofenceHelper import GeofenceHelper
 from mapadroid.route import RouteManagerBase, RouteManagerIV
 from mapadroid.route.RouteManagerFactory import RouteManagerFactory
+from mapadroid.route.routecalc import calculate_route_pool
 from mapadroid.utils.collections import Location
 from mapadroid.utils.language import get_mon_ids
 from mapadroid.utils.logging import LoggerEnums, get_logger
@@ -95,6 +96,8 @@ class MappingManager:
         self.__shutdown_event: Event = Event()
         self.join_routes_queue = JoinQueue(self.__shutdown_event, self)
         self.__mappings_mutex: Lock = Lock()
+        # bumped with every update of the mappings to let other processes know when to refresh their copies
+        self.__mappings_version: int = 0
 
         self.update(full_lock=True)
 
@@ -106,10 +109,22 @@ class MappingManager:
 
     def shutdown(self):
         logger.fatal("MappingManager exiting")
+        calculate_route_pool.stop_pool()
 
     def get_auths(self) -> Optional[dict]:
         return self._auths
 
+    def get_mappings_version(self) -> int:
+        return self.__mappings_version
+
+    def get_auth_snapshot(self) -> Tuple[int, Set[str], Optional[dict]]:
+        """
+        :return: the version of the mappings, the origins of the devices and the auths in a single call
+        """
+        with self.__mappings_mutex:
+            origins = set(self._devicemappings.keys()) if self._devicemappings is not None else set()
+            return self.__mappings_version, origins, self._auths
+
     def get_devicemappings_of(self, device_name: str) -> Optional[dict]:
         return self._devicemappings.get(device_name, None)
 
@@ -333,7 +348,11 @@ class MappingManager:
             inheritsettings[device_setting] = devicesettings[device_setting]
         return inheritsettings
 
-    def __get_latest_routemanagers(self) -> Optional[Dict[str, dict]]:
+    def __get_latest_routemanagers(self, live_areas: Optional[Dict[str, dict]] = None) -> Optional[Dict[str, dict]]:
+        """
+        Builds the routemanagers of all areas. Areas of live_areas whose inputs (area, geofences, IV list and
+        routefile) did not change are taken over as they are including their routemanager.
+        """
         global mode_mapping
         areas: Optional[Dict[str, dict]] = {}
 
@@ -342,7 +361,8 @@ class MappingManager:
 
         raw_areas = self.__data_manager.get_root_resource('area')
 
-        thread_pool = ThreadPool(processes=4)
+        # the threads are mostly waiting on the route calculation processes and the DB
+        thread_pool = ThreadPool(processes=max(4, calculate_route_pool.get_pool_size()))
 
         areas_procs = {}
         for area_id, area_true in raw_areas.items():
@@ -379,7 +399,6 @@ class MappingManager:
 
             # grab coords
             # first check if init is false, if so, grab the coords from DB
-            geofence_helper = GeofenceHelper(geofence_included, geofence_excluded)
             mode = area_true.area_type
             # build routemanagers
 
@@ -390,6 +409,19 @@ class MappingManager:
                     self.get_monlist(area_id)
             route_resource = self.__data_manager.get_resource('routecalc', identifier=area["routecalc"])
 
+            area_inputs = {
+                "mode": mode,
+                "area": area,
+                "geofence_included": geofence_included.get_resource(),
+                "geofence_excluded": geofence_excluded.get_resource() if geofence_excluded is not None else None
+            }
+            live_area = live_areas.get(area_id) if live_areas is not None else None
+            if live_area is not None and not self.__area_changed(live_area, area_inputs, route_resource):
+                logger.debug("Area {} did not change, keeping its routemanager", area["name"])
+                areas[area_id] = live_area
+                continue
+
+            geofence_helper = GeofenceHelper(geofence_included, geofence_excluded)
             calc_type: str = area.get("route_calc_algorithm", "route")
             route_manager = RouteManagerFactory.get_routemanager(self.__db_wrapper, self.__data_manager,
                                                                  area_id, None,
@@ -447,6 +479,7 @@ class MappingManager:
                     areas_procs[area_id] = proc
 
             area_dict["routemanager"] = route_manager
+            area_dict["inputs"] = area_inputs
             areas[area_id] = area_dict
 
         for area in areas_procs.keys():
@@ -457,6 +490,14 @@ class MappingManager:
         thread_pool.join()
         return areas
 
+    @staticmethod
+    def __area_changed(live_area: dict, area_inputs: dict, route_resource) -> bool:
+        if live_area.get("inputs") != area_inputs:
+            return True
+        # the routemanager saves recalculated routes to its routecalc resource, anything else is a change in madmin
+        live_route_resource = live_area["routemanager"]._route_resource
+        return live_route_resource is None or live_route_resource['routefile'] != route_resource['routefile']
+
     def __get_latest_devicemappings(self) -> dict:
         # returns mapping of devises to areas
         devices = {}
@@ -620,13 +661,19 @@ class MappingManager:
             areas_tmp = self.__get_latest_areas()
             self.__areamons = self.__get_latest_areamons(areas_tmp)
             devicemappings_tmp = self.__get_latest_devicemappings()
-            routemanagers_tmp = self.__get_latest_routemanagers()
+            routemanagers_tmp = self.__get_latest_routemanagers(self._routemanagers)
             auths_tmp = self.__get_latest_auths()
 
-            for area in self._routemanagers:
-                logger.info("Stopping all routemanagers and join threads")
-                self._routemanagers[area]['routemanager'].stop_routemanager(joinwithqueue=False)
-                self._routemanagers[area]['routemanager'].join_threads()
+            kept_areas = 0
+            for area_id, area in self._routemanagers.items():
+                if routemanagers_tmp.get(area_id) is area:
+                    kept_areas += 1
+                    continue
+                logger.info("Stopping routemanager of area {} and join threads", area['name'])
+                area['routemanager'].stop_routemanager(joinwithqueue=False)
+                area['routemanager'].join_threads()
+            logger.info("Kept {} unchanged areas, (re)built {} areas", kept_areas,
+                        len(routemanagers_tmp) - kept_areas)
 
             logger.info("Restoring old devicesettings")
             for dev in self._devicemappings:
@@ -649,6 +696,7 @@ class MappingManager:
                 self._devicemappings = devicemappings_tmp
                 self._routemanagers = routemanagers_tmp
                 self._auths = auths_tmp
+                self.__mappings_version += 1
 
         else:
             logger.debug("Acquiring lock to update mappings,full")
@@ -659,6 +707,7 @@ class MappingManager:
                 self._routemanagers = self.__get_latest_routemanagers()
                 self._devicemappings = self.__get_latest_devicemappings()
                 self._auths = self.__get_latest_auths()
+                self.__mappings_version += 1
 
         logger.info("Mappings have been updated")
 
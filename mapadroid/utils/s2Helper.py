@@ -1,8 +1,8 @@
 import math
-import multiprocessing
-from typing import List
+from typing import List, Tuple
 
 import gpxdata
+import numpy as np
 import s2sphere
 
 from mapadroid.geofence.geofenceHelper import GeofenceHelper
@@ -13,6 +13,9 @@ from mapadroid.utils.logging import LoggerEnums, get_logger
 
 logger = get_logger(LoggerEnums.utils)
 
+# earth radius in meters as used by gpxdata
+EARTH_RADIUS = gpxdata.Util.r_earth
+
 
 class S2Helper:
     @staticmethod
@@ -50,21 +53,27 @@ class S2Helper:
         return s2sphere.math.degrees(cell.lat().radians), s2sphere.math.degrees(cell.lng().radians), 0
 
     @staticmethod
-    def _generate_star_locs(center, distance, ring):
-        results = []
-        for i in range(0, 6):
-            # Star_locs will contain the locations of the 6 vertices of
-            # the current ring (90,150,210,270,330 and 30 degrees from
-            # origin) to form a star
-            star_loc = S2Helper.get_new_coords(center, distance * ring,
-                                               90 + 60 * i)
-            for index in range(0, ring):
-                # Then from each point on the star, create locations
-                # towards the next point of star along the edge of the
-                # current ring
-                loc = S2Helper.get_new_coords(star_loc, distance * index, 210 + 60 * i)
-                results.append(loc)
-        return results
+    def _generate_star_locs(center: Location, distance: float, step_limit: int) -> np.ndarray:
+        """
+        Generates the locations of all rings of the hex around the center (excluding the center itself) at once.
+        The order matches walking ring by ring from the center outwards.
+        :return: array of shape (n, 2) holding latitudes and longitudes
+        """
+        rings = np.arange(1, step_limit)
+        # every ring holds 6 * ring locations, the rings before it 3 * ring * (ring - 1)
+        ring = np.repeat(rings, 6 * rings)
+        position = np.arange(len(ring)) - 3 * ring * (ring - 1)
+        side = position // ring
+        index = position % ring
+        # Star_locs contain the locations of the 6 vertices of the current ring (90,150,210,270,330 and 30 degrees
+        # from origin) to form a star
+        star_lats, star_lngs = S2Helper.get_new_coords_many(np.full(len(ring), center.lat),
+                                                            np.full(len(ring), center.lng),
+                                                            90 + 60 * side, distance * ring)
+        # Then from each point on the star, create locations towards the next point of star along the edge of the
+        # current ring
+        lats, lngs = S2Helper.get_new_coords_many(star_lats, star_lngs, 210 + 60 * side, distance * index)
+        return np.stack((lats, lngs), axis=1)
 
     # the following stuff is drafts for further consideration
     @staticmethod
@@ -94,86 +103,51 @@ class S2Helper:
         # This will loop thorugh all the rings in the hex from the centre
         # moving outwards
         logger.info("Calculating positions for init scan")
-        num_cores = multiprocessing.cpu_count()
-        with multiprocessing.Pool(processes=num_cores) as pool:
-            temp = [pool.apply(S2Helper._generate_star_locs, args=(
-                center, distance, i)) for i in range(1, step_limit)]
-
-        results = [item for sublist in temp for item in sublist]
-        results.append(Location(center.lat, center.lng))
+        locations = np.concatenate((S2Helper._generate_star_locs(center, distance, step_limit),
+                                    [(center.lat, center.lng)]))
 
         logger.info("Filtering positions for init scan")
         # Geofence results.
         if geofence_helper is not None and geofence_helper.is_enabled():
-            results = geofence_helper.get_geofenced_coordinates(results)
-            if not results:
+            locations = locations[geofence_helper.contains_many(locations)]
+            if len(locations) == 0:
                 logger.error('No cells regarded as valid for desired scan area. Check your provided geofences. '
                              'Aborting.')
             else:
                 logger.info("Ordering location")
-                results = S2Helper.order_location_list_rows(results)
-        return results
-
-    @staticmethod
-    def get_most_north(location_list):
-        if location_list is None or len(location_list) == 0:
-            return None
-        most_north_and_east = location_list[0]
-        for location in location_list:
-            if location.lat > most_north_and_east.lat + 1e-5:
-                most_north_and_east = location
-        return most_north_and_east
+                locations = locations[S2Helper._get_row_order(locations)]
+        return [Location(lat, lng) for lat, lng in locations.tolist()]
 
     @staticmethod
     def order_location_list_rows(location_list: List[Location]):
         if location_list is None or len(location_list) == 0:
             return []
 
-        new_list = []
-        flip = False
-        while len(location_list) > 0:
-            next_row = S2Helper.get_most_northern_row(location_list)
-            next_row = S2Helper.sort_row_from_west(next_row)
-            if flip:
-                next_row.reverse()
-                flip = False
-            else:
-                flip = True
-            for loc in next_row:
-                new_list.append(loc)
-            location_list = S2Helper.delete_row_from_list(
-                location_list, next_row)
-        return new_list
+        order = S2Helper._get_row_order(np.array([(loc.lat, loc.lng) for loc in location_list], dtype=float))
+        return [location_list[index] for index in order]
 
     @staticmethod
-    def get_most_northern_row(location_list: List[Location]):
-        if location_list is None or len(location_list) == 0:
-            return []
-
-        most_north = S2Helper.get_most_north(location_list)
-        row = []
-        for location in location_list:
-            if most_north.lat - 1e-4 <= location.lat <= most_north.lat + 1e-4:
-                row.append(location)
-
-        return row
-
-    @staticmethod
-    def delete_row_from_list(location_list, row):
-        if row is None or len(row) == 0:
-            return location_list
-        elif location_list is None or len(location_list) == 0:
-            return []
-
-        for loc in row:
-            location_list.remove(loc)
-        return location_list
-
-    @staticmethod
-    def sort_row_from_west(row):
-        if row is None or len(row) == 0:
-            return []
-        return sorted(row, key=lambda x: x.lng)
+    def _get_row_order(locations: np.ndarray) -> np.ndarray:
+        """
+        Orders the locations by rows from north to south, walking the rows from west to east and back alternately.
+        Locations within 1e-4 degrees of latitude of the most northern location of a row belong to the row.
+        :return: the indexes of the locations in order
+        """
+        north_first = np.argsort(-locations[:, 0], kind="stable")
+        lats = locations[north_first, 0]
+        rows = np.empty(len(lats), dtype=np.int64)
+        row = 0
+        row_start = 0
+        # rows are few compared to the locations, find the first location past each row by bisection
+        while row_start < len(lats):
+            row_end = row_start + int(np.searchsorted(-lats[row_start:], -(lats[row_start] - 1e-4), side="right"))
+            rows[row_start:row_end] = row
+            row += 1
+            row_start = row_end
+        lngs = locations[north_first, 1]
+        # flip every other row to walk it from east to west
+        lngs = np.where(rows % 2 == 1, -lngs, lngs)
+        return north_first[np.lexsort((lngs, rows))]
 
     @staticmethod
     # Returns destination coords given origin coords, distance (Kms) and bearing.
@@ -188,6 +162,21 @@ class S2Helper:
 
         return Location(destination.lat, destination.lon)
 
+    @staticmethod
+    def get_new_coords_many(lats: np.ndarray, lngs: np.ndarray, bearings: np.ndarray,
+                            distances: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Vectorised get_new_coords of arrays of locations, bearings (degrees) and distances (meters) on a great circle
+        """
+        lat_rad = np.radians(lats)
+        distance_rad = distances / EARTH_RADIUS
+        bearing_rad = np.radians(bearings)
+        sin_lat = np.sin(lat_rad) * np.cos(distance_rad) + np.cos(lat_rad) * np.sin(distance_rad) * np.cos(bearing_rad)
+        lng_diff = np.arctan2(np.sin(bearing_rad) * np.sin(distance_rad) * np.cos(lat_rad),
+                              np.cos(distance_rad) - np.sin(lat_rad) * sin_lat)
+        new_lngs = (lngs + np.degrees(lng_diff)) % 360
+        return np.degrees(np.arcsin(sin_lat)), np.where(new_lngs > 180, new_lngs - 360, new_lngs)
+
     @staticmethod
     # Returns a set of S2 cells within circle around position
     def get_s2cells_from_circle(lat, lng, radius, level=15):
@@ -54,6 +54,9 @@ def parse_args():
                         help='Name of MySQL Database')
     parser.add_argument('-dbps', '--db_poolsize', type=int, default=2,
                         help='Size of MySQL pool (open connections to DB). Default: 2')
+    parser.add_argument('-dbpl', '--db_process_local_pool', action='store_true', default=False,
+                        help='Every process of MAD connects to the DB with a pool of its own instead of passing all '
+                             'queries to a single pool process. db_poolsize applies per process. Default: False')
 
     # Websocket Settings (RGC receiver)
     parser.add_argument('-wsip', '--ws_ip', required=False, default="0.0.0.0", type=str,
@@ -68,8 +71,22 @@ def parse_args():
                         help='IP to listen on for proto data (MITM data). Default: 0.0.0.0')
     parser.add_argument('-mrport', '--mitmreceiver_port', required=False, default=8000,
                         help='Port to listen on for proto data (MITM data). Default: 8000')
+    parser.add_argument('-mrp', '--mitmreceiver_processes', type=int, default=1,
+                        help='Amount of processes receiving MITM data on the same port. Default: 1')
     parser.add_argument('-mrdw', '--mitmreceiver_data_workers', type=int, default=2,
                         help='Amount of workers to work off the data that queues up. Default: 2')
+    parser.add_argument('-mwbw', '--mitm_write_behind_window', type=float, default=0,
+                        help='Seconds the MITM data workers buffer upserts of stops, gyms and cells in order to '
+                             'coalesce rows seen repeatedly and write them in batches. Keep it at a few seconds as '
+                             'webhooks are delayed accordingly. Default: 0 (off)')
+    parser.add_argument('-mqms', '--mitm_queue_max_size', type=int, default=1000,
+                        help='Amount of items queued for a MITM data worker at which new data of the types given by '
+                             'mitm_queue_shed_types is dropped and only the latest of it queued is kept for every '
+                             'device. Default: 1000 (0 for unbounded)')
+    parser.add_argument('-mqst', '--mitm_queue_shed_types', default='106',
+                        help='Comma separated method IDs of MITM data that may be skipped in favour of newer data of '
+                             'the same device and location, or of the same device when the queue is full. '
+                             'Default: 106 (GMO)')
     parser.add_argument('-miptt', '--mitm_ignore_proc_time_thresh', type=int, default=0,
                         help='Ignore MITM data having a timestamp too far in the past.'
                              'Specify in seconds. Default: 0 (off)')
@@ -107,6 +124,12 @@ def parse_args():
                         help='Amount of threads/processes to be used for screenshot-analysis. Default: 2')
     parser.add_argument('-or', '--only_routes', action='store_true', default=False,
                         help='Only calculate routes, then exit the program. No scanning.')
+    parser.add_argument('-rcp', '--route_calc_processes', type=int, default=0,
+                        help='Amount of processes calculating routes of multiple areas in parallel on startup and '
+                             'reload. Default: 0 (one per CPU)')
+    parser.add_argument('-rcto', '--route_calc_timeout', type=int, default=7200,
+                        help='Seconds to wait for a route calculated by one of the route_calc_processes before '
+                             'calculating it again within MAD, e.g. if the process has been killed. Default: 7200')
     parser.add_argument('-cm', '--config_mode', action='store_true', default=False,
                         help='Run in ConfigMode')
     parser.add_argument('-nm', '--scan_nearby_mons', action='store_true', default=False,
@@ -224,6 +247,15 @@ def parse_args():
                         help='Debug: Set initial timestamp to fetch changed elements from the DB to send via WH.')
     parser.add_argument('-whmps', '--webhook_max_payload_size', default=0, type=int,
                         help='Split up the payload into chunks and send multiple requests. Default: 0 (unlimited)')
+    parser.add_argument('-whci', '--webhook_catchup_interval', default=60, type=int,
+                        help='Mons, raids and quests are sent as soon as the MITM data processors have written them. '
+                             'Interval in seconds to check the DB for any of them missed. 0 disables sending them '
+                             'right away, checking the DB every 10 seconds instead. Default: 60')
+    parser.add_argument('-whcon', '--webhook_connections', default=2, type=int,
+                        help='Amount of payloads sent to every webhook receiver in parallel. Default: 2')
+    parser.add_argument('-whmb', '--webhook_max_backlog', default=100, type=int,
+                        help='Amount of payloads queued per webhook receiver, any further payload is dropped while a '
+                             'receiver does not keep up. Default: 100')
 
     # Dynamic Rarity
     parser.add_argument('-rh', '--rarity_hours', type=int, default=72,
@@ -292,6 +324,11 @@ def parse_args():
                         help=('Redis port used by caching'))
     parser.add_argument('-cdb', '--cache_database', default=0,
                         help=('Redis database. Use different numbers (0-15) if you are running multiple instances'))
+    parser.add_argument('-cty', '--cache_type', choices=['redis', 'memory'], default='redis',
+                        help=('Backend of the cache. memory keeps a cache in every process of MAD and does not '
+                              'require a Redis server. Default: redis'))
+    parser.add_argument('-cms', '--cache_memory_size', type=int, default=100000,
+                        help=('Maximum amount of entries kept per process by the in-memory cache. Default: 100000'))
 
     if "MODE" in os.environ and os.environ["MODE"] == "DEV":
         args = parser.parse_known_args()[0]
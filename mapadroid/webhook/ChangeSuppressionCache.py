@@ -0,0 +1,51 @@
+from collections import Counter
+from typing import Collection, Dict, Hashable, Tuple
+
+from cachetools import TTLCache
+
+
+class ChangeSuppressionCache:
+    """
+    Remembers a fingerprint of the payload last sent of every entity (e.g. gym, stop, weather cell) to drop payloads
+    not having changed since. Fingerprints expire after ttl seconds to send unchanged entities again once in a while,
+    at most max_entries entities are remembered with the least recently used being evicted first.
+    """
+
+    def __init__(self, max_entries: int = 200000, ttl: float = 3600):
+        self._fingerprints: TTLCache = TTLCache(maxsize=max_entries, ttl=ttl)
+        self._hits: Dict[str, int] = Counter()
+        self._misses: Dict[str, int] = Counter()
+
+    def is_unchanged(self, webhook_type: str, key: Hashable, payload: dict,
+                     ignored_fields: Collection[str] = ()) -> bool:
+        """
+        Checks the payload of the entity against the one last sent and remembers it
+        :param ignored_fields: fields changing without the entity having changed (e.g. the time of the last scan) or
+        not being hashable
+        :return: whether the payload is the same as the one last sent
+        """
+        fingerprint = hash(tuple(sorted((field, value) for field, value in payload.items()
+                                        if field not in ignored_fields)))
+        cache_key = (webhook_type, key)
+        if self._fingerprints.get(cache_key, None) == fingerprint:
+            self._hits[webhook_type] += 1
+            return True
+        self._fingerprints[cache_key] = fingerprint
+        self._misses[webhook_type] += 1
+        return False
+
+    def clear(self):
+        """
+        Forgets the payloads sent, e.g. as they may have not been received
+        """
+        self._fingerprints.clear()
+
+    def get_hit_counts(self) -> Dict[str, Tuple[int, int]]:
+        """
+        :return: the amount of payloads dropped as unchanged and the amount of payloads checked by webhook type
+        """
+        return {webhook_type: (self._hits[webhook_type], self._hits[webhook_type] + self._misses[webhook_type])
+                for webhook_type in self._misses.keys() | self._hits.keys()}
+
+    def __len__(self):
+        return len(self._fingerprints)
@@ -0,0 +1,151 @@
+import queue
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from mapadroid.utils.logging import LoggerEnums, get_logger
+
+logger = get_logger(LoggerEnums.webhook)
+
+# weight of the latest request when averaging the latency of a receiver
+LATENCY_SMOOTHING = 0.2
+
+
+class WebhookReceiver:
+    """
+    Delivers the payloads of a single webhook receiver. Encoded chunks are queued up to max_backlog and sent by the
+    given amount of threads in parallel on a keep-alive session, independently of any other receiver.
+    Chunks failing due to connection errors, timeouts or server errors are retried with an exponential backoff.
+    Once failure_threshold chunks in a row could not be delivered, the receiver is considered down and chunks are
+    dropped for a cooldown before trying again.
+    """
+    timeout = 5
+    max_retries = 2
+    retry_backoff = 1
+    failure_threshold = 5
+    cooldown = 60
+
+    def __init__(self, url: str, types: Optional[List[str]], connections: int = 2, max_backlog: int = 100):
+        self.url: str = url
+        self.types: Optional[List[str]] = types
+        self._queue: queue.Queue = queue.Queue(max(1, max_backlog))
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, connections))
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        self._session.headers.update({"Content-Type": "application/json"})
+        self._stats_mutex = threading.Lock()
+        self._sent: int = 0
+        self._failed: int = 0
+        self._dropped: int = 0
+        self._latency: float = 0.0
+        self._consecutive_failures: int = 0
+        self._down_until: float = 0
+        self._stop_event = threading.Event()
+        self._sender_threads: List[threading.Thread] = []
+        for sender_id in range(max(1, connections)):
+            sender_thread = threading.Thread(name="WebhookReceiver-{}".format(sender_id), target=self._send_loop)
+            sender_thread.daemon = True
+            sender_thread.start()
+            self._sender_threads.append(sender_thread)
+
+    def submit(self, data: bytes, type_count: Dict[str, int]) -> bool:
+        """
+        Queues a chunk of payloads to be sent
+        :param data: the chunk encoded as JSON, may be shared by multiple receivers
+        :param type_count: the amount of payloads of every type within the chunk
+        :return: whether the chunk has been queued rather than dropped as the backlog is full
+        """
+        try:
+            self._queue.put_nowait((data, type_count))
+            return True
+        except queue.Full:
+            with self._stats_mutex:
+                self._dropped += 1
+            logger.warning("Backlog of webhook {} is full, dropping payload", self.url)
+            return False
+
+    def get_stats(self) -> Dict:
+        with self._stats_mutex:
+            return {
+                "backlog": self._queue.qsize(),
+                "sent": self._sent,
+                "failed": self._failed,
+                "dropped": self._dropped,
+                "latency": self._latency,
+                "down": self._down_until > time.time()
+            }
+
+    def stop(self):
+        self._stop_event.set()
+        for _ in self._sender_threads:
+            try:
+                self._queue.put_nowait(None)
+            except queue.Full:
+                break
+        for sender_thread in self._sender_threads:
+            sender_thread.join(self.timeout)
+        self._session.close()
+
+    def _send_loop(self):
+        while not self._stop_event.is_set():
+            chunk = self._queue.get()
+            if chunk is None:
+                break
+            try:
+                self._send(chunk)
+            except Exception as e:
+                logger.exception("Failed sending payload to webhook {}: {}", self.url, e)
+
+    def _send(self, chunk: Tuple[bytes, Dict[str, int]]):
+        if self._down_until > time.time():
+            with self._stats_mutex:
+                self._dropped += 1
+            return
+        data, type_count = chunk
+        for attempt in range(self.max_retries + 1):
+            if attempt > 0 and self._stop_event.wait(self.retry_backoff * 2 ** (attempt - 1)):
+                break
+            started = time.time()
+            try:
+                response = self._session.post(self.url, data=data, timeout=self.timeout)
+            except requests.RequestException as e:
+                logger.warning("Exception occured while sending webhook to {}: {}", self.url, e)
+                self._record_latency(started)
+                continue
+            self._record_latency(started)
+            if response.status_code == 200:
+                self._record_success(type_count)
+                return
+            logger.warning("Webhook destination {} returned status code other than 200 OK: {}",
+                           self.url, response.status_code)
+            if response.status_code < 500 and response.status_code != 429:
+                # the receiver is up but refuses the payload, sending it again won't help
+                with self._stats_mutex:
+                    self._failed += 1
+                return
+        self._record_failure()
+
+    def _record_latency(self, started: float):
+        with self._stats_mutex:
+            self._latency += (time.time() - started - self._latency) * LATENCY_SMOOTHING
+
+    def _record_success(self, type_count: Dict[str, int]):
+        with self._stats_mutex:
+            self._sent += 1
+            self._consecutive_failures = 0
+        logger.success("Successfully sent payload to webhook {}. Stats: {}", self.url, type_count)
+
+    def _record_failure(self):
+        with self._stats_mutex:
+            self._failed += 1
+            self._consecutive_failures += 1
+            if self._consecutive_failures < self.failure_threshold:
+                return
+            self._consecutive_failures = 0
+            self._down_until = time.time() + self.cooldown
+        logger.warning("Webhook {} failed {} times in a row, dropping its payloads for {}s", self.url,
+                       self.failure_threshold, self.cooldown)
@@ -0,0 +1,68 @@
+import time
+from multiprocessing import Queue, Value
+from queue import Empty, Full
+from typing import Dict, Hashable, Iterable, Set
+
+from mapadroid.utils.logging import LoggerEnums, get_logger
+
+logger = get_logger(LoggerEnums.webhook)
+
+# seconds changes published shortly after one another are collected to be sent at once
+BATCH_WINDOW = 0.1
+
+
+class WebhookStream:
+    """
+    Stream of changes written by the MITM data processors to be sent via webhook right away. Changes are the type of
+    the webhook (pokemon, raid, quest) and the primary keys of the rows written. They are published once the rows
+    have been committed. Shared between processes by forking.
+    Changes are dropped rather than blocking the data processors if the webhook worker does not keep up, the worker
+    checking the DB for changes in intervals picks them up.
+    """
+
+    def __init__(self, max_size: int = 10000):
+        self._queue: Queue = Queue(max_size)
+        self._dropped = Value('L', 0)
+
+    def publish(self, webhook_type: str, keys: Iterable[Hashable]):
+        keys = list(keys)
+        if not keys:
+            return
+        try:
+            self._queue.put_nowait((webhook_type, keys))
+        except Full:
+            with self._dropped.get_lock():
+                self._dropped.value += 1
+            logger.debug("Webhook stream is full, dropped {} changes of type {}", len(keys), webhook_type)
+
+    def collect(self, timeout: float) -> Dict[str, Set[Hashable]]:
+        """
+        Waits up to timeout seconds for changes and collects any other change published within BATCH_WINDOW
+        :return: the keys of the changes by their webhook type
+        """
+        changes: Dict[str, Set[Hashable]] = {}
+        try:
+            webhook_type, keys = self._queue.get(timeout=max(0.0, timeout))
+        except Empty:
+            return changes
+        changes.setdefault(webhook_type, set()).update(keys)
+        deadline = time.time() + BATCH_WINDOW
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            try:
+                webhook_type, keys = self._queue.get(timeout=remaining)
+            except Empty:
+                break
+            changes.setdefault(webhook_type, set()).update(keys)
+        return changes
+
+    def get_dropped_count(self) -> int:
+        """
+        :return: the amount of publications dropped as the stream was full
+        """
+        return self._dropped.value
+
+    def close(self):
+        self._queue.close()
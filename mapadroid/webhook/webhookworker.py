@@ -1,35 +1,62 @@
 import json
+import math
 import time
-from typing import List
+from datetime import timezone
+from typing import Dict, Hashable, List, Optional, Set
 
-import requests
+import numpy as np
 
 from mapadroid.db.DbWebhookReader import DbWebhookReader
 from mapadroid.geofence.geofenceHelper import GeofenceHelper
+from mapadroid.geofence.geofenceIndex import GeofenceIndex
 from mapadroid.utils import MappingManager
 from mapadroid.utils.gamemechanicutil import calculate_mon_level
 from mapadroid.utils.logging import LoggerEnums, get_logger
 from mapadroid.utils.madGlobals import terminate_mad
 from mapadroid.utils.questGen import generate_quest
 from mapadroid.utils.s2Helper import S2Helper
+from mapadroid.webhook.ChangeSuppressionCache import ChangeSuppressionCache
+from mapadroid.webhook.WebhookReceiver import WebhookReceiver
+from mapadroid.webhook.WebhookStream import WebhookStream
+
+try:
+    import orjson
+except ImportError:
+    # Pass as this is an optional requirement, orjson encodes the payloads a lot faster than json if installed
+    orjson = None
 
 logger = get_logger(LoggerEnums.webhook)
 
+# keys of streamed changes looked up in the DB at once
+MAX_KEYS_PER_QUERY = 1000
+
+
+def dumps(payload) -> bytes:
+    if orjson is not None:
+        try:
+            return orjson.dumps(payload)
+        except orjson.JSONEncodeError:
+            # e.g. integers beyond 64 bit, which json is less strict about
+            pass
+    return json.dumps(payload).encode("utf-8")
+
 
 class WebhookWorker:
     __IV_MON: List[int] = List[int]
-    __excluded_areas = {}
 
     def __init__(self, args, data_manager, mapping_manager: MappingManager, rarity,
-                 db_webhook_reader: DbWebhookReader):
+                 db_webhook_reader: DbWebhookReader, webhook_stream: Optional[WebhookStream] = None):
         self.__worker_interval_sec = 10
+        self.__catchup_interval_sec = args.webhook_catchup_interval
+        # mons, raids and quests are sent as they are streamed, the DB is checked for them to catch up only
+        self.__webhook_stream: Optional[WebhookStream] = webhook_stream
         self.__args = args
         self.__data_manager = data_manager
         self.__db_wrapper = self.__data_manager.dbc
         self._db_reader = db_webhook_reader
         self.__rarity = rarity
         self.__last_check = int(time.time())
-        self.__webhook_receivers = []
+        self.__webhook_receivers: List[WebhookReceiver] = []
         self.__webhook_types = set()
         self.__pokemon_types = set()
         self.__valid_types = [
@@ -44,6 +71,14 @@ class WebhookWorker:
 
         if self.__args.webhook_start_time != 0:
             self.__last_check = int(self.__args.webhook_start_time)
+        self.__last_catchup = self.__last_check
+        self.__next_catchup = 0
+        # keys of the streamed changes sent by webhook type and the time their rows have been read at
+        self.__streamed: Dict[str, Dict[Hashable, float]] = {"pokemon": {}, "raid": {}, "quest": {}}
+        # gyms, stops and weather are sent again whenever rescanned, unless unchanged since the last time
+        self.__change_cache: ChangeSuppressionCache = ChangeSuppressionCache()
+        # chunks dropped or failed by the receivers the last time checked
+        self.__lost_chunks: int = 0
 
     def __payload_type_count(self, payload):
         count = {}
@@ -59,22 +94,30 @@ class WebhookWorker:
 
         return [payload[x: x + size] for x in range(0, len(payload), size)]
 
-    def __is_in_excluded_area(self, coordinate):
-        for gfh in self.__excluded_areas:
-            if gfh.is_coord_inside_include_geofence(coordinate):
-                return True
-
-        return False
+    def __drop_excluded(self, rows):
+        """
+        Drops the rows located within any of the excluded areas, checking all of them at once
+        """
+        if len(self.__excluded_areas) == 0 or len(rows) == 0:
+            return rows
+        excluded = self.__excluded_areas.contains_many(
+            np.array([(row["latitude"], row["longitude"]) for row in rows], dtype=float))
+        return [row for row, row_excluded in zip(rows, excluded) if not row_excluded]
 
     def __send_webhook(self, payloads):
         if len(payloads) == 0:
             logger.debug2("Payload empty. Skip sending to webhook.")
             return
 
-        current_wh_num = 1
+        # receivers subscribed to the same types share the chunks encoded once
+        webhooks_by_types: Dict[Optional[frozenset], List[WebhookReceiver]] = {}
         for webhook in self.__webhook_receivers:
+            sub_types = frozenset(webhook.types) if webhook.types is not None else None
+            webhooks_by_types.setdefault(sub_types, []).append(webhook)
+
+        for sub_types, webhooks in webhooks_by_types.items():
             payload_to_send = []
-            sub_types = webhook.get('types')
+            urls = [webhook.url for webhook in webhooks]
 
             if sub_types is not None:
                 for payload in payloads:
@@ -85,60 +128,40 @@ class WebhookWorker:
                 payload_to_send = payloads
 
             if len(payload_to_send) == 0:
-                logger.debug2("Payload empty. Skip sending to: {} (Filter: {})", webhook.get('url'), sub_types)
+                logger.debug2("Payload empty. Skip sending to: {} (Filter: {})", urls, sub_types)
                 continue
             else:
-                logger.debug2("Sending to webhook: {} (Filter: {})", webhook.get('url'), sub_types)
+                logger.debug2("Sending to webhook: {} (Filter: {})", urls, sub_types)
 
             payload_list = self.__payload_chunk(
                 payload_to_send, self.__args.webhook_max_payload_size
             )
 
-            current_pl_num = 1
             for payload_chunk in payload_list:
                 logger.debug4("Python data for payload: {}", payload_chunk)
-                logger.debug4("Payload: {}", json.dumps(payload_chunk))
-
-                try:
-                    response = requests.post(
-                        webhook.get('url'),
-                        data=json.dumps(payload_chunk),
-                        headers={"Content-Type": "application/json"},
-                        timeout=5,
-                    )
-
-                    if response.status_code != 200:
-                        logger.warning("Webhook destination {} returned status code other than 200 OK: {}",
-                                       webhook.get('url'), response.status_code)
-                    else:
-                        if len(self.__webhook_receivers) > 1:
-                            whcount_text = " [wh {}/{}]".format(current_wh_num, len(self.__webhook_receivers))
-                        else:
-                            whcount_text = ""
-
-                        if len(payload_list) > 1:
-                            whchunk_text = " [pl {}/{}]".format(current_pl_num, len(payload_list))
-                        else:
-                            whchunk_text = ""
-
-                        logger.success("Successfully sent payload to webhook{}{}. Stats: {}", whchunk_text,
-                                       whcount_text, json.dumps(self.__payload_type_count(payload_chunk)))
-                except Exception as e:
-                    logger.warning("Exception occured while sending webhook: {}", e)
-
-                current_pl_num += 1
-            current_wh_num += 1
+                data = dumps(payload_chunk)
+                logger.opt(lazy=True).log("DEBUG4", "Payload: {}", lambda: data.decode("utf-8"))
+                type_count = self.__payload_type_count(payload_chunk)
+                # sent by the threads of the receiver to not have a slow receiver hold up any other
+                for webhook in webhooks:
+                    webhook.submit(data, type_count)
+
+    def __log_stats(self):
+        for webhook_type, (unchanged, checked) in sorted(self.__change_cache.get_hit_counts().items()):
+            logger.debug("Dropped {} of {} {} payloads as unchanged ({:.0f}%)", unchanged, checked, webhook_type,
+                         100 * unchanged / checked if checked else 0)
+        for webhook in self.__webhook_receivers:
+            stats = webhook.get_stats()
+            log = logger.info if stats["backlog"] > 0 or stats["down"] else logger.debug
+            log("Webhook {}: {} payloads sent, {} failed, {} dropped, {} queued, latency {:.0f}ms{}", webhook.url,
+                stats["sent"], stats["failed"], stats["dropped"], stats["backlog"], stats["latency"] * 1000,
+                " (down)" if stats["down"] else "")
 
     def __prepare_quest_data(self, quest_data):
         ret = []
-        for stopid in quest_data:
-            stop = quest_data[str(stopid)]
-
-            if self.__is_in_excluded_area([stop["latitude"], stop["longitude"]]):
-                continue
-
+        for stop in self.__drop_excluded(list(quest_data.values())):
             try:
-                quest = generate_quest(quest_data[str(stopid)])
+                quest = generate_quest(stop)
                 quest_payload = self.__construct_quest_payload(quest)
 
                 entire_payload = {"type": "quest", "message": quest_payload}
@@ -339,6 +362,10 @@ class WebhookWorker:
             else:
                 weather_payload["coords"] = weather["coords"]
 
+            if self.__change_cache.is_unchanged("weather", weather["s2_cell_id"], weather_payload,
+                                                ignored_fields=("time_changed", "coords")):
+                continue
+
             entire_payload = {"type": "weather", "message": weather_payload}
             ret.append(entire_payload)
 
@@ -347,10 +374,7 @@ class WebhookWorker:
     def __prepare_raid_data(self, raid_data):
         ret = []
 
-        for raid in raid_data:
-            if self.__is_in_excluded_area([raid["latitude"], raid["longitude"]]):
-                continue
-
+        for raid in self.__drop_excluded(raid_data):
             # skip ex raid mon if disabled
             is_exclusive = raid["is_exclusive"] is not None and raid["is_exclusive"] != 0
             if not self.__args.webhook_submit_exraids and is_exclusive:
@@ -413,10 +437,7 @@ class WebhookWorker:
     def __prepare_mon_data(self, mon_data):
         ret = []
 
-        for mon in mon_data:
-            if self.__is_in_excluded_area([mon["latitude"], mon["longitude"]]):
-                continue
-
+        for mon in self.__drop_excluded(mon_data):
             mon_payload = {
                 "encounter_id": str(mon["encounter_id"]),
                 "pokemon_id": mon["pokemon_id"],
@@ -508,10 +529,7 @@ class WebhookWorker:
     def __prepare_gyms_data(self, gym_data):
         ret = []
 
-        for gym in gym_data:
-            if self.__is_in_excluded_area([gym["latitude"], gym["longitude"]]):
-                continue
-
+        for gym in self.__drop_excluded(gym_data):
             gym_payload = {
                 "gym_id": gym["gym_id"],
                 "latitude": gym["latitude"],
@@ -531,6 +549,9 @@ class WebhookWorker:
             if gym["is_ex_raid_eligible"] is not None:
                 gym_payload["is_ex_raid_eligible"] = gym["is_ex_raid_eligible"]
 
+            if self.__change_cache.is_unchanged("gym", gym["gym_id"], gym_payload):
+                continue
+
             entire_payload = {"type": "gym", "message": gym_payload}
             ret.append(entire_payload)
 
@@ -539,10 +560,7 @@ class WebhookWorker:
     def __prepare_stops_data(self, pokestop_data):
         ret = []
 
-        for pokestop in pokestop_data:
-            if self.__is_in_excluded_area([pokestop["latitude"], pokestop["longitude"]]):
-                continue
-
+        for pokestop in self.__drop_excluded(pokestop_data):
             pokestop_payload = {
                 "name": pokestop["name"],
                 "pokestop_id": pokestop["pokestop_id"],
@@ -568,6 +586,10 @@ class WebhookWorker:
             if pokestop["incident_grunt_type"]:
                 pokestop_payload["incident_grunt_type"] = pokestop["incident_grunt_type"]
 
+            if self.__change_cache.is_unchanged("pokestop", pokestop["pokestop_id"], pokestop_payload,
+                                                ignored_fields=("updated",)):
+                continue
+
             entire_payload = {"type": "pokestop", "message": pokestop_payload}
             ret.append(entire_payload)
 
@@ -602,13 +624,12 @@ class WebhookWorker:
                 self.__pokemon_types = set(self.__valid_mon_types)
                 sub_types = self.__valid_mon_types + self.__valid_types
 
-            self.__webhook_receivers.append({
-                "url": url.replace(" ", ""),
-                "types": sub_types
-            })
+            self.__webhook_receivers.append(WebhookReceiver(url.replace(" ", ""), sub_types,
+                                                            connections=self.__args.webhook_connections,
+                                                            max_backlog=self.__args.webhook_max_backlog))
 
     def __build_excluded_areas(self, mapping_manager: MappingManager):
-        self.__excluded_areas: List[GeofenceHelper] = []
+        excluded_areas: List[GeofenceHelper] = []
 
         if self.__args.webhook_excluded_areas == "":
             pass
@@ -624,33 +645,58 @@ class WebhookWorker:
             area_name = area_name.strip()
             for name, gf in tmp_excluded_areas.items():
                 if (area_name.endswith("*") and name.startswith(area_name[:-1])) or area_name == name:
-                    self.__excluded_areas.append(gf)
+                    excluded_areas.append(gf)
 
         tmp_excluded_areas = None
 
+        # compiled into a single index to check the coordinates of a payload against all areas at once
+        self.__excluded_areas: GeofenceIndex = GeofenceIndex(excluded_areas)
         if len(self.__excluded_areas) > 0:
             logger.info("Excluding {} areas from webhooks", len(self.__excluded_areas))
 
-    def __create_payload(self):
+    def __was_streamed(self, webhook_type: str, key: Hashable, changed_at: float) -> bool:
+        streamed_at = self.__streamed[webhook_type].get(key, None)
+        return streamed_at is not None and changed_at <= streamed_at
+
+    def __forget_streamed(self, before: float):
+        # rows changed before are not checked for by the next catch up anymore
+        for streamed in self.__streamed.values():
+            for key in [key for key, streamed_at in streamed.items() if streamed_at < before]:
+                del streamed[key]
+
+    def __forget_lost_payloads(self):
+        # unchanged entities are sent again if any of the payloads sent may have not been received
+        lost_chunks = sum(stats["failed"] + stats["dropped"]
+                          for stats in (webhook.get_stats() for webhook in self.__webhook_receivers))
+        if lost_chunks > self.__lost_chunks and len(self.__change_cache) > 0:
+            logger.debug("{} webhook chunks have been lost, sending unchanged gyms, stops and weather again",
+                         lost_chunks - self.__lost_chunks)
+            self.__change_cache.clear()
+        self.__lost_chunks = lost_chunks
+
+    def __create_payload(self, catch_up: bool):
         logger.debug("Fetching data changed since {}", self.__last_check)
+        self.__forget_lost_payloads()
 
         # the payload that is about to be sent
         full_payload = []
+        # gyms and stops buffered by the MITM data workers are written up to the write-behind window later than
+        # scanned, look back for them. Those re-read are dropped by the change cache as they have been sent already
+        written_behind_since = self.__last_check - int(math.ceil(self.__args.mitm_write_behind_window))
 
         try:
             # raids
-            if 'raid' in self.__webhook_types:
-                raids = self.__prepare_raid_data(
-                    self._db_reader.get_raids_changed_since(self.__last_check)
-                )
-                full_payload += raids
+            if 'raid' in self.__webhook_types and catch_up:
+                raids = [raid for raid in self._db_reader.get_raids_changed_since(self.__last_catchup)
+                         if not self.__was_streamed("raid", raid["gym_id"], raid["last_scanned"])]
+                full_payload += self.__prepare_raid_data(raids)
 
             # quests
-            if 'quest' in self.__webhook_types:
-                quest = self.__prepare_quest_data(
-                    self._db_reader.get_quests_changed_since(self.__last_check)
-                )
-                full_payload += quest
+            if 'quest' in self.__webhook_types and catch_up:
+                quests = {stop_id: quest
+                          for stop_id, quest in self._db_reader.get_quests_changed_since(self.__last_catchup).items()
+                          if not self.__was_streamed("quest", stop_id, quest["quest_timestamp"])}
+                full_payload += self.__prepare_quest_data(quests)
 
             # weather
             if 'weather' in self.__webhook_types:
@@ -662,25 +708,24 @@ class WebhookWorker:
             # gyms
             if 'gym' in self.__webhook_types:
                 gyms = self.__prepare_gyms_data(
-                    self._db_reader.get_gyms_changed_since(self.__last_check)
+                    self._db_reader.get_gyms_changed_since(written_behind_since)
                 )
                 full_payload += gyms
 
             # stops
             if 'pokestop' in self.__webhook_types:
                 pokestops = self.__prepare_stops_data(
-                    self._db_reader.get_stops_changed_since(self.__last_check)
+                    self._db_reader.get_stops_changed_since(written_behind_since)
                 )
                 full_payload += pokestops
 
             # mon
-            if len(self.__pokemon_types) > 0:
-                mon = self.__prepare_mon_data(
-                    self._db_reader.get_mon_changed_since(
-                        self.__last_check, self.__pokemon_types
-                    )
-                )
-                full_payload += mon
+            if len(self.__pokemon_types) > 0 and catch_up:
+                mons = [mon for mon in self._db_reader.get_mon_changed_since(self.__last_catchup,
+                                                                             self.__pokemon_types)
+                        if not self.__was_streamed("pokemon", mon["encounter_id"],
+                                                   mon["last_modified"].replace(tzinfo=timezone.utc).timestamp())]
+                full_payload += self.__prepare_mon_data(mons)
         except Exception:
             logger.exception("Error while creating webhook payload")
 
@@ -688,19 +733,76 @@ class WebhookWorker:
 
         return full_payload
 
+    def __create_streamed_payload(self, changes: Dict[str, Set[Hashable]]):
+        logger.debug2("Fetching {} streamed changes", sum(len(keys) for keys in changes.values()))
+        full_payload = []
+        read_at = time.time()
+        # only keys of rows read are skipped by the catch up, e.g. quests of stops not written yet are not
+        read_keys: Dict[str, List[Hashable]] = {"pokemon": [], "raid": [], "quest": []}
+        try:
+            gym_ids = list(changes.get("raid", []))
+            if 'raid' in self.__webhook_types:
+                for chunk in self.__payload_chunk(gym_ids, MAX_KEYS_PER_QUERY):
+                    raids = self._db_reader.get_raids_of_gyms(chunk)
+                    read_keys["raid"] += [raid["gym_id"] for raid in raids]
+                    full_payload += self.__prepare_raid_data(raids)
+
+            stop_ids = list(changes.get("quest", []))
+            if 'quest' in self.__webhook_types:
+                for chunk in self.__payload_chunk(stop_ids, MAX_KEYS_PER_QUERY):
+                    quests = self._db_reader.get_quests_of_stops(chunk)
+                    read_keys["quest"] += list(quests.keys())
+                    full_payload += self.__prepare_quest_data(quests)
+
+            encounter_ids = list(changes.get("pokemon", []))
+            if len(self.__pokemon_types) > 0:
+                for chunk in self.__payload_chunk(encounter_ids, MAX_KEYS_PER_QUERY):
+                    mons = self._db_reader.get_mons_of_encounters(chunk, self.__pokemon_types)
+                    read_keys["pokemon"] += [mon["encounter_id"] for mon in mons]
+                    full_payload += self.__prepare_mon_data(mons)
+        except Exception:
+            logger.exception("Error while creating webhook payload of streamed changes")
+            return full_payload
+
+        for webhook_type, keys in read_keys.items():
+            self.__streamed[webhook_type].update(dict.fromkeys(keys, read_at))
+        return full_payload
+
+    def __wait_for_next_check(self):
+        if self.__webhook_stream is None:
+            time.sleep(self.__worker_interval_sec)
+            return
+        # changes streamed meanwhile are sent right away
+        next_check = time.time() + self.__worker_interval_sec
+        while not terminate_mad.is_set():
+            remaining = next_check - time.time()
+            if remaining <= 0:
+                break
+            changes = self.__webhook_stream.collect(remaining)
+            if changes:
+                self.__send_webhook(self.__create_streamed_payload(changes))
+
     def run_worker(self):
         logger.info("Starting webhook worker thread")
 
         while not terminate_mad.is_set():
             preparing_timestamp = int(time.time())
+            catch_up = self.__webhook_stream is None or preparing_timestamp >= self.__next_catchup
 
             # fetch data and create payload
-            full_payload = self.__create_payload()
+            full_payload = self.__create_payload(catch_up)
 
             # send our payload
             self.__send_webhook(full_payload)
 
             self.__last_check = preparing_timestamp
-            time.sleep(self.__worker_interval_sec)
+            if catch_up:
+                self.__last_catchup = self.__last_check
+                self.__next_catchup = preparing_timestamp + self.__catchup_interval_sec
+                self.__forget_streamed(self.__last_catchup)
+            self.__log_stats()
+            self.__wait_for_next_check()
 
         logger.info("Stopping webhook worker thread")
+        for webhook in self.__webhook_receivers:
+            webhook.stop()
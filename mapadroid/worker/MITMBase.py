@@ -4,7 +4,7 @@ import time
 from abc import abstractmethod
 from datetime import datetime
 from enum import Enum
-from typing import Optional, Tuple, Union
+from typing import List, Optional, Tuple, Union
 
 from mapadroid.mitm_receiver.MitmMapper import MitmMapper
 from mapadroid.ocr.pogoWindows import PogoWindows
@@ -20,7 +20,8 @@ from mapadroid.worker.WorkerBase import FortSearchResultTypes, WorkerBase
 WALK_AFTER_TELEPORT_SPEED = 11
 FALLBACK_MITM_WAIT_TIMEOUT = 45
 TIMESTAMP_NEVER = 0
-WAIT_FOR_DATA_NEXT_ROUND_SLEEP = 0.5
+# Upper bound of a single wait for new data, the worker checks whether it is to be stopped in between
+WAIT_FOR_DATA_MAX_BLOCK = 2
 # Distance in meters that are to be allowed to consider a GMO as within a valid range
 # Some modes calculate with extremely strict distances (0.0001m for example), thus not allowing
 # direct use of routemanager radius as a distance (which would allow long distances for raid scans as well)
@@ -117,7 +118,8 @@ class MITMBase(WorkerBase):
                                                                              self._origin)
         type_of_data_returned = LatestReceivedType.UNDEFINED
         data = None
-        latest = self._mitm_mapper.request_latest(self._origin)
+        protos_to_wait_for = self._get_protos_to_wait_for(proto_to_wait_for)
+        latest = self._mitm_mapper.wait_for_data(self._origin, protos_to_wait_for)
 
         # Any data after timestamp + timeout should be valid!
         last_time_received = TIMESTAMP_NEVER
@@ -133,19 +135,24 @@ class MITMBase(WorkerBase):
                           "Last received timestamp of that type was: {}",
                           proto_to_wait_for, datetime.fromtimestamp(timestamp), timeout,
                           datetime.fromtimestamp(timestamp) if last_time_received != TIMESTAMP_NEVER else "never")
+        # The data present is checked right away, afterwards we only wake up once the MitmMapper received newer data
+        # of the protos waited for (or to check whether the worker is to be stopped)
+        newer_than: Optional[float] = None
         while type_of_data_returned == LatestReceivedType.UNDEFINED and \
                 (int(timestamp + timeout) >= int(time.time()) or last_time_received >= timestamp) \
                 and not self._stop_worker_event.is_set():
-            latest = self._mitm_mapper.request_latest(self._origin)
+            block_for = min(WAIT_FOR_DATA_MAX_BLOCK, max(0.0, timestamp + timeout - time.time()))
+            latest = self._mitm_mapper.wait_for_data(self._origin, protos_to_wait_for, newer_than, block_for)
+            newer_than = self._latest_timestamp_of_protos(latest, protos_to_wait_for)
 
             if latest is None:
                 self.logger.info("Nothing received from worker since MAD started")
-                time.sleep(WAIT_FOR_DATA_NEXT_ROUND_SLEEP)
+                self.raise_stop_worker_if_applicable()
                 continue
             latest_proto_entry = latest.get(proto_to_wait_for.value, None)
             if not latest_proto_entry:
                 self.logger.info("No data linked to the requested proto since MAD started.")
-                time.sleep(WAIT_FOR_DATA_NEXT_ROUND_SLEEP)
+                self.raise_stop_worker_if_applicable()
                 continue
             # Not checking the timestamp against the proto awaited in here since custom handling may be adequate.
             # E.g. Questscan may yield errors like clicking mons instead of stops - which we need to detect as well
@@ -166,9 +173,6 @@ class MITMBase(WorkerBase):
                     latest, proto_to_wait_for, timestamp)
 
             self.raise_stop_worker_if_applicable()
-            if type_of_data_returned == LatestReceivedType.UNDEFINED:
-                # We don't want to sleep if we have received something that may be useful to us...
-                time.sleep(WAIT_FOR_DATA_NEXT_ROUND_SLEEP)
             # In case last_time_received was set, we reset it after the first
             # iteration to not run into trouble (endless loop)
             last_time_received = TIMESTAMP_NEVER
@@ -181,6 +185,23 @@ class MITMBase(WorkerBase):
         self.worker_stats()
         return type_of_data_returned, data
 
+    def _get_protos_to_wait_for(self, proto_to_wait_for: ProtoIdentifier) -> List[int]:
+        """
+        The protos to be passed to _check_for_data_content when waiting for proto_to_wait_for
+        """
+        return [proto_to_wait_for.value]
+
+    @staticmethod
+    def _latest_timestamp_of_protos(latest: Optional[dict], protos: List[int]) -> float:
+        latest_timestamp = TIMESTAMP_NEVER
+        if latest is None:
+            return latest_timestamp
+        for proto in protos:
+            entry = latest.get(proto, None)
+            if entry is not None:
+                latest_timestamp = max(latest_timestamp, entry.get("timestamp", TIMESTAMP_NEVER))
+        return latest_timestamp
+
     def _handle_proto_timeout(self, position_type, proto_to_wait_for: ProtoIdentifier, type_of_data_returned):
         self.logger.info("Timeout waiting for useful data. Type requested was {}, received {}",
                          proto_to_wait_for, type_of_data_returned)
@@ -20,6 +20,7 @@ from mapadroid.utils.madGlobals import (
     InternalStopWorkerException, ScreenshotType,
     WebsocketWorkerConnectionClosedException, WebsocketWorkerRemovedException,
     WebsocketWorkerTimeoutException)
+from mapadroid.utils.ProtoIdentifier import ProtoIdentifier
 from mapadroid.utils.resolution import Resocalculator
 from mapadroid.utils.routeutil import check_walker_value_type
 from mapadroid.websocket.AbstractCommunicator import AbstractCommunicator
@@ -451,7 +452,9 @@ class WorkerBase(AbstractWorker):
                         if calculate_waits:
                             try:
                                 not_encountered: List[int] = []
-                                latest = self._mitm_mapper.request_latest(self._origin)
+                                latest = self._mitm_mapper.wait_for_data(self._origin,
+                                                                         [ProtoIdentifier.GMO.value,
+                                                                          "ids_encountered"])
                                 encountered = latest.get("ids_encountered", {}).get("values", {})
                                 for cell in latest[106]["values"]["payload"]["cells"]:
                                     for pokemon in cell["wild_pokemon"]:
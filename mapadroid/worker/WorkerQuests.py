@@ -747,6 +747,10 @@ class WorkerQuests(MITMBase):
 
         self.set_devicesettings_value('last_action_time', time.time())
 
+    def _get_protos_to_wait_for(self, proto_to_wait_for: ProtoIdentifier) -> List[int]:
+        # clicking a gym or a mon instead of the stop has to be detected as well
+        return [proto_to_wait_for.value, ProtoIdentifier.GYM_INFO.value, ProtoIdentifier.ENCOUNTER.value]
+
     def _check_for_data_content(self, latest, proto_to_wait_for: ProtoIdentifier, timestamp: float) \
             -> Tuple[LatestReceivedType, Optional[Union[dict, FortSearchResultTypes]]]:
         type_of_data_found: LatestReceivedType = LatestReceivedType.UNDEFINED
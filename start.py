@@ -20,7 +20,7 @@ import time
 import unittest
 from multiprocessing import Process
 from threading import Thread, active_count
-from typing import Optional
+from typing import List, Optional
 
 import pkg_resources
 import psutil
@@ -33,9 +33,10 @@ from mapadroid.madmin.madmin import MADmin
 from mapadroid.mitm_receiver.MitmDataProcessorManager import \
     MitmDataProcessorManager
 from mapadroid.mitm_receiver.MitmMapper import MitmMapper, MitmMapperManager
-from mapadroid.mitm_receiver.MITMReceiver import MITMReceiver
+from mapadroid.mitm_receiver.MITMReceiver import MITMReceiver, create_listener
 from mapadroid.ocr.pogoWindows import PogoWindows
 from mapadroid.patcher import MADPatcher
+from mapadroid.route.routecalc import calculate_route_pool
 from mapadroid.utils.event import Event
 from mapadroid.utils.logging import LoggerEnums, get_logger, init_logging
 from mapadroid.utils.madGlobals import terminate_mad
@@ -44,6 +45,7 @@ from mapadroid.utils.MappingManager import (MappingManager,
 from mapadroid.utils.pluginBase import PluginCollection
 from mapadroid.utils.rarity import Rarity
 from mapadroid.utils.updater import DeviceUpdater
+from mapadroid.webhook.WebhookStream import WebhookStream
 from mapadroid.webhook.webhookworker import WebhookWorker
 from mapadroid.websocket.WebsocketServer import WebsocketServer
 
@@ -126,6 +128,10 @@ def get_system_infos(db_wrapper):
         cpu_usage = py.cpu_percent()
         logger.info('Instance name: "{}" - Memory usage: {:.3f} GB - CPU usage: {}',
                     str(args.status_name), mem_usage, str(cpu_usage))
+        pool_stats = db_wrapper.get_pool_stats()
+        logger.info('DB pool ({}): {} queries - avg query time: {:.4f}s - avg wait for connection: {:.4f}s - max wait: '
+                    '{:.4f}s', pool_stats["executor"], pool_stats["queries"], pool_stats["avg_query_time"],
+                    pool_stats["avg_wait_time"], pool_stats["max_wait_time"])
         collected = None
         if args.stat_gc:
             collected = gc.collect()
@@ -166,6 +172,7 @@ if __name__ == "__main__":
     mapping_manager_manager: MappingManagerManager = None
     mapping_manager: Optional[MappingManager] = None
     mitm_receiver_process: MITMReceiver = None
+    mitm_receiver_processes: List[MITMReceiver] = []
     mitm_mapper_manager: Optional[MitmMapperManager] = None
     mitm_mapper: Optional[MitmMapper] = None
     pogo_win_manager: Optional[PogoWindows] = None
@@ -173,6 +180,7 @@ if __name__ == "__main__":
     storage_manager: Optional[StorageSyncManager] = None
     t_whw: Thread = None  # Thread for WebHooks
     t_ws: Thread = None  # Thread - WebSocket Server
+    webhook_stream: Optional[WebhookStream] = None
     webhook_worker: Optional[WebhookWorker] = None
     ws_server: WebsocketServer = None
     if args.config_mode:
@@ -209,7 +217,13 @@ if __name__ == "__main__":
     time.sleep(.1)
     MappingManagerManager.register('MappingManager', MappingManager)
     mapping_manager_manager = MappingManagerManager()
-    mapping_manager_manager.start()
+    if args.config_mode:
+        mapping_manager_manager.start()
+    else:
+        # the route calculation processes are forked by the process of the manager before it starts serving, i.e.
+        # before it has started any thread
+        mapping_manager_manager.start(calculate_route_pool.start_pool,
+                                      (args.route_calc_processes, args.route_calc_timeout))
     mapping_manager: MappingManager = mapping_manager_manager.MappingManager(db_wrapper,
                                                                              args,
                                                                              data_manager,
@@ -234,15 +248,27 @@ if __name__ == "__main__":
 
     logger.info('Starting PogoDroid Receiver server on port {}'.format(str(args.mitmreceiver_port)))
 
-    mitm_data_processor_manager = MitmDataProcessorManager(args, mitm_mapper, db_wrapper)
+    if args.webhook and args.webhook_catchup_interval > 0 and not args.config_mode:
+        # created before forking the data processors to have them send mons, raids and quests right after writing them
+        webhook_stream = WebhookStream()
+    mitm_data_processor_manager = MitmDataProcessorManager(args, mitm_mapper, db_wrapper, webhook_stream)
     mitm_data_processor_manager.launch_processors()
 
-    mitm_receiver_process = MITMReceiver(args.mitmreceiver_ip, int(args.mitmreceiver_port),
-                                         mitm_mapper, args, mapping_manager, db_wrapper,
-                                         data_manager, storage_elem,
-                                         mitm_data_processor_manager.get_queue(),
-                                         enable_configmode=args.config_mode)
-    mitm_receiver_process.start()
+    mitm_receiver_listener = None
+    if args.mitmreceiver_processes > 1:
+        # the receivers are forked sharing a single socket to have them accept connections concurrently
+        mitm_receiver_listener = create_listener(args.mitmreceiver_ip, int(args.mitmreceiver_port))
+    for receiver_id in range(max(1, args.mitmreceiver_processes)):
+        receiver_process = MITMReceiver(args.mitmreceiver_ip, int(args.mitmreceiver_port),
+                                        mitm_mapper, args, mapping_manager, db_wrapper,
+                                        data_manager, storage_elem,
+                                        mitm_data_processor_manager.get_queue(),
+                                        name="MITMReceiver-{}".format(receiver_id),
+                                        enable_configmode=args.config_mode,
+                                        listener=mitm_receiver_listener)
+        receiver_process.start()
+        mitm_receiver_processes.append(receiver_process)
+    mitm_receiver_process = mitm_receiver_processes[0]
 
     logger.info('Starting websocket server on port {}'.format(str(args.ws_port)))
     ws_server = WebsocketServer(args=args,
@@ -261,7 +287,8 @@ if __name__ == "__main__":
         if args.webhook:
             rarity = Rarity(args, db_wrapper)
             rarity.start_dynamic_rarity()
-            webhook_worker = WebhookWorker(args, data_manager, mapping_manager, rarity, db_wrapper.webhook_reader)
+            webhook_worker = WebhookWorker(args, data_manager, mapping_manager, rarity, db_wrapper.webhook_reader,
+                                           webhook_stream)
             t_whw = Thread(name="system",
                            target=webhook_worker.run_worker)
             t_whw.daemon = True
@@ -351,13 +378,13 @@ if __name__ == "__main__":
             terminate_mad.set()
             # now cleanup all threads...
             # TODO: check against args or init variables to None...
-            if mitm_receiver_process is not None:
-                logger.info("Trying to stop receiver")
-                mitm_receiver_process.shutdown()
+            for receiver_process in mitm_receiver_processes:
+                logger.info("Trying to stop receiver {}", receiver_process.name)
+                receiver_process.shutdown()
                 logger.debug("MITM child threads successfully shutdown. Terminating parent thread")
-                mitm_receiver_process.terminate()
+                receiver_process.terminate()
                 logger.debug("Trying to join MITMReceiver")
-                mitm_receiver_process.join()
+                receiver_process.join()
                 logger.debug("MITMReceiver joined")
             if mitm_data_processor_manager is not None:
                 mitm_data_processor_manager.shutdown()
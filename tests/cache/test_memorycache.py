@@ -0,0 +1,34 @@
+import time
+from datetime import timedelta
+
+from mapadroid.cache import MemoryCache
+
+
+def test_set_exists_get():
+    cache = MemoryCache()
+    assert not cache.exists("key")
+    cache.set("key", 1)
+    assert cache.exists("key")
+    assert cache.get("key") == 1
+    assert cache.exists("key", "other") == 1
+
+
+def test_expiry():
+    cache = MemoryCache()
+    cache.set("short", 1, ex=0.05)
+    cache.set("long", 1, ex=timedelta(minutes=1))
+    time.sleep(0.1)
+    assert not cache.exists("short")
+    assert cache.get("short") is None
+    assert cache.exists("long")
+
+
+def test_least_recently_used_dropped():
+    cache = MemoryCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 1)
+    assert cache.exists("a")
+    cache.set("c", 1)
+    assert len(cache) == 2
+    assert cache.exists("a")
+    assert not cache.exists("b")
@@ -0,0 +1,130 @@
+import time
+from unittest.mock import MagicMock, patch
+
+from mapadroid.cache import MemoryCache
+from mapadroid.db.DbPogoProtoSubmit import DbPogoProtoSubmit
+
+
+def test_detected_endtimes_single_query_and_cached():
+    db_exec = MagicMock()
+    db_exec.execute.return_value = [(1, "12:34"), (2, None)]
+    proto_submit = DbPogoProtoSubmit(db_exec, MagicMock())
+    assert proto_submit._get_detected_endtimes([1, 2, 3]) == {1: "12:34"}
+    assert db_exec.execute.call_count == 1
+    query, args = db_exec.execute.call_args[0]
+    assert query.count("%s") == 3
+    assert sorted(args) == [1, 2, 3]
+    # only the spawnpoints without a known endtime are queried again
+    db_exec.execute.return_value = []
+    assert proto_submit._get_detected_endtimes([1, 2]) == {1: "12:34"}
+    assert db_exec.execute.call_args[0][1] == (2,)
+
+
+def test_detected_endtimes_from_spawnpoints():
+    db_exec = MagicMock()
+    proto_submit = DbPogoProtoSubmit(db_exec, MagicMock())
+    proto_submit._cache_detected_endtimes({5: "01:02"})
+    assert proto_submit._get_detected_endtimes([5]) == {5: "01:02"}
+    db_exec.execute.assert_not_called()
+
+
+def get_gmo(encounter_ids):
+    wild_mons = [{"spawnpoint_id": "8d1b4c2b0f1", "latitude": 1.0, "longitude": 2.0, "encounter_id": encounter_id,
+                  "pokemon_data": {"id": 1, "display": {}}} for encounter_id in encounter_ids]
+    return {"cells": [{"id": 1, "wild_pokemon": wild_mons}]}
+
+
+def test_mons_deduplicated_by_cache():
+    db_exec = MagicMock()
+    db_exec.execute.return_value = []
+    args = MagicMock()
+    args.default_unknown_timeleft = 3
+    cache = MemoryCache()
+    proto_submit = DbPogoProtoSubmit(db_exec, args)
+    with patch("mapadroid.db.DbPogoProtoSubmit.get_cache", return_value=cache):
+        encounters = proto_submit.mons("origin", time.time(), get_gmo([1, -1, 1]), MagicMock())
+        assert [encounter[0] for encounter in encounters] == [1, 2 ** 64 - 1]
+        assert cache.exists("mon1-1")
+        encounters = proto_submit.mons("origin", time.time(), get_gmo([1, 2]), MagicMock())
+        assert [encounter[0] for encounter in encounters] == [2]
+
+
+def test_unit_of_work_writes_single_transaction():
+    db_exec = MagicMock()
+    proto_submit = DbPogoProtoSubmit(db_exec, MagicMock())
+    gmo = {"cells": [{"id": 1, "current_timestamp": 1000}, {"id": -1, "current_timestamp": 1000}]}
+    with proto_submit.unit_of_work():
+        proto_submit.cells("origin", gmo)
+        proto_submit.cells("origin", gmo)
+        db_exec.executemany.assert_not_called()
+    db_exec.execute_transaction.assert_called_once()
+    statements = db_exec.execute_transaction.call_args[0][0]
+    assert len(statements) == 2
+    assert [cell[0] for cell in statements[0][1]] == [1, 2 ** 64 - 1]
+    # outside of a unit of work every submission is committed right away
+    proto_submit.cells("origin", gmo)
+    db_exec.executemany.assert_called_once()
+
+
+def test_mons_published_once_committed():
+    db_exec = MagicMock()
+    db_exec.execute.return_value = []
+    args = MagicMock()
+    args.default_unknown_timeleft = 3
+    webhook_stream = MagicMock()
+    proto_submit = DbPogoProtoSubmit(db_exec, args)
+    proto_submit.set_webhook_stream(webhook_stream)
+    with patch("mapadroid.db.DbPogoProtoSubmit.get_cache", return_value=MemoryCache()):
+        with proto_submit.unit_of_work():
+            proto_submit.mons("origin", time.time(), get_gmo([1, 2]), MagicMock())
+            webhook_stream.publish.assert_not_called()
+        webhook_stream.publish.assert_called_once_with("pokemon", [1, 2])
+
+        # nothing is published if the transaction failed
+        db_exec.execute_transaction.return_value = False
+        with proto_submit.unit_of_work():
+            proto_submit.mons("origin", time.time(), get_gmo([3]), MagicMock())
+        assert webhook_stream.publish.call_count == 1
+
+
+def test_mons_written_through_with_write_behind():
+    db_exec = MagicMock()
+    db_exec.execute.return_value = []
+    args = MagicMock()
+    args.default_unknown_timeleft = 3
+    proto_submit = DbPogoProtoSubmit(db_exec, args)
+    proto_submit.start_write_behind(60)
+    try:
+        with patch("mapadroid.db.DbPogoProtoSubmit.get_cache", return_value=MemoryCache()):
+            with proto_submit.unit_of_work():
+                proto_submit.mons("origin", time.time(), get_gmo([1, 2]), MagicMock())
+                proto_submit.cells("origin", {"cells": [{"id": 1, "current_timestamp": 1000}]})
+        # an encounter written afterwards must not be overwritten by the wild mons flushed later on
+        db_exec.execute_transaction.assert_called_once()
+        statements = db_exec.execute_transaction.call_args[0][0]
+        assert [[row[0] for row in rows] for _, rows in statements] == [[1, 2]]
+    finally:
+        proto_submit.stop_write_behind()
+    assert db_exec.execute_transaction.call_count == 2
+    assert [cell[0] for cell in db_exec.execute_transaction.call_args[0][0][0][1]] == [1]
+
+
+def test_changes_published_once_buffered_rows_written():
+    db_exec = MagicMock()
+    db_exec.execute.return_value = []
+    args = MagicMock()
+    args.default_unknown_timeleft = 3
+    webhook_stream = MagicMock()
+    proto_submit = DbPogoProtoSubmit(db_exec, args)
+    proto_submit.set_webhook_stream(webhook_stream)
+    proto_submit.start_write_behind(60)
+    try:
+        with patch("mapadroid.db.DbPogoProtoSubmit.get_cache", return_value=MemoryCache()):
+            with proto_submit.unit_of_work():
+                proto_submit.cells("origin", {"cells": [{"id": 1, "current_timestamp": 1000}]})
+                proto_submit.mons("origin", time.time(), get_gmo([1, 2]), MagicMock())
+        # the mons may be read along with stops still buffered
+        webhook_stream.publish.assert_not_called()
+    finally:
+        proto_submit.stop_write_behind()
+    webhook_stream.publish.assert_called_once_with("pokemon", [1, 2])
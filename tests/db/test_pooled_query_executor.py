@@ -0,0 +1,49 @@
+import os
+import pickle
+
+import mock
+
+from mapadroid.db.PooledQueryExecutor import ProcessLocalQueryExecutor
+
+
+def get_executor(pool_mock) -> ProcessLocalQueryExecutor:
+    with mock.patch("mapadroid.db.PooledQueryExecutor.MySQLConnectionPool", pool_mock):
+        return ProcessLocalQueryExecutor("localhost", 3306, "user", "pass", "db", poolsize=2)
+
+
+def test_execute_uses_local_pool():
+    pool_mock = mock.MagicMock()
+    cursor = pool_mock.return_value.get_connection.return_value.cursor.return_value
+    cursor.fetchall.return_value = [(1,)]
+    executor = get_executor(pool_mock)
+    assert executor.execute("SELECT 1") == [(1,)]
+    stats = executor.get_pool_stats()
+    assert stats["queries"] == 1
+    assert stats["in_use"] == 0
+    assert stats["pid"] == os.getpid()
+
+
+def test_pool_recreated_in_new_process():
+    pool_mock = mock.MagicMock()
+    executor = get_executor(pool_mock)
+    assert pool_mock.call_count == 1
+    copied = pickle.loads(pickle.dumps(executor))
+    assert copied._pool is None
+    with mock.patch("mapadroid.db.PooledQueryExecutor.MySQLConnectionPool", pool_mock):
+        copied.execute("SELECT 1")
+        copied.execute("SELECT 1")
+    assert pool_mock.call_count == 2
+    assert copied.get_pool_stats()["queries"] == 2
+
+
+def test_transaction_retried_separately_on_failure():
+    pool_mock = mock.MagicMock()
+    connection = pool_mock.return_value.get_connection.return_value
+    executor = get_executor(pool_mock)
+    assert executor.execute_transaction([("INSERT 1", [(1,)]), ("INSERT 2", [(2,)]), ("INSERT 3", [])])
+    assert connection.commit.call_count == 1
+
+    connection.cursor.return_value.executemany.side_effect = [None, Exception("deadlock"), None, None]
+    assert not executor.execute_transaction([("INSERT 1", [(1,)]), ("INSERT 2", [(2,)])])
+    connection.rollback.assert_called_once()
+    assert connection.commit.call_count == 3
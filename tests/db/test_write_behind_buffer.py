@@ -0,0 +1,81 @@
+import time
+
+import mock
+
+from mapadroid.db.WriteBehindBuffer import WriteBehindBuffer
+
+
+def test_rows_coalesced_by_key():
+    db_exec = mock.MagicMock()
+    buffer = WriteBehindBuffer(db_exec, max_delay=60)
+    buffer.add("INSERT gym", [(1, "a"), (2, "b")])
+    buffer.add("INSERT gymdetails", [(1, "x")])
+    buffer.add("INSERT gym", [(1, "c")])
+    assert buffer.flush()
+    db_exec.execute_transaction.assert_called_once_with([
+        ("INSERT gym", [(1, "c"), (2, "b")]),
+        ("INSERT gymdetails", [(1, "x")])
+    ])
+    db_exec.reset_mock()
+    assert buffer.flush()
+    db_exec.execute_transaction.assert_not_called()
+
+
+def test_flushed_when_full():
+    db_exec = mock.MagicMock()
+    buffer = WriteBehindBuffer(db_exec, max_delay=60, max_rows=3)
+    buffer.add("INSERT cells", [(1,), (2,), (1,)])
+    db_exec.execute_transaction.assert_not_called()
+    buffer.add("INSERT cells", [(3,)])
+    db_exec.execute_transaction.assert_called_once_with([("INSERT cells", [(1,), (2,), (3,)])])
+
+
+def test_flushed_within_delay_and_on_stop():
+    db_exec = mock.MagicMock()
+    buffer = WriteBehindBuffer(db_exec, max_delay=0.05)
+    buffer.start()
+    try:
+        buffer.add("INSERT cells", [(1,)])
+        deadline = time.time() + 2
+        while not db_exec.execute_transaction.called and time.time() < deadline:
+            time.sleep(0.01)
+        db_exec.execute_transaction.assert_called_once_with([("INSERT cells", [(1,)])])
+        buffer.add("INSERT cells", [(2,)])
+    finally:
+        buffer.stop()
+    db_exec.execute_transaction.assert_called_with([("INSERT cells", [(2,)])])
+
+
+def test_keys_of_webhook_rows_handed_over_once_written():
+    db_exec = mock.MagicMock()
+    on_written = mock.MagicMock()
+    buffer = WriteBehindBuffer(db_exec, max_delay=60, on_written=on_written)
+    buffer.add("INSERT pokemon", [(1, "a"), (2, "b"), (1, "c")], webhook_type="pokemon")
+    buffer.add("INSERT cells", [(1,)])
+    assert buffer.flush()
+    on_written.assert_called_once()
+    webhook_type, keys = on_written.call_args[0]
+    assert webhook_type == "pokemon" and list(keys) == [1, 2]
+
+    db_exec.execute_transaction.return_value = False
+    buffer.add("INSERT pokemon", [(3, "d")], webhook_type="pokemon")
+    assert not buffer.flush()
+    assert on_written.call_count == 1
+
+
+def test_deferred_changes_handed_over_once_pending_rows_written():
+    db_exec = mock.MagicMock()
+    on_written = mock.MagicMock()
+    buffer = WriteBehindBuffer(db_exec, max_delay=60, on_written=on_written)
+    assert not buffer.defer("raid", ["gym"])
+    buffer.add("INSERT gym", [("gym", "a")])
+    assert buffer.defer("raid", ["gym"])
+    on_written.assert_not_called()
+    assert buffer.flush()
+    on_written.assert_called_once_with("raid", ["gym"])
+
+    db_exec.execute_transaction.return_value = False
+    buffer.add("INSERT gym", [("gym", "b")])
+    assert buffer.defer("raid", ["gym"])
+    assert not buffer.flush()
+    assert on_written.call_count == 1
@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+from mapadroid.geofence.geofenceHelper import GeofenceHelper
+
+INCLUDE = {"fence_data": ["[square]", "0,0", "0,10", "10,10", "10,0",
+                          "[triangle]", "20,20", "20,30", "30,20"]}
+EXCLUDE = {"fence_data": ["[hole]", "4,4", "4,6", "6,6", "6,4"]}
+COORDINATES = [(1, 1), (5, 5), (9, 3), (11, 5), (21, 21), (29, 29), (-1, -1), (25, 24)]
+EXPECTED = [True, False, True, False, True, False, False, True]
+
+
+@pytest.fixture(params=[True, False], ids=["matplotlib", "numpy"])
+def geofence_helper(request):
+    helper = GeofenceHelper(INCLUDE, EXCLUDE)
+    if not request.param:
+        helper.use_matplotlib = False
+        helper._geofenced_polygons = helper._compile_polygons(helper.geofenced_areas)
+        helper._excluded_polygons = helper._compile_polygons(helper.excluded_areas)
+    return helper
+
+
+def test_contains_many(geofence_helper):
+    assert geofence_helper.contains_many(np.array(COORDINATES)).tolist() == EXPECTED
+
+
+def test_per_coordinate_wrappers(geofence_helper):
+    extended = [coord + ("payload",) for coord in COORDINATES]
+    assert geofence_helper.get_geofenced_coordinates(extended) == [
+        coord for coord, inside in zip(extended, EXPECTED) if inside]
+    assert [geofence_helper.is_coord_inside_include_geofence(coord) for coord in COORDINATES] == EXPECTED
+    assert geofence_helper.get_geofenced_coordinates([]) == []
+
+
+def test_without_include_areas():
+    helper = GeofenceHelper(None, EXCLUDE)
+    assert helper.contains_many(np.array([(5, 5), (50, 50)])).tolist() == [False, True]
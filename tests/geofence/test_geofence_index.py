@@ -0,0 +1,31 @@
+import numpy as np
+
+from mapadroid.geofence.geofenceHelper import GeofenceHelper
+from mapadroid.geofence.geofenceIndex import GeofenceIndex
+
+AREAS = [
+    GeofenceHelper({"fence_data": ["[square]", "0,0", "0,10", "10,10", "10,0"]},
+                   {"fence_data": ["[hole]", "4,4", "4,6", "6,6", "6,4"]}),
+    GeofenceHelper({"fence_data": ["[triangle]", "20,20", "20,30", "30,20"]}, None),
+    GeofenceHelper({"fence_data": ["[star]", "0,15", "3,16", "5,19", "4,16", "8,15", "4,14", "3,11", "3,14"]}, None),
+]
+
+
+def test_same_as_checking_every_area():
+    coordinates = np.random.default_rng(1).uniform(-5, 35, size=(20000, 2))
+    expected = np.zeros(len(coordinates), dtype=bool)
+    for helper in AREAS:
+        expected |= helper.contains_many(coordinates)
+    for resolution in (1, 7, 256):
+        index = GeofenceIndex(AREAS, resolution=resolution)
+        assert index.contains_many(coordinates).tolist() == expected.tolist()
+    assert GeofenceIndex(AREAS).contains_many(np.array([(1, 1), (5, 5), (21, 21), (40, 40)])).tolist() == [
+        True, False, True, False]
+
+
+def test_areas_without_geofenced_areas():
+    unbounded = GeofenceHelper(None, {"fence_data": ["[hole]", "4,4", "4,6", "6,6", "6,4"]})
+    index = GeofenceIndex([unbounded])
+    assert len(index) == 1
+    assert index.contains_many(np.array([(5, 5), (50, 50)])).tolist() == [False, True]
+    assert GeofenceIndex([]).contains_many(np.array([(5, 5)])).tolist() == [False]
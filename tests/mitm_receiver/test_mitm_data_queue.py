@@ -0,0 +1,90 @@
+import time
+
+from mapadroid.mitm_receiver.MitmDataQueue import MitmDataQueue
+
+
+def wait_for_size(queue: MitmDataQueue, lane: int, size: int):
+    # items are put into the pipe by a feeder thread
+    deadline = time.time() + 5
+    while queue.get_lane_size(lane) != size and time.time() < deadline:
+        time.sleep(0.01)
+
+
+def test_data_of_an_origin_stays_in_order_within_its_lane():
+    queue = MitmDataQueue(4)
+    origins = ["origin{}".format(index) for index in range(20)]
+    for timestamp in range(5):
+        for origin in origins:
+            queue.put((timestamp, {"type": 106}, origin))
+
+    for origin in origins:
+        assert queue.lane_of(origin) == queue.lane_of(origin)
+        assert 0 <= queue.lane_of(origin) < 4
+    received = {}
+    for lane in range(queue.get_lane_count()):
+        wait_for_size(queue, lane, 5 * sum(1 for origin in origins if queue.lane_of(origin) == lane))
+        while queue.get_lane_size(lane) > 0:
+            timestamp, _, origin = queue.get(lane)
+            assert queue.lane_of(origin) == lane
+            received.setdefault(origin, []).append(timestamp)
+            queue.task_done(lane)
+        assert queue.get_lane_latency(lane) >= 0
+    assert received == {origin: list(range(5)) for origin in origins}
+    queue.close()
+
+
+def test_none_stops_all_lanes():
+    queue = MitmDataQueue(3)
+    queue.put(None)
+    for lane in range(3):
+        assert queue.get(lane) is None
+    queue.close()
+
+
+def test_older_gmos_of_an_origin_are_shed_when_full_but_encounters_are_not():
+    queue = MitmDataQueue(1, max_size=5, shed_types=[106])
+    items = [(1, {"type": 106, "lat": 1, "lng": 1}, "origin"),
+             (2, {"type": 106, "lat": 1, "lng": 1}, "other"),
+             (3, {"type": 106, "lat": 2, "lng": 2}, "origin"),
+             (4, {"type": 102}, "origin"),
+             (5, {"type": 106, "lat": 3, "lng": 3}, "origin")]
+    for item in items:
+        queue.put(item)
+    wait_for_size(queue, 0, 5)
+    # the newest GMO of every origin is kept in place of the older ones
+    assert [item[0] for item in queue.get_batch(0)] == [2, 4, 5]
+    assert queue.get_lane_shed_counts(0) == (2, 0)
+    queue.close()
+
+
+def test_full_lane_refuses_gmos_but_not_encounters_while_nothing_is_processed():
+    queue = MitmDataQueue(1, max_size=3, shed_types=[106])
+    for timestamp in range(10):
+        assert queue.put((timestamp, {"type": 106, "lat": timestamp, "lng": 1}, "origin")) == (timestamp < 3)
+    assert queue.put((10, {"type": 102}, "origin"))
+    assert queue.put((11, {"type": 102}, "origin"))
+    assert not queue.put((12, {"type": 106, "lat": 12, "lng": 1}, "other"))
+    assert queue.get_lane_size(0) == 5
+    assert queue.get_lane_shed_counts(0) == (8, 0)
+    wait_for_size(queue, 0, 5)
+    assert [item[0] for item in queue.get_batch(0)] == [2, 10, 11]
+    queue.close()
+
+
+def test_batch_keeps_the_latest_gmo_of_a_location():
+    queue = MitmDataQueue(1, shed_types=[106])
+    items = [(1, {"type": 106, "lat": 1, "lng": 1}, "origin"),
+             (2, {"type": 102}, "origin"),
+             (3, {"type": 106, "lat": 1, "lng": 1}, "other"),
+             (4, {"type": 106, "lat": 2, "lng": 2}, "origin"),
+             (5, {"type": 102}, "origin"),
+             (6, {"type": 106, "lat": 1, "lng": 1}, "origin")]
+    for item in items:
+        queue.put(item)
+    queue.put(None)
+    wait_for_size(queue, 0, 7)
+    batch = queue.get_batch(0)
+    assert [item[0] for item in batch[:-1]] == [2, 3, 4, 5, 6]
+    assert batch[-1] is None
+    assert queue.get_lane_shed_counts(0) == (0, 1)
+    queue.close()
@@ -0,0 +1,51 @@
+import threading
+import time
+
+import mock
+import pytest
+
+from mapadroid.mitm_receiver.MitmMapper import MitmMapper
+from mapadroid.utils.collections import Location
+
+
+@pytest.fixture
+def mitm_mapper():
+    args = mock.MagicMock()
+    args.game_stats = False
+    mapping_manager = mock.MagicMock()
+    mapping_manager.get_all_devicemappings.return_value = {"origin": {}}
+    mapper = MitmMapper(args, mapping_manager, mock.MagicMock())
+    yield mapper
+    mapper.shutdown()
+
+
+def test_wait_for_data_returns_requested_entries_only(mitm_mapper):
+    assert mitm_mapper.wait_for_data("unknown", [106]) is None
+    mitm_mapper.update_latest("origin", 106, {"payload": {"cells": []}}, 100, 100, Location(1, 2))
+    mitm_mapper.update_latest("origin", 102, {"payload": {}}, 100, 100, Location(1, 2))
+    latest = mitm_mapper.wait_for_data("origin", [106])
+    assert latest[106]["timestamp"] == 100
+    assert 102 not in latest
+    assert latest["location"] == Location(1, 2)
+
+
+def test_wait_for_data_wakes_up_on_update(mitm_mapper):
+    mitm_mapper.update_latest("origin", 106, {}, 100, 100, Location(1, 2))
+    updater = threading.Timer(0.2, mitm_mapper.update_latest, args=("origin", 106, {}, 101, 101, Location(1, 2)))
+    started = time.time()
+    updater.start()
+    latest = mitm_mapper.wait_for_data("origin", [106], newer_than=100, timeout=5)
+    assert latest[106]["timestamp"] == 101
+    assert time.time() - started < 2
+    # other protos do not satisfy the wait
+    mitm_mapper.update_latest("origin", 102, {}, 102, 102, Location(1, 2))
+    latest = mitm_mapper.wait_for_data("origin", [106], newer_than=101, timeout=0.2)
+    assert latest[106]["timestamp"] == 101
+
+
+def test_older_data_does_not_replace_latest(mitm_mapper):
+    assert mitm_mapper.update_latest("origin", 106, {"payload": "new"}, 101, 101, Location(1, 2))
+    assert not mitm_mapper.update_latest("origin", 106, {"payload": "old"}, 100, 102, Location(1, 2))
+    latest = mitm_mapper.wait_for_data("origin", [106])
+    assert latest[106]["timestamp"] == 101
+    assert latest[106]["values"] == {"payload": "new"}
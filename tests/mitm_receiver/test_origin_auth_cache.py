@@ -0,0 +1,50 @@
+import base64
+
+import mock
+import pytest
+
+from mapadroid.mitm_receiver.OriginAuthCache import OriginAuthCache
+
+
+def basic_auth(username: str, password: str) -> str:
+    return "Basic " + base64.b64encode("{}:{}".format(username, password).encode()).decode()
+
+
+@pytest.fixture
+def mapping_manager():
+    mapping_manager = mock.MagicMock()
+    mapping_manager.get_mappings_version.return_value = 1
+    mapping_manager.get_auth_snapshot.return_value = (1, {"origin"}, {"user": "secret"})
+    return mapping_manager
+
+
+def test_snapshot_is_fetched_once_per_version(mapping_manager):
+    cache = OriginAuthCache(mapping_manager, version_check_interval=0)
+    for _ in range(10):
+        assert cache.is_origin_allowed("origin")
+        assert not cache.is_origin_allowed("unknown")
+        assert cache.check_auth(mock.MagicMock(), basic_auth("user", "secret"), None)
+    assert mapping_manager.get_auth_snapshot.call_count == 1
+
+    mapping_manager.get_mappings_version.return_value = 2
+    mapping_manager.get_auth_snapshot.return_value = (2, {"unknown"}, None)
+    assert cache.is_origin_allowed("unknown")
+    assert not cache.auth_required()
+    assert cache.check_auth(mock.MagicMock(), None, None)
+    assert mapping_manager.get_auth_snapshot.call_count == 2
+
+
+def test_version_is_checked_in_intervals(mapping_manager):
+    cache = OriginAuthCache(mapping_manager, version_check_interval=3600)
+    for _ in range(10):
+        assert cache.auth_required()
+    assert mapping_manager.get_mappings_version.call_count == 1
+
+
+def test_invalid_auth_is_rejected(mapping_manager):
+    cache = OriginAuthCache(mapping_manager, version_check_interval=0)
+    origin_logger = mock.MagicMock()
+    assert not cache.check_auth(origin_logger, basic_auth("user", "wrong"), None)
+    assert not cache.check_auth(origin_logger, basic_auth("other", "secret"), None)
+    assert not cache.check_auth(origin_logger, "garbage", None)
+    assert cache.check_auth(origin_logger, basic_auth("user", "secret"), None)
@@ -0,0 +1,55 @@
+import mock
+
+from mapadroid.mitm_receiver.PlayerStats import PlayerStats
+from mapadroid.mitm_receiver.PlayerStatsBuffer import PlayerStatsBuffer
+
+
+def game_stats_args(enabled: bool = True):
+    args = mock.MagicMock()
+    args.game_stats = enabled
+    return args
+
+
+def test_stats_are_handed_over_in_a_single_call():
+    mitm_mapper = mock.MagicMock()
+    stats_buffer = PlayerStatsBuffer(mitm_mapper, game_stats_args(), flush_interval=3600)
+    stats_buffer.run_stats_collector("origin")
+    for encounter_id in ("1", "2", "1"):
+        stats_buffer.collect_mon_stats("origin", encounter_id)
+    stats_buffer.collect_mon_iv_stats("origin", "1", 1)
+    stats_buffer.collect_mon_iv_stats("origin", "1", 0)
+    stats_buffer.collect_raid_stats("origin", "gym")
+    stats_buffer.collect_quest_stats("origin", "stop")
+    stats_buffer.flush()
+    mitm_mapper.collect_stats.assert_called_once_with("origin", {"1": 2, "2": 1}, {"1": (2, 1)}, {"gym": 1},
+                                                      {"stop": 1})
+
+    # within the interval, stats are kept until forced
+    stats_buffer.collect_mon_stats("origin", "3")
+    stats_buffer.flush()
+    assert mitm_mapper.collect_stats.call_count == 1
+    stats_buffer.flush(force=True)
+    mitm_mapper.collect_stats.assert_called_with("origin", {"3": 1}, {}, {}, {})
+
+
+def test_nothing_is_collected_without_game_stats():
+    mitm_mapper = mock.MagicMock()
+    stats_buffer = PlayerStatsBuffer(mitm_mapper, game_stats_args(False))
+    stats_buffer.run_stats_collector("origin")
+    stats_buffer.collect_mon_stats("origin", "1")
+    stats_buffer.flush(force=True)
+    mitm_mapper.collect_stats.assert_not_called()
+
+
+def test_collecting_many_matches_collecting_one_by_one():
+    single = PlayerStats("origin", game_stats_args(), mock.MagicMock())
+    many = PlayerStats("origin", game_stats_args(), mock.MagicMock())
+    for encounter_id in ("1", "2", "1"):
+        single.stats_collect_mon(encounter_id)
+    single.stats_collect_mon_iv("1", 1)
+    single.stats_collect_mon_iv("1", 0)
+    single.stats_collect_raid("gym")
+    single.stats_collect_quest("stop")
+    many.stats_collect_mon("1")
+    many.stats_collect_many({"1": 1, "2": 1}, {"1": (2, 1)}, {"gym": 1}, {"stop": 1})
+    assert single._PlayerStats__stats_collected == many._PlayerStats__stats_collected
@@ -0,0 +1,55 @@
+from multiprocessing import TimeoutError
+from multiprocessing.pool import ThreadPool
+
+import mock
+import numpy as np
+import pytest
+
+from mapadroid.route.routecalc import calculate_route_pool
+
+
+@pytest.fixture
+def pool():
+    yield calculate_route_pool.start_pool(2)
+    calculate_route_pool.stop_pool()
+
+
+def random_coords(seed: int, amount: int = 200) -> np.ndarray:
+    return np.random.default_rng(seed).random((amount, 2)) * 0.02 + [52.5, 13.4]
+
+
+def test_route_without_pool_visits_clustered_coords():
+    coords = random_coords(1)
+    route = calculate_route_pool.calculate_route(coords, 70, 100000, algorithm='quick')
+    less_coords = calculate_route_pool.get_less_coords(coords, 70, 100000)
+    assert route.shape == less_coords.shape
+    assert sorted(map(tuple, route.tolist())) == sorted(map(tuple, less_coords.tolist()))
+
+
+def test_routes_of_pool_match_in_process_calculation(pool):
+    assert pool == 2
+    assert calculate_route_pool.get_pool_size() == 2
+    areas = [random_coords(seed) for seed in range(4)]
+    with ThreadPool(processes=4) as thread_pool:
+        routes = thread_pool.map(lambda coords: calculate_route_pool.calculate_route(coords, 70, 100000,
+                                                                                     algorithm='quick'), areas)
+    calculate_route_pool.stop_pool()
+    assert calculate_route_pool.get_pool_size() == 1
+    for coords, route in zip(areas, routes):
+        assert np.array_equal(route, calculate_route_pool.calculate_route(coords, 70, 100000, algorithm='quick'))
+
+
+def test_less_than_three_coords_are_not_ordered():
+    coords = np.array([(52.5, 13.4), (52.6, 13.5)])
+    assert np.array_equal(calculate_route_pool.calculate_route(coords, 0, 0), coords)
+
+
+def test_route_calculated_in_thread_if_pool_does_not_return_it(pool):
+    coords = random_coords(5)
+    expected = calculate_route_pool.calculate_route_impl(coords, 70, 100000, 'quick', False, 15, 'Unknown', 1)
+    lost = mock.MagicMock()
+    lost.get.side_effect = TimeoutError
+    with mock.patch.object(calculate_route_pool._pool, "apply_async", return_value=lost):
+        route = calculate_route_pool.calculate_route(coords, 70, 100000, algorithm='quick')
+    lost.get.assert_called_once_with(timeout=7200)
+    assert np.array_equal(route, expected)
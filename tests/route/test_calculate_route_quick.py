@@ -0,0 +1,27 @@
+import numpy as np
+
+from mapadroid.route.routecalc.calculate_route_quick import (
+    build_distance_matrix, route_calc_impl, route_length, tsp)
+
+
+def test_route_visits_every_point_once():
+    coords = np.random.default_rng(42).random((250, 2)) * 0.05 + [52.5, 13.4]
+    path = route_calc_impl(coords, "test")
+    assert sorted(path) == list(range(len(coords)))
+
+
+def test_route_of_grid_is_optimal():
+    # the shortest round trip through a 4x4 grid of unit spacing is 16 long
+    coords = np.array([(x, y) for x in range(4) for y in range(4)], dtype=float)
+    length, path = tsp(coords)
+    assert sorted(path) == list(range(16))
+    assert abs(length - 16) < 1e-6
+    assert abs(route_length(build_distance_matrix(coords), np.array(path)) - length) < 1e-6
+
+
+def test_small_routes():
+    assert tsp(np.empty((0, 2))) == (0, [])
+    assert tsp(np.array([(1.0, 1.0)])) == (0, [0])
+    length, path = tsp(np.array([(0.0, 0.0), (0.0, 1.0)]))
+    assert path == [0, 1]
+    assert abs(length - 2) < 1e-6
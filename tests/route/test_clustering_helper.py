@@ -0,0 +1,40 @@
+from mapadroid.route.routecalc.ClusteringHelper import ClusteringHelper
+from mapadroid.utils.collections import Location
+from mapadroid.utils.geo import get_distance_of_two_points_in_meters
+
+
+def test_close_events_clustered():
+    # two events ~50m apart and one ~1.1km away
+    queue = [(0, Location(52.5, 13.4)), (0, Location(52.5, 13.4007)), (0, Location(52.51, 13.4))]
+    clustered = ClusteringHelper(70, 10, 0).get_clustered(queue)
+    assert len(clustered) == 2
+    # the most west (and of those the most north) events are clustered first
+    assert clustered[0] == (0, Location(52.51, 13.4))
+    timestamp, middle, timedelta, merged = clustered[1]
+    assert (timestamp, timedelta, merged) == (0, 0, True)
+    assert get_distance_of_two_points_in_meters(middle.lat, middle.lng, 52.5, 13.40035) < 1
+
+
+def test_max_count_per_circle_respected():
+    # ten events ~13.5m apart in a row, a single circle of 70m around the middle of the row would hold all of them
+    queue = [(0, Location(52.5, 13.4 + i * 0.0002)) for i in range(10)]
+    clustered = ClusteringHelper(70, 3, 0).get_clustered(queue)
+    # circles of three events each from the west, shrunk to be around the two most west of them, and the last event
+    # on its own
+    assert len(clustered) == 4
+    assert [event[3] for event in clustered[:3]] == [True, True, True]
+    assert clustered[3] == queue[9]
+    for (_, middle, _, _), lng in zip(clustered[:3], (13.4001, 13.4007, 13.4013)):
+        assert get_distance_of_two_points_in_meters(middle.lat, middle.lng, 52.5, lng) < 1
+
+
+def test_events_not_within_timedelta_kept_apart():
+    queue = [(600, Location(52.5, 13.4)), (0, Location(52.5, 13.4001))]
+    assert ClusteringHelper(70, 10, 300).get_clustered(queue) == queue
+    merged = ClusteringHelper(70, 10, 900).get_clustered(queue)
+    assert len(merged) == 1
+    assert merged[0][0] == 600
+
+
+def test_empty_queue():
+    assert ClusteringHelper(70, 10, 0).get_clustered([]) == []
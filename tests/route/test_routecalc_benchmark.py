@@ -0,0 +1,27 @@
+from mapadroid.geofence.geofenceHelper import GeofenceHelper
+from mapadroid.route.routecalc.benchmark import (SAMPLE_GEOFENCES,
+                                                 find_regressions,
+                                                 generate_points,
+                                                 run_benchmark)
+
+
+def test_points_generated_inside_geofence():
+    points = generate_points("river", 200, "clustered", seed=1)
+    assert points.shape == (200, 2)
+    geofence_helper = GeofenceHelper({"fence_data": SAMPLE_GEOFENCES["river"]}, None)
+    assert geofence_helper.contains_many(points).all()
+
+
+def test_benchmark_reports_cases():
+    results = run_benchmark([50], ["clustering", "quick"], ["block"], ["uniform"], limits=False)
+    assert [case["engine"] for case in results] == ["clustering", "quick"]
+    assert results[1]["points_out"] == 50
+    assert results[1]["length"] > 0
+    assert results[1]["peak_mb"] > 0
+
+
+def test_regressions_detected():
+    baseline = [{"engine": "quick", "geofence": "block", "distribution": "uniform", "size": 50,
+                 "seconds": 1.0, "length": 1000.0}]
+    results = [dict(baseline[0], seconds=1.1, length=1500.0)]
+    assert find_regressions(results, baseline, 0.25) == ["quick/block/uniform/50 length: 1000.000 -> 1500.000"]
@@ -0,0 +1,39 @@
+import numpy as np
+
+from mapadroid.geofence.geofenceHelper import GeofenceHelper
+from mapadroid.utils.collections import Location
+from mapadroid.utils.geo import get_distance_of_two_points_in_meters
+from mapadroid.utils.s2Helper import S2Helper
+
+
+def test_new_coords_many_matches_single():
+    center = Location(52.5, 13.4)
+    bearings = np.array([0, 45, 90, 210, 330])
+    distances = np.array([0, 100, 490, 980, 5000])
+    lats, lngs = S2Helper.get_new_coords_many(np.full(5, center.lat), np.full(5, center.lng), bearings, distances)
+    for lat, lng, bearing, distance in zip(lats, lngs, bearings, distances):
+        expected = S2Helper.get_new_coords(center, distance, bearing)
+        assert abs(lat - expected.lat) < 1e-9
+        assert abs(lng - expected.lng) < 1e-9
+
+
+def test_generated_locations_cover_geofence():
+    geofence_helper = GeofenceHelper({"fence_data": ["52.50,13.35", "52.50,13.45", "52.54,13.45", "52.54,13.35"]},
+                                     None)
+    locations = S2Helper._generate_locations(490, geofence_helper)
+    assert len(locations) > 100
+    assert all(geofence_helper.is_coord_inside_include_geofence(location) for location in locations)
+    # neighbouring locations of the hex are 490m apart
+    first, second = locations[0], locations[1]
+    assert abs(get_distance_of_two_points_in_meters(first.lat, first.lng, second.lat, second.lng) - 490) < 5
+
+
+def test_order_location_list_rows():
+    locations = [Location(1.0, 2.0), Location(2.0, 1.0), Location(1.00001, 1.0), Location(2.0, 2.0),
+                 Location(0.0, 5.0)]
+    assert S2Helper.order_location_list_rows(locations) == [
+        Location(2.0, 1.0), Location(2.0, 2.0),
+        Location(1.0, 2.0), Location(1.00001, 1.0),
+        Location(0.0, 5.0)
+    ]
+    assert S2Helper.order_location_list_rows([]) == []
@@ -0,0 +1,41 @@
+import time
+
+from mapadroid.webhook.ChangeSuppressionCache import ChangeSuppressionCache
+
+
+def test_unchanged_payloads_are_suppressed():
+    cache = ChangeSuppressionCache()
+    gym = {"gym_id": "gym", "team_id": 1, "slots_available": 2}
+    assert not cache.is_unchanged("gym", "gym", gym)
+    assert cache.is_unchanged("gym", "gym", dict(gym))
+    assert not cache.is_unchanged("gym", "gym", dict(gym, slots_available=1))
+    assert not cache.is_unchanged("gym", "other", gym)
+    assert cache.get_hit_counts() == {"gym": (1, 4)}
+
+
+def test_ignored_fields_do_not_count_as_change():
+    cache = ChangeSuppressionCache()
+    weather = {"s2_cell_id": 1, "condition": 3, "time_changed": 100, "coords": [[1.0, 2.0]]}
+    assert not cache.is_unchanged("weather", 1, weather, ignored_fields=("time_changed", "coords"))
+    assert cache.is_unchanged("weather", 1, dict(weather, time_changed=200), ignored_fields=("time_changed", "coords"))
+    assert not cache.is_unchanged("weather", 1, dict(weather, condition=4), ignored_fields=("time_changed", "coords"))
+
+
+def test_fingerprints_expire_and_are_bounded():
+    cache = ChangeSuppressionCache(max_entries=2, ttl=0.05)
+    stop = {"pokestop_id": "stop", "lure_id": 501}
+    for key in ("a", "b", "c"):
+        cache.is_unchanged("pokestop", key, stop)
+    assert len(cache) == 2
+    assert cache.is_unchanged("pokestop", "c", stop)
+    time.sleep(0.1)
+    assert not cache.is_unchanged("pokestop", "c", stop)
+
+
+def test_cleared_payloads_are_sent_again():
+    cache = ChangeSuppressionCache()
+    gym = {"gym_id": "gym", "team_id": 1}
+    assert not cache.is_unchanged("gym", "gym", gym)
+    cache.clear()
+    assert len(cache) == 0
+    assert not cache.is_unchanged("gym", "gym", gym)
@@ -0,0 +1,65 @@
+import time
+
+import mock
+import requests
+
+from mapadroid.webhook.WebhookReceiver import WebhookReceiver
+
+
+def wait_for(condition):
+    deadline = time.time() + 5
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+
+
+def response(status_code: int):
+    sent = mock.MagicMock()
+    sent.status_code = status_code
+    return sent
+
+
+def test_payloads_sent_on_keep_alive_session():
+    receiver = WebhookReceiver("http://receiver", None, connections=2)
+    with mock.patch.object(receiver._session, "post", return_value=response(200)) as post:
+        for _ in range(4):
+            assert receiver.submit(b"[]", {"raid": 1})
+        wait_for(lambda: receiver.get_stats()["sent"] == 4)
+        assert post.call_count == 4
+        assert post.call_args[0][0] == "http://receiver"
+        assert post.call_args[1]["data"] == b"[]"
+    stats = receiver.get_stats()
+    assert (stats["sent"], stats["failed"], stats["backlog"]) == (4, 0, 0)
+    receiver.stop()
+
+
+def test_failing_receiver_is_retried_and_paused():
+    receiver = WebhookReceiver("http://receiver", None, connections=1)
+    receiver.retry_backoff = 0
+    receiver.failure_threshold = 2
+    with mock.patch.object(receiver._session, "post", side_effect=requests.ConnectionError) as post:
+        for _ in range(3):
+            receiver.submit(b"[]", {"raid": 1})
+        wait_for(lambda: receiver.get_stats()["dropped"] == 1)
+        # every chunk is attempted max_retries + 1 times until the receiver is considered down
+        assert post.call_count == 2 * (receiver.max_retries + 1)
+    stats = receiver.get_stats()
+    assert (stats["failed"], stats["dropped"], stats["down"]) == (2, 1, True)
+    receiver.stop()
+
+
+def test_refused_payload_is_not_retried():
+    receiver = WebhookReceiver("http://receiver", None, connections=1)
+    with mock.patch.object(receiver._session, "post", return_value=response(400)) as post:
+        receiver.submit(b"[]", {"raid": 1})
+        wait_for(lambda: receiver.get_stats()["failed"] == 1)
+        assert post.call_count == 1
+    assert not receiver.get_stats()["down"]
+    receiver.stop()
+
+
+def test_payloads_dropped_when_backlog_is_full():
+    receiver = WebhookReceiver("http://receiver", None, connections=1, max_backlog=1)
+    receiver.stop()
+    assert receiver.submit(b"[]", {"raid": 1})
+    assert not receiver.submit(b"[]", {"raid": 1})
+    assert receiver.get_stats()["dropped"] == 1
@@ -0,0 +1,25 @@
+from mapadroid.webhook.WebhookStream import WebhookStream
+
+
+def test_changes_collected_by_type():
+    stream = WebhookStream()
+    stream.publish("pokemon", [1, 2])
+    stream.publish("raid", ["gym"])
+    stream.publish("pokemon", [2, 3])
+    stream.publish("quest", [])
+    changes = {}
+    while sum(len(keys) for keys in changes.values()) < 4:
+        for webhook_type, keys in stream.collect(5).items():
+            changes.setdefault(webhook_type, set()).update(keys)
+    assert changes == {"pokemon": {1, 2, 3}, "raid": {"gym"}}
+    assert stream.collect(0.01) == {}
+    stream.close()
+
+
+def test_changes_dropped_when_full():
+    stream = WebhookStream(max_size=1)
+    stream.publish("pokemon", [1])
+    stream.publish("pokemon", [2])
+    assert stream.get_dropped_count() == 1
+    assert stream.collect(5) == {"pokemon": {1}}
+    stream.close()
@@ -0,0 +1,90 @@
+import json
+
+import mock
+
+from mapadroid.webhook import webhookworker
+from mapadroid.webhook.webhookworker import WebhookWorker
+
+PAYLOADS = [{"type": "raid", "message": {"gym_id": "gym"}},
+            {"type": "pokemon", "message": {"encounter_id": "1", "seen_type": "encounter"}},
+            {"type": "gym", "message": {"gym_id": "gym"}}]
+
+
+def create_worker(webhook_url: str, max_payload_size: int = 0):
+    args = mock.MagicMock()
+    args.webhook_url = webhook_url
+    args.webhook_start_time = 0
+    args.webhook_excluded_areas = ""
+    args.webhook_max_payload_size = max_payload_size
+    mapping_manager = mock.MagicMock()
+    mapping_manager.get_all_routemanager_names.return_value = []
+
+    def create_receiver(url, types, **kwargs):
+        receiver = mock.MagicMock()
+        receiver.url = url
+        receiver.types = types
+        receiver.get_stats.return_value = {"sent": 0, "failed": 0, "dropped": 0, "backlog": 0, "latency": 0,
+                                           "down": False}
+        return receiver
+
+    with mock.patch.object(webhookworker, "WebhookReceiver", side_effect=create_receiver):
+        worker = WebhookWorker(args, mock.MagicMock(), mapping_manager, mock.MagicMock(), mock.MagicMock())
+    return worker, worker._WebhookWorker__webhook_receivers
+
+
+def test_chunks_encoded_once_for_receivers_of_the_same_types():
+    worker, receivers = create_worker("[raid encounter]http://a,[raid encounter]http://b,[gym]http://c",
+                                      max_payload_size=1)
+    with mock.patch.object(webhookworker, "dumps", wraps=webhookworker.dumps) as dumps:
+        worker._WebhookWorker__send_webhook(PAYLOADS)
+    # two chunks for the raid/encounter receivers, one for the gym receiver
+    assert dumps.call_count == 3
+    first, second, gym = receivers
+    for first_call, second_call in zip(first.submit.call_args_list, second.submit.call_args_list):
+        assert first_call[0][0] is second_call[0][0]
+    assert [json.loads(call[0][0]) for call in first.submit.call_args_list] == [[PAYLOADS[0]], [PAYLOADS[1]]]
+    data, type_count = gym.submit.call_args[0]
+    assert (json.loads(data), type_count) == ([PAYLOADS[2]], {"gym": 1})
+
+
+def test_dumps_falls_back_to_json():
+    assert json.loads(webhookworker.dumps([{"cell_id": 2 ** 70}])) == [{"cell_id": 2 ** 70}]
+
+
+def test_only_gyms_and_stops_written_behind_are_fetched_again():
+    worker, _ = create_worker("[raid gym]http://a")
+    worker._WebhookWorker__args.mitm_write_behind_window = 5
+    worker._WebhookWorker__last_check = worker._WebhookWorker__last_catchup = 1000
+    db_reader = worker._db_reader
+    db_reader.get_raids_changed_since.return_value = []
+    db_reader.get_gyms_changed_since.return_value = [
+        {"gym_id": "gym", "latitude": 1.0, "longitude": 2.0, "team_id": 1, "name": "name", "description": None,
+         "url": None, "slots_available": 6, "is_ex_raid_eligible": None, "is_ar_scan_eligible": 0}]
+    payload = worker._WebhookWorker__create_payload(True)
+    db_reader.get_raids_changed_since.assert_called_once_with(1000)
+    db_reader.get_gyms_changed_since.assert_called_once_with(995)
+    assert [entry["type"] for entry in payload] == ["gym"]
+    # the gym re-read within the write-behind window has been sent already
+    assert worker._WebhookWorker__create_payload(True) == []
+
+
+def test_streamed_changes_without_rows_are_left_to_the_catch_up():
+    worker, _ = create_worker("[quest]http://a")
+    worker._db_reader.get_quests_of_stops.return_value = {}
+    assert worker._WebhookWorker__create_streamed_payload({"quest": {"stop"}}) == []
+    assert worker._WebhookWorker__streamed["quest"] == {}
+
+
+def test_unchanged_gyms_sent_again_once_chunks_have_been_lost():
+    worker, receivers = create_worker("[gym]http://a")
+    worker._WebhookWorker__args.mitm_write_behind_window = 0
+    stats = receivers[0].get_stats.return_value
+    worker._db_reader.get_gyms_changed_since.return_value = [
+        {"gym_id": "gym", "latitude": 1.0, "longitude": 2.0, "team_id": 1, "name": "name", "description": None,
+         "url": None, "slots_available": 6, "is_ex_raid_eligible": None, "is_ar_scan_eligible": 0}]
+    assert len(worker._WebhookWorker__create_payload(False)) == 1
+    assert worker._WebhookWorker__create_payload(False) == []
+    # e.g. the backlog of the receiver has been full
+    stats["dropped"] = 1
+    assert len(worker._WebhookWorker__create_payload(False)) == 1
+    assert worker._WebhookWorker__create_payload(False) == []